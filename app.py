@@ -1,12 +1,22 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory # type: ignore
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory, Response, stream_with_context # type: ignore
 from flask_cors import CORS # type: ignore
 import os
+import tempfile
 from werkzeug.utils import secure_filename # type: ignore
 import brain
 from utils.spider_selector import identify_spider
+from utils.document_store import is_valid_document_id
+from utils.pdf_extraction import PDF_BACKEND, PDF_BACKENDS
+from utils.db_pool import ConnectionPool
+from utils.message_writer import MessageWriter
+from utils.artifact_store import load_artifact
+from utils.session_store import SESSION_BACKEND, ServerSideSessionInterface, make_session_store
+from utils.user_cache import UserProfileCache
+from utils.password_hasher import PasswordHasher, PasswordHasherBusy
+from utils.mailer import Mailer
+from utils.scrape_jobs import enqueue_job, get_job, queue_stats
 import markdown2 # type: ignore
 import json
-import subprocess
 import re
 import requests
 import psycopg2 # type: ignore
@@ -15,18 +25,10 @@ from flask_bcrypt import Bcrypt # type: ignore
 from dotenv import load_dotenv # type: ignore
 from datetime import datetime, timedelta, timezone
 import random
-import smtplib
-from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import traceback
-import subprocess   
-from PyPDF2 import PdfReader 
-from dicttoxml import dicttoxml # type: ignore
-from xml.dom.minidom import parseString
 from requests.exceptions import RequestException
 from urllib.parse import urlparse
-import pandas as pd
-import pandas 
 
 app = Flask(__name__, static_folder='static')
 
@@ -52,34 +54,28 @@ CORS(app)
 
 # reCAPTCHA configuration
 RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY")
-# Email configuration
-# SMTP_SERVER = "smtp.gmail.com"
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-# SMTP_PORT = 587
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
-# SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-#SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
-SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+# Email configuration (SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD) lives in utils/mailer.py
 
 # OTP configuration
 OTP_EXPIRY_TIME = 5  # minutes
 OTP_RESEND_DELAY = 120  # seconds
 
-# Database connection
-def get_db_connection():
-    return psycopg2.connect(
-        # dbname="user_auth",
-        # user="postgres",
-        # password="fypwork",
-        # host=os.getenv('POSTGRES_HOST', 'localhost'),
-        # port="5432"
-        dbname=os.getenv("POSTGRES_DB", "user_auth"),
-        user=os.getenv("POSTGRES_USER", "postgres"),
-        password=os.getenv("POSTGRES_PASSWORD"),
-        host=os.getenv('POSTGRES_HOST', 'localhost'),
-        port=os.getenv("POSTGRES_PORT", "5432")
-    )
+# Chat history pagination
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", 50))
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+
+# Database connections, pooled per worker (see utils/db_pool.py)
+db_pool = ConnectionPool()
+# Chat messages are written one turn per transaction (see utils/message_writer.py)
+message_writer = MessageWriter(db_pool)
+# Session data stays server-side; the cookie carries only a signed ID (see utils/session_store.py)
+app.session_interface = ServerSideSessionInterface(make_session_store(SESSION_BACKEND, db_pool))
+# users rows read by /chat and /check-session (see utils/user_cache.py)
+user_profiles = UserProfileCache(db_pool)
+# bcrypt runs on a bounded number of cores per worker (see utils/password_hasher.py)
+password_hasher = PasswordHasher(bcrypt)
+# OTP emails go out from background threads over reused SMTP connections (see utils/mailer.py)
+mailer = Mailer()
 
 # Utility functions
 def allowed_file(filename):
@@ -102,23 +98,9 @@ def generate_otp():
     return str(random.randint(100000, 999999))
 
 def send_otp_email(user_email, otp):
-    try:
-        subject = "Password Reset OTP"
-        body = f"Your OTP for password reset is: {otp}"
-        msg = MIMEText(body)
-        msg["From"] = SENDER_EMAIL
-        msg["To"] = user_email
-        msg["Subject"] = subject
-
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.sendmail(SENDER_EMAIL, user_email, msg.as_string())
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"Error sending OTP: {e}")
-        return False
+    # Queued for the mailer's threads; False only when its queue is full.
+    # Delivery failures are logged and counted in /metrics.
+    return mailer.send(user_email, "Password Reset OTP", f"Your OTP for password reset is: {otp}") is not None
 
 def verify_recaptcha(recaptcha_response):
     verification_url = "https://www.google.com/recaptcha/api/siteverify"
@@ -161,27 +143,27 @@ def signup():
             flash("Password must be at least 8 characters long and include uppercase, lowercase, number, and special character.", "danger")
             return redirect(url_for('signup'))
 
-        # Hash the password
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-        
         # Insert into database
         try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO users (full_name, email, password_hash) VALUES (%s, %s, %s)",
-                (full_name, email, hashed_password)
-            )
-            conn.commit()
-            cur.close()
-            conn.close()
+            hashed_password = password_hasher.hash(password)
+            with db_pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO users (full_name, email, password_hash) VALUES (%s, %s, %s) RETURNING id",
+                    (full_name, email, hashed_password)
+                )
+                user_id = cur.fetchone()[0]
+                conn.commit()
+            # A lookup of this id before the insert may have cached "no such user"
+            user_profiles.invalidate(user_id)
 
             flash("Signup successful! Please login.", "success")
             return redirect(url_for('login'))
         except psycopg2.IntegrityError:
-            conn.rollback()
             flash("Email already exists. Try logging in.", "danger")
             return redirect(url_for('signup'))
+        except PasswordHasherBusy:
+            flash("The server is busy. Please try again in a moment.", "warning")
+            return redirect(url_for('signup'))
 
     return render_template("signup.html")
 
@@ -191,36 +173,37 @@ def login():
         email = request.form['email']
         password = request.form['password']
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-
         try:
-            cur.execute('SELECT id, full_name, email, password_hash FROM users WHERE email = %s', (email,))
-            user = cur.fetchone()
+            with db_pool.connection() as conn, conn.cursor() as cur:
+                cur.execute('SELECT id, full_name, email, password_hash FROM users WHERE email = %s', (email,))
+                user = cur.fetchone()
 
-            if user and bcrypt.check_password_hash(user[3], password):
-                # Set session
+            if user and password_hasher.check(user[3], password):
+                # Set session, under a new ID so one issued before login cannot be reused
+                session.regenerate()
                 session['user_id'] = user[0]
                 session['full_name'] = user[1]
                 session.modified = True
+                user_profiles.put(user[0], user[1], user[2])
                 
                 # flash('Login successful!', 'success')
                 return redirect(url_for('chat'))
             else:
                 flash('Invalid email or password, please try again.', 'danger')
                 return redirect(url_for('login'))
+        except PasswordHasherBusy:
+            flash("The server is busy. Please try again in a moment.", "warning")
+            return redirect(url_for('login'))
         except Exception as e:
             flash('Internal server error. Please try again later.', 'danger')
             return redirect(url_for('login'))
-        finally:
-            cur.close()
-            conn.close()
 
     return render_template("login.html")
 
 @app.route("/logout")
 def logout():
     session.clear()
+    session.regenerate()
     flash("You have been logged out.", "info")
     return redirect(url_for('login'))
 
@@ -229,14 +212,10 @@ def password():
     if request.method == "POST":
         email = request.form["email"]
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-
         # Check if email exists
-        cur.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT * FROM users WHERE email = %s", (email,))
+            user = cur.fetchone()
 
         if user:
             otp = generate_otp()
@@ -291,16 +270,20 @@ def reset_password():
             flash("Password must be at least 8 characters long and include: 1 uppercase letter, 1 lowercase letter, 1 number, and 1 special character.", "danger")
             return redirect(url_for('reset_password'))
             
-        hashed_password = bcrypt.generate_password_hash(new_password).decode('utf-8')
-
-        conn = get_db_connection()
-        cur = conn.cursor()
+        try:
+            hashed_password = password_hasher.hash(new_password)
+        except PasswordHasherBusy:
+            flash("The server is busy. Please try again in a moment.", "warning")
+            return redirect(url_for('reset_password'))
 
         # Update password in database
-        cur.execute("UPDATE users SET password_hash = %s WHERE email = %s", (hashed_password, session.get("email")))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("UPDATE users SET password_hash = %s WHERE email = %s RETURNING id",
+                        (hashed_password, session.get("email")))
+            user_ids = [row[0] for row in cur.fetchall()]
+            conn.commit()
+        for user_id in user_ids:
+            user_profiles.invalidate(user_id)
 
         session.pop("otp", None)
         session.pop("email", None)
@@ -331,8 +314,33 @@ def resend_otp():
 
 @app.route("/check-session", methods=["GET"])
 def check_session():
+    # Polled by every open tab: answered from the session alone, never from Postgres
     return jsonify(active='user_id' in session)
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Per-worker cache and performance counters."""
+    if 'user_id' not in session:
+        return jsonify({"error": "User not authenticated"}), 401
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        scrape_queue = queue_stats(cur)
+    return jsonify({
+        "pid": os.getpid(),
+        "index_cache": brain.get_index_cache_stats(),
+        "embeddings": brain.get_embedding_stats(),
+        "pdf_extraction": brain.get_extraction_stats(),
+        "llm_gateway": brain.get_llm_gateway_stats(),
+        "response_cache": brain.get_response_cache_stats(),
+        "rag_queries": brain.get_rag_stats(),
+        "db_pool": db_pool.stats(),
+        "message_writer": message_writer.stats(),
+        "sessions": app.session_interface.stats(),
+        "user_profiles": user_profiles.stats(),
+        "password_hasher": password_hasher.stats(),
+        "mailer": mailer.stats(),
+        "scrape_jobs": scrape_queue
+    })
+
 @app.route('/chat', methods=["GET"])
 def chat():
     if 'user_id' not in session:
@@ -341,15 +349,14 @@ def chat():
     
     user_id = session['user_id']
     
-    # Get user email from database
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('SELECT email FROM users WHERE id = %s', (user_id,))
-    user_email = cur.fetchone()[0]
-    cur.close()
-    conn.close()
+    profile = user_profiles.get(user_id)
+    if profile is None:
+        # The account is gone; drop the stale login
+        session.clear()
+        flash("Please log in to access the chat.", "warning")
+        return redirect(url_for('login'))
     
-    return render_template("chat.html", user_id=user_id, user_email=user_email)
+    return render_template("chat.html", user_id=user_id, user_email=profile["email"])
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -368,21 +375,26 @@ def upload_file():
     if file and file.filename.endswith('.pdf'):
         try:
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            backend = request.form.get('backend', PDF_BACKEND)
+            if backend not in PDF_BACKENDS:
+                return jsonify({"error": f"Unknown PDF backend. Use one of: {', '.join(PDF_BACKENDS)}"}), 400
+            # A file of its own per upload: concurrent uploads of the same name, from this
+            # worker's threads or another worker, must never read each other's PDF
+            with tempfile.NamedTemporaryFile(delete=False, dir=app.config['UPLOAD_FOLDER'], suffix=".pdf") as f:
+                filepath = f.name
+                file.save(f)
             print(f"File saved to: {filepath}")  # Debug log
-                        
-                # Extract text from PDF
-            pdf_text = extract_pdf_text(filepath)
-            print("PDF text extracted successfully")  # Debug log
-                        
-                # Store in session for context
-            session['pdf_context'] = pdf_text
-                        
+            try:
+                # Extract, chunk and embed the PDF once; the client only keeps the ID
+                document_id, chunk_count = brain.ingest_pdf(filepath, backend)
+            finally:
+                os.remove(filepath)
+            print(f"Document {document_id} indexed with {chunk_count} chunks")  # Debug log
+
             return jsonify({
                         "success": True,
                             "filename": filename,
-                            "context": pdf_text
+                            "document_id": document_id
                         })
 
         except Exception as e:
@@ -392,17 +404,27 @@ def upload_file():
     print("Invalid file type")  # Debug log
     return jsonify({"error": "Invalid file type"}), 400
     
-def extract_pdf_text(filepath):
-    try:
-        reader = PdfReader(filepath)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        print(f"Error extracting PDF text: {e}")
-        raise
-    
+def format_answer(message, answer_text):
+    """Normalise bullet formatting when the user asked for a summary or bullet points."""
+    if "bullet points" in message.lower() or "summarize" in message.lower():
+        # Remove any metadata or prefixes
+        if isinstance(answer_text, str):
+            # Split by newlines and clean up
+            lines = [line.strip() for line in answer_text.split('\n') if line.strip()]
+            formatted_text = []
+
+            for line in lines:
+                # Remove any existing bullet points or asterisks
+                line = line.lstrip('•').lstrip('*').lstrip('-').strip()
+                # Skip empty lines or lines that are just bullet points
+                if line and not line.isspace():
+                    # Add markdown bullet point
+                    formatted_text.append(f"- {line}")
+
+            # Join with double newlines for better readability
+            answer_text = '\n\n'.join(formatted_text)
+    return answer_text
+
 def is_valid_url(url):
     """Validate URL by checking its accessibility and response status."""
     try:
@@ -455,18 +477,16 @@ def ask_question():
     data = request.get_json()
     message = data.get('message', '').strip()
     session_id = data.get('session_id')
-    file_context = data.get('file_context')
+    document_id = data.get('document_id')
     selected_format = data.get('selected_format')
 
     if not message:
         return jsonify({"error": "No message provided. Please try sending your request again."}), 400
 
-    conn = None
-    cur = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+    if document_id and not is_valid_document_id(document_id):
+        return jsonify({"error": "Invalid document ID. Please upload the file again."}), 400
 
+    try:
         # Check if this is a scraping request
         url_pattern = re.compile(r'https?://[^\s]+')
         scrape_command = "scrape"
@@ -489,11 +509,7 @@ def ask_question():
                     print(f"URL validation failed: {validation_message}")  # Debug log
                     
                     # Store the failed attempt in chat history
-                    cur.execute(
-                        "INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at) VALUES (%s, %s, %s, %s, NOW())",
-                        (session_id, session['user_id'], "bot", error_message)
-                    )
-                    conn.commit()
+                    message_writer.write(session_id, session['user_id'], [("bot", error_message)])
                     return jsonify({"answer": error_message})
                 
                 print(f"URL validation successful: {url}")  # Debug log
@@ -525,11 +541,7 @@ def ask_question():
             # If still no format, return format options
             if not specified_format:
                 # Store the scraping request in the chat history
-                cur.execute(
-                    "INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at) VALUES (%s, %s, %s, %s, NOW())",
-                    (session_id, session['user_id'], "user", message)
-                )
-                conn.commit()
+                message_writer.write(session_id, session['user_id'], [("user", message)])
                 
                 format_options = {
                     "type": "format_selection",
@@ -545,181 +557,112 @@ def ask_question():
             if not spider_name:
                 return jsonify({"error": "Sorry, I don't support scraping from this website yet."})
 
-            # Generate a unique filename base based on timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            try:
-                # Run the appropriate spider
-                subprocess.run([
-                    'scrapy', 
-                    'crawl', 
-                    spider_name, 
-                    '-a', 
-                    f'start_url={url}',
-                    '-O',
-                    'temp_output.json'  # Always save as JSON first
-                ], check=True)
-                
-                # Read the JSON data first
-                with open('temp_output.json', 'r', encoding='utf-8') as f:
-                    scraped_data = json.load(f)
-
-                # Check if data is empty
-                if not scraped_data or (isinstance(scraped_data, list) and len(scraped_data) == 0):
-                    error_message = "⚠️ No data could be scraped from this URL. This might be because:\n" + \
-                                  "• The page structure might have changed\n" + \
-                                  "• The content might be dynamically loaded\n" + \
-                                  "• The page might be empty\n\n" + \
-                                  "Please verify the URL and try again."
-                    
-                    # Store the error in chat history
-                    cur.execute(
-                        "INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at) VALUES (%s, %s, %s, %s, NOW())",
-                        (session_id, session['user_id'], "bot", error_message)
-                    )
-                    conn.commit()
-                    
-                    # Clean up temporary file
-                    if os.path.exists('temp_output.json'):
-                        os.remove('temp_output.json')
-                        
-                    return jsonify({"answer": error_message})
-
-                # Ensure the scraped_data directory exists
-                os.makedirs('scraped_data', exist_ok=True)
+            # The crawl runs in the scrape worker (utils/scrape_worker.py); the
+            # client polls /scrape_jobs/<job_id> and the answer is posted to the chat
+            with db_pool.connection() as conn, conn.cursor() as cur:
+                job_id = enqueue_job(cur, session['user_id'], session_id, spider_name, url, specified_format)
+                conn.commit()
 
-                # Convert and save in the specified format
-                if specified_format == 'json':
-                    # Just copy the JSON file
-                    output_file = f"scraped_data/{spider_name}_output_{timestamp}.json"
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        json.dump(scraped_data, f, indent=2)
-                
-                elif specified_format == 'csv':
-                    output_file = f"scraped_data/{spider_name}_output_{timestamp}.csv"
-                    # Check if data is suitable for CSV conversion
-                    if isinstance(scraped_data, list) and scraped_data:
-                        import pandas as pd
-                        pd.DataFrame(scraped_data).to_csv(output_file, index=False)
-                    else:
-                        error_message = "⚠️ The scraped data structure is not suitable for CSV format."
-                        return jsonify({"answer": error_message})
-                
-                elif specified_format == 'xml':
-                    output_file = f"scraped_data/{spider_name}_output_{timestamp}.xml"
-                    # Convert JSON to XML with proper formatting
-                    xml_data = dicttoxml(scraped_data, custom_root='items', attr_type=False)
-                    # Make it pretty
-                    dom = parseString(xml_data)
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(dom.toprettyxml())
-
-                # Generate download link
-                download_url = url_for('download_file', 
-                                    filename=os.path.basename(output_file), 
-                                    _external=True)
-
-                # Format response
-                response_text = f"I've scraped the data using the {spider_name} spider.\n\n"
-                
-                if scraped_data:
-                    response_text += "Here's a preview of the scraped data:\n"
-                    if isinstance(scraped_data, list):
-                        # Show preview in JSON format regardless of output format
-                        preview_count = min(5, len(scraped_data))
-                        for i, item in enumerate(scraped_data[:preview_count], 1):
-                            response_text += f"\n{i}. {json.dumps(item, indent=2)}"
-                        if len(scraped_data) > 5:
-                            response_text += f"\n\n... and {len(scraped_data) - 5} more items."
-                        
-                        # Add total count
-                        response_text += f"\n\nTotal items scraped: {len(scraped_data)}"
-                    else:
-                        preview = json.dumps(scraped_data, indent=2)[:1000]
-                        response_text += f"\n```\n{preview}\n```\n...(truncated)"
-
-                    # Add download link at the end
-                    response_text += f"\n\nDownload the complete {specified_format.upper()} file: [Click Here]({download_url})"
-
-                # Clean up temporary file
-                if os.path.exists('temp_output.json'):
-                    os.remove('temp_output.json')
-
-            except subprocess.CalledProcessError as e:
-                error_msg = f"Error during scraping: {str(e)}"
-                print(error_msg)
-                response_text = f"Sorry, I encountered an error while trying to scrape the URL: {error_msg}"
-
-            except Exception as e:
-                error_msg = f"Unexpected error during scraping: {str(e)}"
-                print(error_msg)
-                response_text = f"Sorry, something went wrong while processing the scraped data: {error_msg}"
-
-            # Store bot response
-            cur.execute(
-                "INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at) VALUES (%s, %s, %s, %s, NOW())",
-                (session_id, session['user_id'], "bot", response_text)
-            )
-            
-            conn.commit()
-            return jsonify({"answer": response_text})
+            return jsonify({
+                "type": "scrape_job",
+                "job_id": job_id,
+                "status": "queued",
+                "message": f"Scraping started with the {spider_name} spider. I'll post the results here when it finishes."
+            })
 
         else:
-            # Store the user's message first to ensure it's in the history
-            cur.execute(
-                "INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at) VALUES (%s, %s, %s, %s, NOW())",
-                (session_id, session['user_id'], "user", message)
-            )
-            conn.commit()  # Commit the user message immediately
             # Handle normal chat with or without PDF context
-            if file_context:
-                print("Using file context for response")  # Debug log
-                ai_response = brain.generate_response(message, file_context)
+            if document_id:
+                print(f"Using document {document_id} for response")  # Debug log
+                ai_response = brain.generate_response(message, document_id)
                 print("Generated response with context")  # Debug log
             else:
                 print("No file context, using standard response")  # Debug log
                 ai_response = brain.generate_response(message)
 
             # Extract and format the response
+            rag_stats = None
             if isinstance(ai_response, dict):
                 # If response is a dictionary, get the 'result' field
                 answer_text = ai_response.get('result', '')
+                rag_stats = ai_response.get('rag_stats')
             else:
                 # If response is an object with content attribute or string
                 answer_text = ai_response.content if hasattr(ai_response, 'content') else str(ai_response)
 
             # Clean up the response
-            if "bullet points" in message.lower() or "summarize" in message.lower():
-                # Remove any metadata or prefixes
-                if isinstance(answer_text, str):
-                    # Split by newlines and clean up
-                    lines = [line.strip() for line in answer_text.split('\n') if line.strip()]
-                    formatted_text = []
-                    
-                    for line in lines:
-                        # Remove any existing bullet points or asterisks
-                        line = line.lstrip('•').lstrip('*').lstrip('-').strip()
-                        # Skip empty lines or lines that are just bullet points
-                        if line and not line.isspace():
-                            # Add markdown bullet point
-                            formatted_text.append(f"- {line}")
-                    
-                    # Join with double newlines for better readability
-                    answer_text = '\n\n'.join(formatted_text)
-            
-            # Store bot response
-            cur.execute(
-                "INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at) VALUES (%s, %s, %s, %s, NOW())",
-                (session_id, session['user_id'], "bot", answer_text)
-            )
-                    
-            conn.commit()
+            answer_text = format_answer(message, answer_text)
+
+            # Store the question and the answer together in one transaction
+            message_writer.write(session_id, session['user_id'], [("user", message), ("bot", answer_text)])
+            if rag_stats:
+                return jsonify({"answer": answer_text, "rag_stats": rag_stats})
             return jsonify({"answer": answer_text})
 
     except Exception as e:
         print(f"Error in ask_question: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+def sse_event(data, event=None):
+    """Format one Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+@app.route('/ask/stream', methods=["POST"])
+def ask_question_stream():
+    """Stream a chat answer as Server-Sent Events; scraping requests still go through /ask."""
+    if 'user_id' not in session:
+        return jsonify({"error": "User not logged in"}), 401
+
+    data = request.get_json()
+    message = data.get('message', '').strip()
+    session_id = data.get('session_id')
+    document_id = data.get('document_id')
+    user_id = session['user_id']
+
+    if not message:
+        return jsonify({"error": "No message provided. Please try sending your request again."}), 400
+
+    if document_id and not is_valid_document_id(document_id):
+        return jsonify({"error": "Invalid document ID. Please upload the file again."}), 400
+
+    def generate():
+        turn = [("user", message)]
+        pieces = []
+        try:
+            for piece in brain.stream_response(message, document_id):
+                pieces.append(piece)
+                yield sse_event({"token": piece})
+        except Exception as e:
+            print(f"Error in ask_question_stream: {e}")
+            yield sse_event({"error": "Error generating response"}, event="error")
+        finally:
+            # The turn is persisted once, after the last token; the question is
+            # kept even when generation fails or the client disconnects
+            if pieces:
+                turn.append(("bot", format_answer(message, ''.join(pieces))))
+            message_writer.write(session_id, user_id, turn)
+        if pieces:
+            yield sse_event({"answer": turn[-1][1]}, event="done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/scrape_jobs/<int:job_id>', methods=['GET'])
+def get_scrape_job(job_id):
+    """Status and progress of a scrape queued by /ask; polled by the chat until it finishes."""
+    if 'user_id' not in session:
+        return jsonify({"error": "User not authenticated"}), 401
+
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        job = get_job(cur, job_id, session['user_id'])
+    if job is None:
+        return jsonify({"error": "Scrape job not found"}), 404
+    return jsonify(job)
+
 @app.route('/get_user_chat_sessions', methods=['GET'])
 def get_user_chat_sessions():
     """Fetches all chat sessions for the user to show in the history panel."""
@@ -730,21 +673,19 @@ def get_user_chat_sessions():
     print(f"Fetching sessions for user_id: {user_id}")  # Debug log
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # Fetch chat sessions with their titles
-        cur.execute("""
-            SELECT 
-                session_id,
-                COALESCE(title, 'New Chat') as session_name,
-                created_at
-            FROM chat_sessions 
-            WHERE user_id = %s 
-            ORDER BY created_at DESC
-        """, (user_id,))
-
-        sessions = cur.fetchall()
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            # Fetch chat sessions with their titles
+            cur.execute("""
+                SELECT 
+                    session_id,
+                    COALESCE(title, 'New Chat') as session_name,
+                    created_at
+                FROM chat_sessions 
+                WHERE user_id = %s 
+                ORDER BY created_at DESC
+            """, (user_id,))
+
+            sessions = cur.fetchall()
         print(f"Found {len(sessions)} sessions")  # Debug log
 
         # Convert to list of dicts
@@ -760,12 +701,6 @@ def get_user_chat_sessions():
         print(f"Error fetching chat sessions: {e}")  # Debug log
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        if 'cur' in locals():
-            cur.close()
-        if conn:
-            conn.close()
-
 @app.route('/store_message', methods=['POST'])
 def store_message():
     """Store a message and create a new chat session if needed."""
@@ -780,51 +715,46 @@ def store_message():
     session_name = data.get('session_name', 'New Chat')
     
     # Create a new chat session or use existing one
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
     chat_session_id = None
     created_at = None
-    
-    if is_new_session:
-        # Create a new chat session
-        cur.execute(
-            "INSERT INTO chat_sessions (user_id, title, created_at) VALUES (%s, %s, NOW()) RETURNING session_id, created_at",
-            (user_id, session_name)
-        )
-        chat_session_id, created_at = cur.fetchone()
-        conn.commit()
-    else:
-        # Use the most recent chat session or create a new one if none exists
-        cur.execute(
-            "SELECT session_id, created_at FROM chat_sessions WHERE user_id = %s ORDER BY created_at DESC LIMIT 1",
-            (user_id,)
-        )
-        chat_session = cur.fetchone()
-        
-        if chat_session:
-            chat_session_id, created_at = chat_session
-        else:
-            # Create a new chat session if none exists
+
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        if is_new_session:
+            # Create a new chat session
             cur.execute(
-                "INSERT INTO chat_sessions (user_id, title, created_at) VALUES (%s, %s, NOW()) RETURNING session_id, created_at", 
+                "INSERT INTO chat_sessions (user_id, title, created_at) VALUES (%s, %s, NOW()) RETURNING session_id, created_at",
                 (user_id, session_name)
             )
             chat_session_id, created_at = cur.fetchone()
             conn.commit()
-            is_new_session = True
-    
-    # Store message if not empty
-    if message:
-        cur.execute(
-            "INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at) VALUES (%s, %s, %s, %s, NOW())",
-            (chat_session_id, user_id, "user", message)
-        )
-        conn.commit()
-    
-    cur.close()
-    conn.close()
-    
+        else:
+            # Use the most recent chat session or create a new one if none exists
+            cur.execute(
+                "SELECT session_id, created_at FROM chat_sessions WHERE user_id = %s ORDER BY created_at DESC LIMIT 1",
+                (user_id,)
+            )
+            chat_session = cur.fetchone()
+
+            if chat_session:
+                chat_session_id, created_at = chat_session
+            else:
+                # Create a new chat session if none exists
+                cur.execute(
+                    "INSERT INTO chat_sessions (user_id, title, created_at) VALUES (%s, %s, NOW()) RETURNING session_id, created_at", 
+                    (user_id, session_name)
+                )
+                chat_session_id, created_at = cur.fetchone()
+                conn.commit()
+                is_new_session = True
+
+        # Store message if not empty
+        if message:
+            cur.execute(
+                "INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at) VALUES (%s, %s, %s, %s, NOW())",
+                (chat_session_id, user_id, "user", message)
+            )
+            conn.commit()
+
     return jsonify({
         "chat_session_id": chat_session_id,
         "session_name": session_name,
@@ -832,8 +762,25 @@ def store_message():
         "is_new_session": is_new_session
     })
 
+def encode_history_cursor(created_at, message_id):
+    """Opaque cursor pointing just before one chat_history row; message_id alone if created_at is NULL."""
+    return f"{created_at.isoformat() if created_at else ''}_{message_id}"
+
+def decode_history_cursor(cursor):
+    """Inverse of encode_history_cursor; returns (created_at or None, message_id) or None if malformed."""
+    created_at, _, message_id = cursor.rpartition('_')
+    try:
+        return (datetime.fromisoformat(created_at) if created_at else None), int(message_id)
+    except ValueError:
+        return None
+
 @app.route('/get_chat_history', methods=['GET'])
 def get_chat_history():
+    """
+    One page of a session's messages, oldest first.
+    Query args: session_id; limit (default CHAT_HISTORY_PAGE_SIZE); before, the
+    `next_before` cursor of the previous page, to fetch the messages preceding it.
+    """
     if 'user_id' not in session:
         return jsonify({"error": "User not authenticated"}), 401
 
@@ -842,39 +789,94 @@ def get_chat_history():
         return jsonify({"error": "No session ID provided"}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        limit = min(max(int(request.args.get('limit', CHAT_HISTORY_PAGE_SIZE)), 1), CHAT_HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    before = request.args.get('before')
+    if before:
+        before = decode_history_cursor(before)
+        if before is None:
+            return jsonify({"error": "Invalid cursor"}), 400
 
-        # Get all messages for the session with proper ordering
-        cur.execute("""
-            SELECT message, sender, created_at
-            FROM chat_history
-            WHERE chat_session_id = %s
-            ORDER BY created_at ASC, ctid ASC
-        """, (chat_session_id,))
+    try:
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            # Newest first so the (chat_session_id, created_at, message_id) index stops after
+            # one page; one extra row tells whether an older page exists
+            if before and before[0] is None:
+                # NULL created_at sorts first in DESC order: older are the NULL rows with
+                # a lower message_id, then every dated row
+                cur.execute("""
+                    SELECT message_id, message, sender, created_at, artifact_digest
+                    FROM chat_history
+                    WHERE chat_session_id = %s AND (created_at IS NOT NULL OR message_id < %s)
+                    ORDER BY created_at DESC, message_id DESC
+                    LIMIT %s
+                """, (chat_session_id, before[1], limit + 1))
+            elif before:
+                cur.execute("""
+                    SELECT message_id, message, sender, created_at, artifact_digest
+                    FROM chat_history
+                    WHERE chat_session_id = %s AND (created_at, message_id) < (%s, %s)
+                    ORDER BY created_at DESC, message_id DESC
+                    LIMIT %s
+                """, (chat_session_id, before[0], before[1], limit + 1))
+            else:
+                cur.execute("""
+                    SELECT message_id, message, sender, created_at, artifact_digest
+                    FROM chat_history
+                    WHERE chat_session_id = %s
+                    ORDER BY created_at DESC, message_id DESC
+                    LIMIT %s
+                """, (chat_session_id, limit + 1))
 
-        messages = cur.fetchall()
+            messages = cur.fetchall()
+
+        has_more = len(messages) > limit
+        messages = messages[:limit][::-1]
 
         # Format messages
         formatted_messages = []
         for msg in messages:
-            formatted_messages.append({
-                'message': msg[0],
-                'sender': msg[1],
-                'created_at': msg[2].isoformat() if msg[2] else None
-            })
+            formatted_message = {
+                'message': msg[1],
+                'sender': msg[2],
+                'created_at': msg[3].isoformat() if msg[3] else None
+            }
+            if msg[4]:
+                # `message` is only a summary; the full text is at /artifacts/<artifact_id>
+                formatted_message['artifact_id'] = msg[4]
+            formatted_messages.append(formatted_message)
 
-        return jsonify(formatted_messages)
+        return jsonify({
+            "messages": formatted_messages,
+            "has_more": has_more,
+            "next_before": encode_history_cursor(messages[0][3], messages[0][0]) if has_more else None
+        })
 
     except Exception as e:
         print(f"Error fetching chat history: {e}")
         return jsonify({"error": "Failed to fetch chat history"}), 500
 
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+@app.route('/artifacts/<artifact_id>', methods=['GET'])
+def get_artifact(artifact_id):
+    """Full text of a summarized chat message, fetched when the user expands it."""
+    if 'user_id' not in session:
+        return jsonify({"error": "User not authenticated"}), 401
+
+    try:
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            content = load_artifact(cur, artifact_id, session['user_id'])
+    except Exception as e:
+        print(f"Error fetching artifact: {e}")
+        return jsonify({"error": "Failed to fetch message"}), 500
+
+    if content is None:
+        return jsonify({"error": "Message not found"}), 404
+    # Content-addressed, so the body for an ID never changes
+    response = jsonify({"artifact_id": artifact_id, "content": content})
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
 
 @app.route('/rename_chat_session', methods=['POST'])
 def rename_chat_session():
@@ -888,21 +890,18 @@ def rename_chat_session():
     if not session_id or not new_name:
         return jsonify({"success": False, "error": "Missing parameters"}), 400
 
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Update the session name with proper transaction handling
-        cur.execute("""
-            UPDATE chat_sessions 
-            SET title = %s 
-            WHERE session_id = %s AND user_id = %s
-            RETURNING session_id, title, created_at
-        """, (new_name, session_id, session['user_id']))
-        
-        updated_session = cur.fetchone()
-        conn.commit()
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            # Update the session name with proper transaction handling
+            cur.execute("""
+                UPDATE chat_sessions 
+                SET title = %s 
+                WHERE session_id = %s AND user_id = %s
+                RETURNING session_id, title, created_at
+            """, (new_name, session_id, session['user_id']))
+
+            updated_session = cur.fetchone()
+            conn.commit()
 
         if updated_session:
             return jsonify({
@@ -915,15 +914,8 @@ def rename_chat_session():
             return jsonify({"success": False, "error": "Session not found"}), 404
 
     except Exception as e:
-        if conn:
-            conn.rollback()
         print(f"Error renaming chat session: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
-    finally:
-        if 'cur' in locals():
-            cur.close()
-        if conn:
-            conn.close()
 
 @app.route('/delete_chat_session', methods=['POST'])
 def delete_chat_session():
@@ -937,27 +929,21 @@ def delete_chat_session():
         return jsonify({"error": "Missing session_id"}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        # Delete chat history first due to foreign key constraint
-        cur.execute(
-            "DELETE FROM chat_history WHERE chat_session_id = %s AND user_id = %s",
-            (session_id, session['user_id'])
-        )
-        cur.execute(
-            "DELETE FROM chat_sessions WHERE session_id = %s AND user_id = %s",
-            (session_id, session['user_id'])
-        )
-        conn.commit()
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            # Delete chat history first due to foreign key constraint
+            cur.execute(
+                "DELETE FROM chat_history WHERE chat_session_id = %s AND user_id = %s",
+                (session_id, session['user_id'])
+            )
+            cur.execute(
+                "DELETE FROM chat_sessions WHERE session_id = %s AND user_id = %s",
+                (session_id, session['user_id'])
+            )
+            conn.commit()
         return jsonify({"success": True})
     except Exception as e:
         print(f"Error deleting chat session: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        if 'cur' in locals():
-            cur.close()
-        if 'conn' in locals():
-            conn.close()
         
 
        
@@ -971,8 +957,6 @@ def start_new_chat():
     user_id = session['user_id']
     initial_message = data.get('initial_message', '')
 
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
         # Create session name from initial message
         words = initial_message.split()[:4]  # Get first 4 words
@@ -984,13 +968,14 @@ def start_new_chat():
             session_name = 'New Chat'
         
         # Create new chat session
-        cur.execute("""
-            INSERT INTO chat_sessions (user_id, title, created_at) 
-            VALUES (%s, %s, NOW()) RETURNING session_id
-        """, (user_id, session_name))
-        
-        new_session_id = cur.fetchone()[0]
-        conn.commit()
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO chat_sessions (user_id, title, created_at) 
+                VALUES (%s, %s, NOW()) RETURNING session_id
+            """, (user_id, session_name))
+
+            new_session_id = cur.fetchone()[0]
+            conn.commit()
 
         return jsonify({
             "session_id": new_session_id,
@@ -998,15 +983,8 @@ def start_new_chat():
         }), 200
         
     except Exception as e:
-        conn.rollback()
         print(f"Error creating new chat: {e}")
         return jsonify({"error": str(e)}), 500
-        
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 @app.route('/download/<path:filename>')
 def download_file(filename):
@@ -0,0 +1,109 @@
+"""
+chat_history size with large messages inline vs. moved to chat_artifacts.
+
+Seeds a scratch database (see benchmarks.query_plans) twice with the same
+synthetic conversations: short questions, scrape results with five
+pretty-printed JSON items and long LLM answers. The first load keeps every
+message inline; the second stores messages above ARTIFACT_MIN_BYTES as
+artifacts. Reports table sizes and the bytes a 50-message history page reads.
+
+    python -m benchmarks.artifact_store
+    python -m benchmarks.artifact_store --turns 20000 --keep
+"""
+import json
+import random
+import argparse
+
+from psycopg2.extras import execute_values # type: ignore
+
+from benchmarks.query_plans import INIT_SQL, SCRATCH_DB, connect, recreate_scratch_database
+from utils.artifact_store import ARTIFACT_MIN_BYTES, externalize, save_artifacts
+from utils.message_writer import INSERT_SQL, ROW_TEMPLATE
+from utils.migrations import apply_migrations
+
+WORDS = ("furnace gas efficiency warranty model price listing seller mileage engine transmission "
+         "condition heating cooling install rating review delivery brand series capacity").split()
+SESSIONS = 200
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_turn(rng, turn):
+    question = sentence(rng, rng.randint(6, 20))
+    kind = rng.random()
+    if kind < 0.2:
+        items = [{"title": sentence(rng, 6), "price": rng.randint(500, 90000), "url": f"https://example.com/item/{turn}-{i}",
+                  "description": " ".join(sentence(rng, 15) for _ in range(3))} for i in range(5)]
+        answer = "I've scraped the data using the cars spider.\n\nHere's a preview of the scraped data:\n"
+        answer += "".join(f"\n{i}. {json.dumps(item, indent=2)}" for i, item in enumerate(items, 1))
+        answer += f"\n\nTotal items scraped: {rng.randint(20, 400)}"
+        answer += f"\n\nDownload the complete JSON file: [Click Here](https://example.com/download/{turn}.json)"
+    elif kind < 0.5:
+        answer = "\n\n".join(" ".join(sentence(rng, 18) for _ in range(5)) for _ in range(rng.randint(10, 40)))
+    else:
+        answer = " ".join(sentence(rng, 14) for _ in range(rng.randint(1, 4)))
+    return [("user", question), ("bot", answer)]
+
+
+def load(conn, turns, min_bytes, seed):
+    rng = random.Random(seed)
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE chat_history, chat_artifacts, chat_sessions, users RESTART IDENTITY CASCADE")
+        cur.execute("INSERT INTO users (full_name, email, password_hash) VALUES ('Benchmark', 'artifacts@example.invalid', '-')")
+        cur.execute("INSERT INTO chat_sessions (user_id, title) SELECT 1, 'Session ' || n FROM generate_series(1, %s) AS n",
+                    (SESSIONS,))
+        for turn in range(turns):
+            session_id = 1 + turn % SESSIONS
+            rows = [(session_id, 1, sender, text) for sender, text in synthetic_turn(rng, turn)]
+            stored_rows, artifacts = externalize(rows, min_bytes=min_bytes)
+            save_artifacts(cur, artifacts)
+            execute_values(cur, INSERT_SQL, stored_rows, template=ROW_TEMPLATE)
+        cur.execute("VACUUM ANALYZE chat_history")
+        cur.execute("VACUUM ANALYZE chat_artifacts")
+        cur.execute("""
+            SELECT pg_total_relation_size('chat_history'), pg_total_relation_size('chat_artifacts'),
+                   (SELECT sum(octet_length(message)) FROM (
+                        SELECT message FROM chat_history WHERE chat_session_id = 1
+                        ORDER BY created_at DESC, message_id DESC LIMIT 50) page)
+        """)
+        return cur.fetchone()
+
+
+def mb(size):
+    return f"{(size or 0) / 1024 / 1024:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="leave the scratch database in place")
+    args = parser.parse_args()
+
+    recreate_scratch_database()
+    try:
+        conn = connect(SCRATCH_DB)
+        try:
+            with open(INIT_SQL, 'r', encoding='utf-8') as f, conn.cursor() as cur:
+                cur.execute(f.read())
+            apply_migrations(conn)
+            inline = load(conn, args.turns, float("inf"), args.seed)
+            split = load(conn, args.turns, ARTIFACT_MIN_BYTES, args.seed)
+        finally:
+            conn.close()
+    finally:
+        if not args.keep:
+            recreate_scratch_database(drop_only=True)
+
+    print(f"{args.turns} turns, artifacts above {ARTIFACT_MIN_BYTES} bytes")
+    print(f"{'layout':>10} {'chat_history':>13} {'chat_artifacts':>15} {'page bytes':>11}")
+    print(f"{'inline':>10} {mb(inline[0]):>13} {mb(inline[1]):>15} {inline[2] or 0:>11}")
+    print(f"{'artifacts':>10} {mb(split[0]):>13} {mb(split[1]):>15} {split[2] or 0:>11}")
+    print(f"chat_history is {inline[0] / split[0]:.1f}x smaller; "
+          f"a history page reads {(inline[2] or 0) / max(split[2] or 1, 1):.1f}x fewer message bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Request-side cost of OTP email and password hashing, before and after
+moving them off the request path.
+
+email: a local aiosmtpd server stands in for the SMTP relay, with
+--handshake-latency added to each EHLO to model the TCP/TLS/login round
+trips of a real provider. The old send_otp_email opened one connection per
+message inside the request; Mailer queues the message and sends it over a
+reused connection from a background thread. Needs `pip install aiosmtpd`.
+
+hashing: --logins threads check bcrypt passwords at once while a "chat"
+thread runs a short CPU task every 10 ms. Unbounded, every login hashes
+at once; through PasswordHasher at most --hash-concurrency do. Reports
+login throughput and the chat task's p50/p99 latency.
+
+    python -m benchmarks.auth_offload
+    python -m benchmarks.auth_offload --emails 50 --handshake-latency 0.3 --logins 32 --hash-concurrency 1 2
+"""
+import time
+import socket
+import asyncio
+import smtplib
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+from aiosmtpd.controller import Controller # type: ignore
+from flask_bcrypt import Bcrypt # type: ignore
+
+from utils.mailer import Mailer
+from utils.password_hasher import PasswordHasher
+
+SENDER = "noreply@example.invalid"
+
+
+class CountingHandler:
+    """aiosmtpd handler that counts connections and messages and delays every EHLO."""
+
+    def __init__(self, handshake_latency):
+        self.handshake_latency = handshake_latency
+        self.connections = 0
+        self.messages = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        await asyncio.sleep(self.handshake_latency)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 OK"
+
+
+def send_per_request(port, to, otp):
+    # The old send_otp_email, minus STARTTLS and login, which the stand-in does not offer
+    msg = MIMEText(f"Your OTP for password reset is: {otp}")
+    msg["From"] = SENDER
+    msg["To"] = to
+    msg["Subject"] = "Password Reset OTP"
+    server = smtplib.SMTP("127.0.0.1", port)
+    server.sendmail(SENDER, to, msg.as_string())
+    server.quit()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_email(emails, handshake_latency):
+    handler = CountingHandler(handshake_latency)
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        print(f"{'email':>14} {'request p50 ms':>15} {'all sent s':>11} {'connections':>12}")
+
+        latencies = []
+        start = time.perf_counter()
+        for i in range(emails):
+            t = time.perf_counter()
+            send_per_request(port, f"user{i}@example.invalid", "123456")
+            latencies.append(time.perf_counter() - t)
+        total = time.perf_counter() - start
+        print(f"{'per request':>14} {statistics.median(latencies) * 1000:>15.1f} {total:>11.2f} {handler.connections:>12}")
+
+        handler.connections = 0
+        mailer = Mailer(host="127.0.0.1", port=port, sender=SENDER, password=None, starttls=False)
+        latencies, futures = [], []
+        start = time.perf_counter()
+        for i in range(emails):
+            t = time.perf_counter()
+            futures.append(mailer.send(f"user{i}@example.invalid", "Password Reset OTP", "Your OTP is: 123456"))
+            latencies.append(time.perf_counter() - t)
+        sent = sum(1 for future in futures if future.result())
+        total = time.perf_counter() - start
+        print(f"{'mailer':>14} {statistics.median(latencies) * 1000:>15.1f} {total:>11.2f} {handler.connections:>12}")
+        if sent != emails:
+            print(f"mailer delivered {sent} of {emails} messages")
+        mailer.close()
+    finally:
+        controller.stop()
+
+
+def bench_hashing(logins, rounds, caps):
+    bcrypt = Bcrypt()
+    bcrypt._log_rounds = rounds
+    pw_hash = bcrypt.generate_password_hash("Correct-horse-1").decode("utf-8")
+    print(f"{'hashing':>14} {'logins/s':>9} {'chat p50 ms':>12} {'chat p99 ms':>12}")
+
+    def run(check):
+        done = threading.Event()
+        probe = []
+
+        def chat():
+            while not done.is_set():
+                t = time.perf_counter()
+                sum(i * i for i in range(20000))
+                probe.append(time.perf_counter() - t)
+                time.sleep(0.01)
+
+        prober = threading.Thread(target=chat)
+        prober.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=logins) as pool:
+            list(pool.map(lambda _: check(pw_hash, "Correct-horse-1"), range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        prober.join()
+        probe.sort()
+        return logins / elapsed, probe[len(probe) // 2] * 1000, probe[int(len(probe) * 0.99)] * 1000
+
+    modes = [("unbounded", bcrypt.check_password_hash)]
+    modes += [(f"cap {cap}", PasswordHasher(bcrypt, max_concurrency=cap, queue_timeout=600).check) for cap in caps]
+    for name, check in modes:
+        rate, p50, p99 = run(check)
+        print(f"{name:>14} {rate:>9.1f} {p50:>12.2f} {p99:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=20)
+    parser.add_argument("--handshake-latency", type=float, default=0.2)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt log rounds (flask-bcrypt's default is 12)")
+    parser.add_argument("--hash-concurrency", type=int, nargs="+", default=[1, 2])
+    args = parser.parse_args()
+
+    bench_email(args.emails, args.handshake_latency)
+    print()
+    bench_hashing(args.logins, args.rounds, args.hash_concurrency)
+
+
+if __name__ == "__main__":
+    main()
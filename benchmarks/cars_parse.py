@@ -0,0 +1,220 @@
+"""
+Parse throughput of CarsSpider in items per second of CPU time.
+
+Every cached pakwheels.com page in the SQLite HTTP cache
+(.scrapy/httpcache/responses.sqlite3) is run through the callback the
+spider would use for it: search pages through parse_used_listing or
+parse_new_listing, with each card's request taken to its ad page if
+that page is cached too; used ads whose search page is not cached
+through parse_used_vehicle_detail. Without cached pages, synthetic
+pages shaped like PakWheels' search and ad pages are used. Items per
+second counts listing cards and ad items alike.
+
+--baseline loads another version of the spider module, e.g. one saved
+with `git show <commit>:gas_furnaces/spiders/cars.py > /tmp/cars_old.py`,
+times it on the same pages and checks both produce the same output.
+
+    python -m benchmarks.cars_parse
+    python -m benchmarks.cars_parse --baseline /tmp/cars_old.py --repeat 20
+"""
+import os
+import json
+import time
+import sqlite3
+import argparse
+import importlib.util
+
+import scrapy
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.project import data_path
+from scrapy.utils.test import get_crawler
+
+from gas_furnaces.httpcache import SQLiteCacheStorage
+from gas_furnaces.spiders.cars import VEHICLE_DETAIL_URL, CarsSpider
+
+BASE_URL = "https://www.pakwheels.com"
+
+
+def used_card(i):
+    ld = {"brand": {"name": "Toyota"}, "itemCondition": "used", "modelDate": 2015 + i % 8,
+          "manufacturer": "Toyota", "fuelType": "Petrol", "vehicleTransmission": "Automatic",
+          "vehicleEngine": {"engineDisplacement": "1300 cc"}, "mileageFromOdometer": f"{50 + i},000 km"}
+    return (f"<li class='classified-listing {'featured-listing' if i % 5 == 0 else ''}'>"
+            f"<script type='application/ld+json'>{json.dumps(ld)}</script>"
+            f"<a class='car-name' href='/used-cars/toyota-corolla-2018-for-sale-in-lahore-{i}/{7000000 + i}/'>"
+            f"<h3>Toyota Corolla GLi {i}</h3></a>"
+            f"<div class='price-details'>PKR {30 + i % 20}.5 <span>lacs</span></div>"
+            f"<ul class='search-vehicle-info'><li>Lahore</li><li>Punjab</li></ul>"
+            f"<ul class='search-vehicle-info-2'><li>2018</li><li>{50 + i},000 km</li><li>Petrol</li>"
+            f"<li>1300 cc</li><li>Automatic</li></ul>"
+            f"<div class='dated'>Updated {i % 23 + 1} hours ago</div></li>")
+
+
+def new_card(i):
+    ld = {"brand": {"name": "Honda"}, "model": "Civic", "modelDate": 2024, "manufacturer": "Honda",
+          "vehicleEngine": {"fuelType": "Petrol", "engineDisplacement": {"value": 1500}}, "category": "Sedan"}
+    return (f"<li><div class='new-car-box'><script type='application/ld+json'>{json.dumps(ld)}</script>"
+            f"<a class='car-name' href='/new-cars/honda/civic-{i}/'><h3>Honda Civic {i}</h3></a>"
+            f"<div class='price-details'>PKR 8,999,000</div>"
+            f"<ul class='ad-specs'><li>1500 cc</li><li> Petrol </li><li>Automatic</li></ul></div></li>")
+
+
+def spec_sections(prefix, sections=8, rows=12):
+    out = ""
+    for s in range(sections):
+        out += f"<div class='specs-wrapper'><h3 class='specs-heading'>{prefix} Section {s}</h3><table>"
+        for r in range(rows):
+            cell = ("<i class='fa fa-check'></i>" if r % 3 == 0 else
+                    "<i class='fa fa-times'></i>" if r % 3 == 1 else f" {r * 10} <span>mm</span> ")
+            out += f"<tr><td>Label {s} {r}:</td><td>{cell}</td></tr>"
+        out += "</table></div>"
+    return out
+
+
+def images(i):
+    url = f"//cache.pakwheels.com/ad_pictures/{i}"
+    slider = "".join(f"<li><img src='data:image/gif;base64,R0lGOD' data-original='{url}/{n}.jpg'></li>"
+                     for n in range(15))
+    thumbs = "".join(f"<img class='slider-thumb' src='{url}/{n}.jpg'>" for n in range(20))
+    return f"<ul class='lightSlider'>{slider}</ul><div class='lSGallery'>{thumbs}</div>"
+
+
+def used_detail(i):
+    labels = ["Registered In", "Color", "Assembly", "Engine Capacity", "Body Type", "Last Updated:", "Ad Ref #"]
+    details = "".join(f"<li class='ad-data'>{label}</li><li> Value  {n}\n</li>" for n, label in enumerate(labels))
+    comments = "".join(f"<div class='description-details'>Line {n} of the ad.<br>Second line.<label>Mention "
+                       f"PakWheels.com when calling</label></div>" for n in range(3))
+    return (f"<html><body><h1>Toyota Corolla GLi {i}</h1><ul id='scroll_car_detail'>{details}</ul>"
+            f"{spec_sections('Spec')}<div id='carfeatures'>{spec_sections('Feature', 4)}</div>"
+            f"{images(i)}{comments}</body></html>")
+
+
+def new_detail(i):
+    rows = "".join(f"<tr><td>Spec {n}:</td><td>{n * 3} units</td></tr>" for n in range(25))
+    ld = {"description": "The new Civic.", "color": ["White", "Black"], "fuelCapacity": {"value": 47},
+          "fuelEfficiency": {"value": 14}, "speed": {"maxValue": 200}, "width": {"value": 1800},
+          "height": {"value": 1415}, "wheelbase": {"value": 2735}, "weight": {"value": 1300}}
+    return (f"<html><body><script type='application/ld+json'>{json.dumps(ld)}</script>"
+            f"<table class='table table-striped'>{rows}</table>{spec_sections('Spec')}"
+            f"<div id='carfeatures'>{spec_sections('Feature', 4)}</div>{images(i)}</body></html>")
+
+
+def synthetic_pages(cards=25):
+    used_list = f"<html><body><ul>{''.join(used_card(i) for i in range(cards))}</ul>" \
+                f"<a class='next_page' href='/used-cars/search/-/?page=2'>Next</a></body></html>"
+    new_list = f"<html><body><ul>{''.join(new_card(i) for i in range(cards))}</ul></body></html>"
+    pages = {f"{BASE_URL}/used-cars/search/-/": used_list.encode(),
+             f"{BASE_URL}/new-cars/search/make_any/model_any/price_any_any/": new_list.encode()}
+    for i in range(cards):
+        used_url = f"{BASE_URL}/used-cars/toyota-corolla-2018-for-sale-in-lahore-{i}/{7000000 + i}/"
+        pages[used_url] = used_detail(i).encode()
+        pages[f"{BASE_URL}/new-cars/honda/civic-{i}/"] = new_detail(i).encode()
+    return pages
+
+
+def cached_pages(limit):
+    cache_path = os.path.join(data_path("httpcache"), "responses.sqlite3")
+    if not os.path.exists(cache_path):
+        return {}
+    crawler = get_crawler(CarsSpider, {"HTTPCACHE_EXPIRATION_SECS": 0})
+    spider = CarsSpider.from_crawler(crawler)
+    storage = SQLiteCacheStorage(crawler.settings)
+    storage.open_spider(spider)
+    urls = [url for (url,) in sqlite3.connect(cache_path).execute(
+        "SELECT url FROM responses WHERE domain LIKE '%pakwheels.com' AND status = 200 LIMIT ?", (limit,))]
+    pages = {}
+    for url in urls:
+        response = storage.retrieve_response(spider, Request(url))
+        if response is not None:
+            pages[url] = response.body
+    storage.close_spider(spider)
+    return pages
+
+
+def listing_callback(spider, url):
+    # The listing branch of CarsSpider.parse
+    if "/used-cars/" in url or "/used-bikes/" in url:
+        return spider.parse_used_listing
+    return spider.parse_new_listing
+
+
+def classify(pages):
+    """
+    Returns:
+        tuple: (listing URLs, URLs of used ads whose listing is not among the pages).
+    """
+    listings = [url for url in pages if "/search/" in url]
+    spider = CarsSpider()
+    linked = set()
+    for url in listings:
+        response = HtmlResponse(url, body=pages[url], encoding="utf-8", request=Request(url))
+        linked.update(r.url for r in listing_callback(spider, url)(response) if isinstance(r, scrapy.Request))
+    orphans = [url for url in pages if url not in linked and VEHICLE_DETAIL_URL.search(url)]
+    return listings, orphans
+
+
+def run_pages(spidercls, pages, listings, orphans):
+    """Parse the pages once with the spider's callbacks; returns the cards and items, in order."""
+    spider = spidercls()
+    output = []
+    for url in listings:
+        response = HtmlResponse(url, body=pages[url], encoding="utf-8", request=Request(url))
+        for result in listing_callback(spider, url)(response):
+            if not isinstance(result, scrapy.Request) or "basic_info" not in result.meta:
+                continue
+            output.append(dict(result.meta["basic_info"]))
+            if result.url in pages:
+                detail = HtmlResponse(result.url, body=pages[result.url], encoding="utf-8", request=result)
+                output.extend(result.callback(detail))
+    for url in orphans:
+        # An ad whose listing page is not cached: no card fields to start from
+        response = HtmlResponse(url, body=pages[url], encoding="utf-8", request=Request(url, meta={"basic_info": {}}))
+        output.extend(spider.parse_used_vehicle_detail(response))
+    return output
+
+
+def items_per_second(spidercls, pages, listings, orphans, repeat):
+    run_pages(spidercls, pages, listings, orphans)  # warm-up
+    start = time.process_time()
+    count = 0
+    for _ in range(repeat):
+        count += len(run_pages(spidercls, pages, listings, orphans))
+    return count / (time.process_time() - start)
+
+
+def load_baseline(path):
+    spec = importlib.util.spec_from_file_location("cars_baseline", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.CarsSpider
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="path of another cars.py to compare against")
+    parser.add_argument("--limit", type=int, default=500, help="most cached pages to load")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    pages = cached_pages(args.limit)
+    source = f"{len(pages)} cached pakwheels.com pages"
+    if not pages:
+        pages = synthetic_pages()
+        source = f"{len(pages)} synthetic PakWheels pages (no cached pages found)"
+    print(f"{source}, {args.repeat} rounds\n")
+
+    listings, orphans = classify(pages)
+    spiders = [("current", CarsSpider)]
+    if args.baseline:
+        spiders.insert(0, ("baseline", load_baseline(args.baseline)))
+        expected = run_pages(spiders[0][1], pages, listings, orphans)
+        assert run_pages(CarsSpider, pages, listings, orphans) == expected, "the spiders' output differs"
+        print(f"Same {len(expected)} cards and items from both\n")
+
+    print(f"{'':>10} {'items/s':>10}")
+    for name, spidercls in spiders:
+        print(f"{name:>10} {items_per_second(spidercls, pages, listings, orphans, args.repeat):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Time to first item of a scrape job: a `scrapy crawl` subprocess per job
+against crawls on the scrape worker's warm reactor (utils.crawler_service).
+
+A local HTTP server stands in for the scraped site. The fixture spider
+below yields an item from the start page and then requests /item-scraped,
+so the server sees the first request and the first item in the same
+clock as the submitting thread. Each approach runs --runs single jobs one
+after another, then --concurrent jobs at once, as when cars, ebay_items,
+gas and cnn jobs arrive together. The service's one-off startup is
+reported separately; the scrape worker pays it once, not per job.
+
+    python -m benchmarks.crawler_service
+    python -m benchmarks.crawler_service --runs 10 --concurrent 4
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scrapy
+from scrapy.utils.project import get_project_settings
+
+SPIDER_MODULES = "gas_furnaces.spiders,benchmarks.crawler_service"
+
+
+class FirstItemSpider(scrapy.Spider):
+    name = "bench_first_item"
+
+    def __init__(self, start_url=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.start_urls = [start_url]
+
+    def parse(self, response):
+        for title in response.css("li::text").getall():
+            yield {"title": title, "url": response.url}
+        yield scrapy.Request(response.urljoin("/item-scraped"), callback=self.done, dont_filter=True)
+
+    def done(self, response):
+        return None
+
+
+class FixtureSite:
+    """Serves the start page and records when each job's page and /item-scraped are requested."""
+
+    def __init__(self):
+        site = self
+        self.first_request = {}
+        self.first_item = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                now = time.perf_counter()
+                path, _, job = self.path.partition("?job=")
+                if path == "/page":
+                    site.first_request.setdefault(job, now)
+                    body = "<html><ul>" + "".join(f"<li>item {i}</li>" for i in range(20)) + "</ul></html>"
+                elif path == "/item-scraped":
+                    site.first_item.setdefault(self.headers.get("Referer", "").partition("?job=")[2], now)
+                    body = "ok"
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, job):
+        return f"{self.base_url}/page?job={job}"
+
+
+def run_subprocess(site, jobs, output_dir):
+    start = time.perf_counter()
+    processes = [subprocess.Popen([
+        "scrapy", "crawl", FirstItemSpider.name,
+        "-a", f"start_url={site.url(job)}",
+        "-O", f"{os.path.join(output_dir, job)}.jsonl:jsonlines",
+        "-s", f"SPIDER_MODULES={SPIDER_MODULES}",
+        "-s", "LOG_LEVEL=WARNING",
+        "-s", "HTTPCACHE_ENABLED=False",
+        "-s", "INCREMENTAL_ENABLED=False",
+    ]) for job in jobs]
+    for process in processes:
+        process.wait()
+    return start, time.perf_counter()
+
+
+def run_service(service, site, jobs, output_dir):
+    start = time.perf_counter()
+    crawls = [service.submit(FirstItemSpider.name, site.url(job), f"{os.path.join(output_dir, job)}.jsonl")
+              for job in jobs]
+    for crawl in crawls:
+        crawl.wait()
+        crawl.raise_for_error()
+    return start, time.perf_counter()
+
+
+def report(name, site, batches):
+    first_request, first_item, done = [], [], []
+    for start, end, jobs in batches:
+        for job in jobs:
+            first_request.append((site.first_request[job] - start) * 1000)
+            first_item.append((site.first_item[job] - start) * 1000)
+        done.append((end - start) * 1000)
+    print(f"{name:>22} {statistics.median(first_request):>16.0f} {statistics.median(first_item):>14.0f} "
+          f"{max(first_item):>10.0f} {statistics.median(done):>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--concurrent", type=int, default=4)
+    args = parser.parse_args()
+
+    site = FixtureSite()
+    with tempfile.TemporaryDirectory() as output_dir:
+        settings = get_project_settings()
+        settings.set("SPIDER_MODULES", SPIDER_MODULES.split(","), priority="cmdline")
+        settings.set("LOG_LEVEL", "WARNING", priority="cmdline")
+        # Every job must reach the fixture site, and not touch the real cache or page store
+        settings.set("HTTPCACHE_ENABLED", False, priority="cmdline")
+        settings.set("INCREMENTAL_ENABLED", False, priority="cmdline")
+        started = time.perf_counter()
+        from utils.crawler_service import CrawlerService
+        service = CrawlerService(settings)
+        print(f"Crawler service startup (once per worker): {(time.perf_counter() - started) * 1000:.0f} ms\n")
+
+        print(f"{'':>22} {'first request ms':>16} {'first item ms':>14} {'worst ms':>10} {'all done ms':>12}")
+        for name, run in (("subprocess", lambda jobs: run_subprocess(site, jobs, output_dir)),
+                          ("service", lambda jobs: run_service(service, site, jobs, output_dir))):
+            batches = []
+            for i in range(args.runs):
+                jobs = [f"{name}-single-{i}"]
+                batches.append((*run(jobs), jobs))
+            report(f"{name}, 1 job", site, batches)
+            jobs = [f"{name}-concurrent-{i}" for i in range(args.concurrent)]
+            report(f"{name}, {args.concurrent} at once", site, [(*run(jobs), jobs)])
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
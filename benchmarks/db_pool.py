@@ -0,0 +1,105 @@
+"""
+/get_chat_history latency with pooled connections vs. a new connection per request.
+
+Runs against the Postgres configured by the POSTGRES_* variables (the same
+.env the app uses). A throwaway user and chat session with --messages rows
+are seeded, the route is called through Flask's test client from
+--concurrency threads, and the user is deleted again at the end.
+
+    python -m benchmarks.db_pool
+    python -m benchmarks.db_pool --requests 2000 --concurrency 1 8 32 --messages 50
+"""
+import os
+import time
+import argparse
+import statistics
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import app as web
+from utils.db_pool import ConnectionPool, get_db_connection
+
+BENCH_EMAIL = "db-pool-benchmark@example.invalid"
+
+
+class UnpooledConnections:
+    """The pre-pool behaviour: connect for every request and close afterwards."""
+
+    @contextmanager
+    def connection(self):
+        conn = get_db_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def seed(messages):
+    with web.db_pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE email = %s", (BENCH_EMAIL,))
+        cur.execute(
+            "INSERT INTO users (full_name, email, password_hash) VALUES ('Benchmark', %s, '-') RETURNING id",
+            (BENCH_EMAIL,)
+        )
+        user_id = cur.fetchone()[0]
+        cur.execute("INSERT INTO chat_sessions (user_id, title) VALUES (%s, 'benchmark') RETURNING session_id", (user_id,))
+        session_id = cur.fetchone()[0]
+        cur.executemany(
+            "INSERT INTO chat_history (chat_session_id, user_id, sender, message) VALUES (%s, %s, %s, %s)",
+            [(session_id, user_id, "user" if i % 2 == 0 else "bot", f"benchmark message {i}") for i in range(messages)]
+        )
+        conn.commit()
+    return user_id, session_id
+
+
+def cleanup():
+    with web.db_pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE email = %s", (BENCH_EMAIL,))
+        conn.commit()
+
+
+def run(user_id, session_id, requests, concurrency):
+    def worker(count):
+        client = web.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get(f"/get_chat_history?session_id={session_id}")
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        return latencies
+
+    per_thread = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return [latency for latencies in pool.map(worker, per_thread) for latency in latencies]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--messages", type=int, default=100, help="rows in the seeded chat session")
+    args = parser.parse_args()
+
+    web.app.secret_key = web.app.secret_key or os.urandom(24)
+    pooled = web.db_pool
+    user_id, session_id = seed(args.messages)
+    try:
+        print(f"{'mode':>9} {'threads':>8} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9}")
+        for concurrency in args.concurrency:
+            for name, connections in (("unpooled", UnpooledConnections()), ("pooled", ConnectionPool())):
+                web.db_pool = connections
+                run(user_id, session_id, concurrency, concurrency)  # open the pool's connections first
+                latencies = sorted(run(user_id, session_id, args.requests, concurrency))
+                p50 = statistics.median(latencies) * 1000
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+                print(f"{name:>9} {concurrency:>8} {len(latencies):>9} {p50:>9.2f} {p99:>9.2f}")
+    finally:
+        web.db_pool = pooled
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
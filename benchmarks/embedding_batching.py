@@ -0,0 +1,58 @@
+"""
+Compare per-request and micro-batched embedding throughput.
+
+Each simulated upload embeds CHUNKS texts. In per-request mode every upload
+calls the model on its own thread; in batched mode the uploads go through
+the shared MicroBatchExecutor.
+
+    python -m benchmarks.embedding_batching
+    python -m benchmarks.embedding_batching --chunks 32 --concurrency 1 4 16
+"""
+import argparse
+import time
+import threading
+
+from utils.embeddings import MicroBatchExecutor, get_embeddings, EMBED_MAX_BATCH, EMBED_MAX_WAIT_MS
+
+
+def make_uploads(count, chunks):
+    return [
+        [f"Upload {u} chunk {c}: furnace efficiency, warranty terms and installation notes." for c in range(chunks)]
+        for u in range(count)
+    ]
+
+
+def run_concurrently(uploads, embed):
+    threads = [threading.Thread(target=embed, args=(texts,)) for texts in uploads]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=16, help="chunks per upload")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-batch", type=int, default=EMBED_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=EMBED_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    model = get_embeddings()
+    model.embed_documents(["warm-up"])
+    executor = MicroBatchExecutor(model.embed_documents, args.max_batch, args.max_wait_ms)
+
+    print(f"{'uploads':>8} {'per-request texts/s':>20} {'batched texts/s':>16} {'speedup':>8}")
+    for concurrency in args.concurrency:
+        uploads = make_uploads(concurrency, args.chunks)
+        total = concurrency * args.chunks
+        direct = run_concurrently(uploads, model.embed_documents)
+        batched = run_concurrently(uploads, executor.embed)
+        print(f"{concurrency:>8} {total / direct:>20.1f} {total / batched:>16.1f} {direct / batched:>7.2f}x")
+    print(executor.stats())
+
+
+if __name__ == "__main__":
+    main()
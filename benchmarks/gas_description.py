@@ -0,0 +1,168 @@
+"""
+CPU time per product page of GasSpider.parse_product: the old BeautifulSoup
+description pipeline (clean_and_prettify_html + simplify_html, three
+html.parser parses and three prettify calls) against the lxml walk over
+the tree parsel already built (GasSpider.clean_description).
+
+Product pages come from --pages-dir (saved .html files), else from the
+lennoxpros.com responses in the SQLite HTTP cache the gas spider left in
+.scrapy/httpcache/, else from a synthetic page shaped like a LennoxPros
+product page. Each page is parsed from scratch every time, as a fresh
+response would be.
+
+    pip install beautifulsoup4  # only for the old pipeline
+    python -m benchmarks.gas_description
+    python -m benchmarks.gas_description --pages-dir saved_pages/ --repeat 200
+"""
+import os
+import re
+import time
+import sqlite3
+import argparse
+import statistics
+
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.project import data_path
+from scrapy.utils.test import get_crawler
+
+from gas_furnaces.httpcache import SQLiteCacheStorage
+from gas_furnaces.spiders.gas import GasSpider
+
+PRODUCT_URL = "https://www.lennoxpros.com/hvac/furnaces/gas-furnaces/p/bench"
+
+
+def legacy_description(html_content):
+    """The description pipeline parse_product ran before, kept as the baseline."""
+    from bs4 import BeautifulSoup, Comment
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+    for link in soup.find_all('a', href=True):
+        if '.pdf' in link['href']:
+            parent_div = link.find_parent('div')
+            if parent_div:
+                parent_div.decompose()
+    clean_text = re.sub(r'[Ââ€¢€™®]', '', str(soup)).replace('\t', '').strip()
+    prettified_html = BeautifulSoup(clean_text, 'html.parser').prettify()
+
+    soup = BeautifulSoup(prettified_html, 'html.parser')
+    for h2_tag in soup.find_all('h2'):
+        if 'Product Overview' in h2_tag.get_text():
+            h2_tag.decompose()
+    for tag in soup.find_all(['div', 'span', 'style']):
+        tag.unwrap()
+    for p in soup.find_all('p'):
+        if not p.get_text(strip=True):
+            p.decompose()
+    cleaned_html = soup.prettify()
+    cleaned_html = ' '.join(line.strip() for line in cleaned_html.splitlines() if line.strip())
+    return soup.prettify()
+
+
+def synthetic_page():
+    features = "".join(
+        f"<!-- feature {i} --><div class='feature'><span>Feature {i}:</span> <p>Â• Two-stage gas valve "
+        f"with\tvariable-speed blower â€™ quiet operation™ and SureLight® ignition, part {i}.</p><p> </p></div>"
+        for i in range(40)
+    )
+    overview = (
+        "<div class='col-12 col-xl-8 Product-overview'><h2>Product Overview</h2>"
+        "<style>.Product-overview p { margin: 0 }</style>"
+        f"<div class='row'><div class='col'>{features}</div></div>"
+        "<div class='docs'><a href='/medias/ML180-installation.pdf'>Installation Instructions</a></div>"
+        "<ul>" + "".join(f"<li><span>Up to {80 + i}% AFUE</span></li>" for i in range(15)) + "</ul></div>"
+    )
+    specs = "".join(
+        f"<div class='specification-container row'><span class='title col'><div>Spec {i}</div></span>"
+        f"<span class='description col'><div>Value {i}</div></span></div>" for i in range(35)
+    )
+    specs += ("<div class='specification-container row'><span class='title col'><div>Brand</div></span>"
+              "<span class='description col'><div>Lennox</div></span></div>"
+              "<div class='specification-container row'><span class='title col'><div>Model/Part Number</div></span>"
+              "<span class='description col'><div>ML180UH090P48C</div></span></div>")
+    chrome = "".join(f"<li><a href='/hvac/c/r{i}'>Category {i}</a></li>" for i in range(400))
+    scripts = "<script>window.dataLayer = window.dataLayer || [];</script>" * 50
+    return (f"<html><head>{scripts}</head><body><nav><ul>{chrome}</ul></nav>"
+            f"<h1>Lennox ML180UH090P48C Gas Furnace</h1>{overview}{specs}<footer>{chrome}</footer></body></html>")
+
+
+def load_pages(pages_dir, limit):
+    if pages_dir:
+        names = sorted(n for n in os.listdir(pages_dir) if n.endswith((".html", ".htm")))[:limit]
+        pages = []
+        for name in names:
+            with open(os.path.join(pages_dir, name), "rb") as f:
+                pages.append((PRODUCT_URL, f.read()))
+        return pages, f"{len(pages)} pages from {pages_dir}"
+
+    cache_path = os.path.join(data_path("httpcache"), "responses.sqlite3")
+    if os.path.exists(cache_path):
+        crawler = get_crawler(GasSpider, {"HTTPCACHE_EXPIRATION_SECS": 0})
+        spider = GasSpider.from_crawler(crawler)
+        storage = SQLiteCacheStorage(crawler.settings)
+        storage.open_spider(spider)
+        urls = [url for (url,) in sqlite3.connect(cache_path).execute(
+            "SELECT url FROM responses WHERE domain LIKE '%lennoxpros.com' AND url LIKE '%/p/%' LIMIT ?", (limit,))]
+        pages = []
+        for url in urls:
+            response = storage.retrieve_response(spider, Request(url))
+            if response is not None:
+                pages.append((url, response.body))
+        storage.close_spider(spider)
+        if pages:
+            return pages, f"{len(pages)} product pages from {cache_path}"
+
+    return [(PRODUCT_URL, synthetic_page().encode())], "1 synthetic product page (no saved pages found)"
+
+
+def cpu_ms_per_page(pages, repeat, run, parsed=False):
+    """Mean CPU time of run(response); with `parsed`, parsel's parse of the page is left out."""
+    times = []
+    for _ in range(repeat):
+        for url, body in pages:
+            response = HtmlResponse(url, body=body, encoding="utf-8",
+                                    request=Request(url, meta={"image_url": f"{url}.jpg?$product_related$"}))
+            if parsed:
+                response.selector.root
+            start = time.process_time()
+            run(response)
+            times.append((time.process_time() - start) * 1000)
+    return statistics.mean(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages-dir")
+    parser.add_argument("--limit", type=int, default=50, help="most pages to load")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    pages, source = load_pages(args.pages_dir, args.limit)
+    print(f"{source}, {args.repeat} rounds\n")
+
+    plain = GasSpider()
+    described = GasSpider(description="1")
+    selector = "div.col-12.col-xl-8.Product-overview"
+    # (name, run, whether the page's parse is left out of the time)
+    runs = [
+        ("parse_product, no description", lambda r: list(plain.parse_product(r)), False),
+        ("parse_product, description", lambda r: list(described.parse_product(r)), False),
+        ("description stage, lxml walk", lambda r: described.clean_description(r.css(selector)[0].root), True),
+    ]
+    try:
+        import bs4  # noqa: F401
+        runs.append(("description stage, old bs4", lambda r: legacy_description(r.css(selector).get()), True))
+        # What every item cost before: the description was always cleaned, then left out of the item
+        runs.append(("parse_product, old pipeline",
+                     lambda r: (list(plain.parse_product(r)), legacy_description(r.css(selector).get())), False))
+    except ImportError:
+        print("beautifulsoup4 is not installed; skipping the old pipeline\n")
+
+    print(f"{'':>30} {'CPU ms/page':>12}")
+    for name, run, parsed in runs:
+        print(f"{name:>30} {cpu_ms_per_page(pages, args.repeat, run, parsed):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Scrapy's FilesystemCacheStorage vs. the project's SQLiteCacheStorage
+(gas_furnaces/httpcache.py).
+
+footprint: copies every response in the filesystem cache the ebay_items
+spider left in .scrapy/httpcache/ into a scratch SQLite cache, then
+compares files, disk usage and the time to look every response up
+(including the gunzip the filesystem cache's bodies still need, and
+checking each page comes back intact).
+
+re-scrape: a local site answers every page after --latency seconds. The
+fixture spider crawls --pages pages through the SQLite cache twice; the
+second run should send no request to the site.
+
+    python -m benchmarks.http_cache
+    python -m benchmarks.http_cache --pages 50 --latency 0.5
+"""
+import os
+import time
+import pickle
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scrapy
+from scrapy.extensions.httpcache import FilesystemCacheStorage
+from scrapy.http import Headers, Request
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path, get_project_settings
+from scrapy.utils.test import get_crawler
+from w3lib.http import headers_raw_to_dict
+
+from gas_furnaces.httpcache import SQLiteCacheStorage, decode_body
+
+SPIDER_MODULES = "gas_furnaces.spiders,benchmarks.http_cache"
+
+
+class ListingSpider(scrapy.Spider):
+    name = "bench_listing"
+
+    def __init__(self, start_url=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.start_urls = [start_url]
+
+    def parse(self, response):
+        for href in response.css("a::attr(href)").getall():
+            yield response.follow(href, callback=self.parse_item)
+
+    def parse_item(self, response):
+        yield {"url": response.url, "title": response.css("h1::text").get()}
+
+
+def disk_usage(path):
+    files, blocks = 0, 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            blocks += os.stat(os.path.join(root, name)).st_blocks * 512
+    return files, blocks
+
+
+def load_filesystem_cache(spider_dir):
+    """Yield (request, response) for every entry of a FilesystemCacheStorage spider directory."""
+    for prefix in sorted(os.listdir(spider_dir)):
+        for key in sorted(os.listdir(os.path.join(spider_dir, prefix))):
+            rpath = os.path.join(spider_dir, prefix, key)
+            with open(os.path.join(rpath, "pickled_meta"), "rb") as f:
+                meta = pickle.load(f)
+            with open(os.path.join(rpath, "response_headers"), "rb") as f:
+                headers = Headers(headers_raw_to_dict(f.read()))
+            with open(os.path.join(rpath, "response_body"), "rb") as f:
+                body = f.read()
+            respcls = responsetypes.from_args(headers=headers, url=meta["response_url"], body=body)
+            yield (Request(meta["url"], method=meta["method"]),
+                   respcls(url=meta["response_url"], headers=headers, status=meta["status"], body=body))
+
+
+def open_storage(storage_cls, settings, spider_name):
+    crawler = get_crawler(scrapy.Spider, settings)
+    spider = scrapy.Spider.from_crawler(crawler, name=spider_name)
+    storage = storage_cls(crawler.settings)
+    storage.open_spider(spider)
+    return storage, spider
+
+
+def bench_footprint(cache_dir):
+    spider_dir = os.path.join(data_path("httpcache"), "ebay_items")
+    if not os.path.isdir(spider_dir):
+        print(f"No filesystem cache at {spider_dir}; run the ebay_items spider with FilesystemCacheStorage first")
+        return
+    entries = list(load_filesystem_cache(spider_dir))
+    fs_files, fs_bytes = disk_usage(spider_dir)
+
+    settings = {"HTTPCACHE_DIR": cache_dir, "HTTPCACHE_EXPIRATION_SECS": 0, "HTTPCACHE_MAX_BYTES": 0}
+    sqlite_storage, spider = open_storage(SQLiteCacheStorage, settings, "ebay_items")
+    for request, response in entries:
+        sqlite_storage.store_response(spider, request, response)
+    sqlite_storage.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db_files, db_bytes = disk_usage(cache_dir)
+
+    fs_storage, _ = open_storage(FilesystemCacheStorage, {"HTTPCACHE_EXPIRATION_SECS": 0}, "ebay_items")
+    timings = {}
+    for name, storage in (("filesystem", fs_storage), ("sqlite", sqlite_storage)):
+        start = time.perf_counter()
+        responses = [storage.retrieve_response(spider, request) for request, _ in entries]
+        # HttpCompressionMiddleware gunzips the filesystem cache's bodies after every lookup
+        bodies = [decode_body(r.headers, r.body)[1] for r in responses]
+        timings[name] = ((time.perf_counter() - start) / len(entries) * 1000, sum(r is not None for r in responses))
+    sqlite_storage.close_spider(spider)
+    # The SQLite cache returns bodies decoded; the page itself must be unchanged
+    for (_, original), body in zip(entries, bodies):
+        assert body == decode_body(original.headers, original.body)[1], original.url
+
+    print(f"{len(entries)} cached ebay_items responses")
+    print(f"{'':>12} {'files':>7} {'disk MB':>9} {'lookup ms':>10} {'hits':>6}")
+    print(f"{'filesystem':>12} {fs_files:>7} {fs_bytes / 1e6:>9.1f} {timings['filesystem'][0]:>10.2f} "
+          f"{timings['filesystem'][1]:>6}")
+    print(f"{'sqlite':>12} {db_files:>7} {db_bytes / 1e6:>9.1f} {timings['sqlite'][0]:>10.2f} "
+          f"{timings['sqlite'][1]:>6}")
+
+
+class SlowSite:
+    """A listing page linking to `pages` item pages, each answered after `latency` seconds."""
+
+    def __init__(self, pages, latency):
+        site = self
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/robots.txt":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                site.requests += 1
+                time.sleep(latency)
+                if self.path == "/list":
+                    body = "".join(f'<a href="/item/{i}">item {i}</a>' for i in range(pages))
+                else:
+                    body = f"<h1>{self.path}</h1>" + "<p>Specifications and description</p>" * 200
+                data = f"<html><body>{body}</body></html>".encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/list"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def bench_rescrape(cache_dir, pages, latency):
+    from utils.crawler_service import CrawlerService
+
+    site = SlowSite(pages, latency)
+    settings = get_project_settings()
+    settings.set("SPIDER_MODULES", SPIDER_MODULES.split(","), priority="cmdline")
+    settings.set("HTTPCACHE_DIR", cache_dir, priority="cmdline")
+    settings.set("LOG_LEVEL", "WARNING", priority="cmdline")
+    service = CrawlerService(settings)
+
+    print(f"\nCrawl of 1 + {pages} pages, {latency * 1000:.0f} ms per response")
+    print(f"{'':>12} {'seconds':>8} {'requests':>9}")
+    with tempfile.TemporaryDirectory() as output_dir:
+        for run in ("cold cache", "warm cache"):
+            before = site.requests
+            start = time.perf_counter()
+            crawl = service.submit(ListingSpider.name, site.url, os.path.join(output_dir, "items.jsonl"))
+            crawl.wait()
+            crawl.raise_for_error()
+            print(f"{run:>12} {time.perf_counter() - start:>8.2f} {site.requests - before:>9}")
+    service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as footprint_dir, tempfile.TemporaryDirectory() as rescrape_dir:
+        bench_footprint(footprint_dir)
+        bench_rescrape(rescrape_dir, args.pages, args.latency)
+
+
+if __name__ == "__main__":
+    main()
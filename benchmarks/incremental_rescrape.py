@@ -0,0 +1,165 @@
+"""
+Re-scrapes of one listing page with and without incremental mode
+(gas_furnaces/incremental.py).
+
+A local site serves a listing of --pages cards linking to item pages, each
+answered after --latency seconds, with an ETag that follows the page's
+content. The fixture spider opts its detail requests in the way the cars
+and ebay_items spiders do. Each mode crawls the listing four times through
+the scrape worker's CrawlerService, with the HTTP cache off:
+
+    first         nothing stored yet
+    unchanged     same cards, same pages
+    cards edited  every card's text changes, the pages do not (ETag -> 304)
+    pages edited  a quarter of the pages change along with their cards
+
+Every run must output one item per card.
+
+    python -m benchmarks.incremental_rescrape
+    python -m benchmarks.incremental_rescrape --pages 50 --latency 0.5
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scrapy
+from scrapy.utils.project import get_project_settings
+
+SPIDER_MODULES = "gas_furnaces.spiders,benchmarks.incremental_rescrape"
+
+
+class IncrementalListingSpider(scrapy.Spider):
+    name = "bench_incremental_listing"
+
+    def __init__(self, start_url=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.start_urls = [start_url]
+
+    def parse(self, response):
+        for card in response.css("li"):
+            url = response.urljoin(card.css("a::attr(href)").get())
+            listing = {"title": card.css("a::text").get(), "price": card.css("span::text").get()}
+            yield scrapy.Request(url, callback=self.parse_item, dont_filter=True,
+                                 meta={"incremental": {"key": url, "listing": listing}})
+
+    def parse_item(self, response):
+        yield {"url": response.url, "title": response.css("h1::text").get(),
+               "specs": response.css("p::text").getall()[:5]}
+
+
+class FixtureSite:
+    """A listing page and item pages whose content, and so ETag, change with their version."""
+
+    def __init__(self, pages, latency):
+        site = self
+        self.pages = pages
+        self.card_version = 0
+        self.page_versions = [0] * pages
+        self.requests = 0
+        self.not_modified = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/robots.txt":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                site.requests += 1
+                time.sleep(latency)
+                if self.path == "/list":
+                    body = "".join(f'<li><a href="/item/{i}">item {i}</a><span>{100 + i}.{site.card_version}</span></li>'
+                                   for i in range(site.pages))
+                    self.respond(f"<ul>{body}</ul>")
+                    return
+                i = int(self.path.rsplit("/", 1)[1])
+                body = f"<h1>item {i} v{site.page_versions[i]}</h1>" + "<p>Specifications</p>" * 200
+                etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.respond(body, etag)
+
+            def respond(self, body, etag=None):
+                data = f"<html><body>{body}</body></html>".encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(data)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/list"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def count_items(path):
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for line in f if json.loads(line))
+
+
+def bench(service, pages, latency, output_dir):
+    site = FixtureSite(pages, latency)
+    runs = []
+    for run in ("first", "unchanged", "cards edited", "pages edited"):
+        if run == "cards edited":
+            site.card_version += 1
+        elif run == "pages edited":
+            site.card_version += 1
+            for i in range(0, pages, 4):
+                site.page_versions[i] += 1
+        requests, not_modified = site.requests, site.not_modified
+        output = os.path.join(output_dir, "items.jsonl")
+        start = time.perf_counter()
+        crawl = service.submit(IncrementalListingSpider.name, site.url, output)
+        crawl.wait()
+        crawl.raise_for_error()
+        elapsed = time.perf_counter() - start
+        items = count_items(output)
+        assert items == pages, f"{run}: {items} items for {pages} cards"
+        runs.append((run, elapsed, site.requests - requests, site.not_modified - not_modified,
+                     crawl.stats.get("incremental/requests_saved", 0)))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    from utils.crawler_service import CrawlerService
+
+    settings = get_project_settings()
+    settings.set("SPIDER_MODULES", SPIDER_MODULES.split(","), priority="cmdline")
+    settings.set("HTTPCACHE_ENABLED", False, priority="cmdline")
+    settings.set("LOG_LEVEL", "WARNING", priority="cmdline")
+    service = CrawlerService(settings)
+
+    print(f"Listing of {args.pages} cards, {args.latency * 1000:.0f} ms per response")
+    print(f"{'':>30} {'seconds':>8} {'requests':>9} {'304s':>5} {'saved':>6}")
+    with tempfile.TemporaryDirectory() as output_dir:
+        for mode, enabled in (("full", False), ("incremental", True)):
+            with tempfile.TemporaryDirectory() as store_dir:
+                service.settings.set("INCREMENTAL_ENABLED", enabled, priority="cmdline")
+                service.settings.set("INCREMENTAL_DIR", store_dir, priority="cmdline")
+                for run, elapsed, requests, not_modified, saved in bench(service, args.pages, args.latency,
+                                                                         output_dir):
+                    print(f"{mode + ', ' + run:>30} {elapsed:>8.2f} {requests:>9} {not_modified:>5} {saved:>6}")
+    service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Chat throughput with 100 concurrent chatters against a stub LLM, comparing
+blocking calls from 4 sync workers with the asyncio LLM gateway.
+
+The stub answers every prompt after a fixed latency, like a slow Groq call,
+without any network access. In "sync" a call holds one of --workers slots
+for its whole duration, the way a `gunicorn -w 4` sync worker is pinned by
+one request. In "gateway" every chatter has its own request thread, as with
+gthread workers, and the calls go through LLMGateway with the given cap.
+
+    python -m benchmarks.llm_gateway_load
+    python -m benchmarks.llm_gateway_load --chatters 100 --latency 1.5 --caps 8 32 100
+"""
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.llm_gateway import LLMGateway
+
+
+class StubLLM:
+    """Stands in for ChatGroq: invoke/ainvoke/astream that only wait `latency` seconds."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return f"stub answer to: {prompt}"
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency)
+        return f"stub answer to: {prompt}"
+
+    async def astream(self, prompt):
+        for word in f"stub answer to: {prompt}".split():
+            await asyncio.sleep(self.latency / 5)
+            yield word
+
+
+def run_load(call, chatters, messages):
+    """
+    Have `chatters` users send `messages` messages each, all at once.
+    Returns:
+        tuple: (wall-clock seconds, per-request latencies including time spent queued).
+    """
+    def chatter(user):
+        latencies = []
+        for message in range(messages):
+            start = time.perf_counter()
+            call(f"user {user} message {message}")
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=chatters) as pool:
+        results = list(pool.map(chatter, range(chatters)))
+    return time.perf_counter() - start, [latency for latencies in results for latency in latencies]
+
+
+def report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:>16} {len(latencies):>9} {elapsed:>9.2f} {len(latencies) / elapsed:>8.1f} {p50:>8.2f} {p99:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chatters", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=3, help="messages sent by each chatter")
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds the stub takes per answer")
+    parser.add_argument("--workers", type=int, default=4, help="sync worker processes in the baseline")
+    parser.add_argument("--caps", type=int, nargs="+", default=[8, 32, 100], help="gateway concurrency caps")
+    args = parser.parse_args()
+
+    llm = StubLLM(args.latency)
+    print(f"{args.chatters} chatters x {args.messages} messages, stub latency {args.latency}s")
+    print(f"{'mode':>16} {'requests':>9} {'seconds':>9} {'req/s':>8} {'p50 s':>8} {'p99 s':>8}")
+
+    # A sync worker is busy for the whole model call, so requests queue for one of `workers` slots
+    workers = threading.Semaphore(args.workers)
+
+    def sync_call(prompt):
+        with workers:
+            return llm.invoke(prompt)
+
+    report(f"sync -w {args.workers}", *run_load(sync_call, args.chatters, args.messages))
+
+    for cap in args.caps:
+        gateway = LLMGateway(llm, max_concurrency=cap, queue_timeout=3600)
+        report(f"gateway cap {cap}", *run_load(gateway.invoke, args.chatters, args.messages))
+
+
+if __name__ == "__main__":
+    main()
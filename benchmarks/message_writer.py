@@ -0,0 +1,89 @@
+"""
+Chat turns persisted per second: one commit per message (the old /ask
+behaviour) vs. one multi-row commit per turn vs. the write-behind queue.
+
+Runs against the Postgres configured by the POSTGRES_* variables. A
+throwaway user and chat session are created, --turns turns of a user
+message plus a bot answer are written from --concurrency threads, and the
+user (with its messages) is deleted again at the end.
+
+    python -m benchmarks.message_writer
+    python -m benchmarks.message_writer --turns 5000 --concurrency 1 16
+"""
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.db_pool import ConnectionPool
+from utils.message_writer import MessageWriter
+
+BENCH_EMAIL = "message-writer-benchmark@example.invalid"
+ANSWER = "A furnace rated at 95% AFUE turns 95% of its fuel into heat. " * 20
+
+
+def seed(pool):
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE email = %s", (BENCH_EMAIL,))
+        cur.execute(
+            "INSERT INTO users (full_name, email, password_hash) VALUES ('Benchmark', %s, '-') RETURNING id",
+            (BENCH_EMAIL,)
+        )
+        user_id = cur.fetchone()[0]
+        cur.execute("INSERT INTO chat_sessions (user_id, title) VALUES (%s, 'benchmark') RETURNING session_id", (user_id,))
+        session_id = cur.fetchone()[0]
+        conn.commit()
+    return user_id, session_id
+
+
+def cleanup(pool):
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE email = %s", (BENCH_EMAIL,))
+        conn.commit()
+
+
+def run(writer, write_turn, turns, concurrency):
+    """Write `turns` turns and wait until all of them are committed; returns seconds."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(write_turn, range(turns)))
+    writer.flush(timeout=60)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    pool = ConnectionPool(max_size=max(args.concurrency) + 1)
+    user_id, session_id = seed(pool)
+    try:
+        print(f"{'mode':>14} {'threads':>8} {'turns/s':>9} {'commits':>8} {'commits/s':>10}")
+        for concurrency in args.concurrency:
+            per_turn = MessageWriter(pool, write_behind=False)
+            write_behind = MessageWriter(pool, write_behind=True)
+
+            def per_message(turn):
+                # Two writes, so each message is its own INSERT and COMMIT
+                per_turn.write(session_id, user_id, [("user", f"question {turn}")])
+                per_turn.write(session_id, user_id, [("bot", ANSWER)])
+
+            modes = (
+                ("per message", per_turn, per_message),
+                ("per turn", per_turn,
+                 lambda turn: per_turn.write(session_id, user_id, [("user", f"question {turn}"), ("bot", ANSWER)])),
+                ("write-behind", write_behind,
+                 lambda turn: write_behind.write(session_id, user_id, [("user", f"question {turn}"), ("bot", ANSWER)])),
+            )
+            for name, writer, write_turn in modes:
+                commits_before = writer.stats()["commits"]
+                elapsed = run(writer, write_turn, args.turns, concurrency)
+                commits = writer.stats()["commits"] - commits_before
+                print(f"{name:>14} {concurrency:>8} {args.turns / elapsed:>9.1f} {commits:>8} {commits / elapsed:>10.1f}")
+    finally:
+        cleanup(pool)
+
+
+if __name__ == "__main__":
+    main()
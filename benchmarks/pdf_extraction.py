@@ -0,0 +1,101 @@
+"""
+Wall-clock scaling of PDF text extraction with the number of pool processes,
+for each extraction backend.
+
+Synthetic PDFs of 10, 100 and 1000 pages are written to a temporary
+directory and extracted with 1, 2, 4 ... os.cpu_count() workers.
+
+    python -m benchmarks.pdf_extraction
+    python -m benchmarks.pdf_extraction --pages 100 1000 --workers 1 4 8 --backends pypdf2
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from utils.pdf_extraction import PDF_BACKENDS, extract_pdf_text
+
+LINES_PER_PAGE = 40
+
+
+def write_synthetic_pdf(path, pages):
+    """Write a minimal multi-page PDF with LINES_PER_PAGE lines of Helvetica text per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = [b"BT /F1 10 Tf 50 780 Td 12 TL"]
+        for line in range(LINES_PER_PAGE):
+            lines.append(f"(Page {page + 1} line {line + 1}: gas furnace efficiency and warranty terms.) '".encode())
+        lines.append(b"ET")
+        stream = b"\n".join(lines)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = [b"%PDF-1.4\n"]
+    offsets = []
+    position = len(out[0])
+    for number, body in enumerate(objects, 1):
+        chunk = b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        offsets.append(position)
+        out.append(chunk)
+        position += len(chunk)
+    xref = [b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)]
+    xref.extend(b"%010d 00000 n \n" % offset for offset in offsets)
+    out.extend(xref)
+    out.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, position))
+    with open(path, "wb") as f:
+        f.write(b"".join(out))
+
+
+def default_worker_counts():
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, nargs="+", default=default_worker_counts())
+    parser.add_argument("--backends", nargs="+", choices=PDF_BACKENDS, default=list(PDF_BACKENDS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Import each backend before timing so the first row does not include it
+        warm_up_path = os.path.join(tmp, "warm_up.pdf")
+        write_synthetic_pdf(warm_up_path, 1)
+        for backend in args.backends:
+            extract_pdf_text(warm_up_path, backend=backend, workers=1)
+
+        print(f"{'backend':>10} {'pages':>6} {'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+        for pages in args.pages:
+            path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            write_synthetic_pdf(path, pages)
+            for backend in args.backends:
+                baseline = None
+                for workers in args.workers:
+                    start = time.perf_counter()
+                    text = extract_pdf_text(path, backend=backend, workers=workers)
+                    elapsed = time.perf_counter() - start
+                    baseline = baseline or elapsed
+                    assert f"Page {pages} line 1:" in text
+                    print(
+                        f"{backend:>10} {pages:>6} {workers:>8} {elapsed:>9.3f} "
+                        f"{pages / elapsed:>9.1f} {baseline / elapsed:>7.2f}x"
+                    )
+
+
+if __name__ == "__main__":
+    main()
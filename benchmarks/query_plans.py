@@ -0,0 +1,175 @@
+"""
+Query-plan regression check for the chat hot paths.
+
+Creates a scratch database next to the one configured by the POSTGRES_*
+variables, loads init.sql and every migration, seeds it (one million
+chat_history rows by default), then EXPLAINs the queries the chat routes run
+on every page load. Exits with status 1 if any of them plans a sequential
+scan of chat_history or chat_sessions. The scratch database is dropped
+afterwards unless --keep is given.
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --messages 1000000 --messages-per-session 50 --keep
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import psycopg2 # type: ignore
+
+from utils.db_pool import get_db_connection
+from utils.migrations import apply_migrations
+
+SCRATCH_DB = "chatbot_plan_check"
+INIT_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "init.sql")
+WATCHED_TABLES = {"chat_history", "chat_sessions"}
+
+# The statements issued by the routes named on the left, with a seeded user and session filled in
+HOT_QUERIES = {
+    "get_chat_history (latest page)": """
+        SELECT message_id, message, sender, created_at, artifact_digest
+        FROM chat_history
+        WHERE chat_session_id = %(session_id)s
+        ORDER BY created_at DESC, message_id DESC
+        LIMIT 51
+    """,
+    "get_chat_history (older page)": """
+        SELECT message_id, message, sender, created_at, artifact_digest
+        FROM chat_history
+        WHERE chat_session_id = %(session_id)s AND (created_at, message_id) < (localtimestamp, 2147483647)
+        ORDER BY created_at DESC, message_id DESC
+        LIMIT 51
+    """,
+    "get_user_chat_sessions": """
+        SELECT session_id, COALESCE(title, 'New Chat') as session_name, created_at
+        FROM chat_sessions
+        WHERE user_id = %(user_id)s
+        ORDER BY created_at DESC
+    """,
+    "store_message (latest session)": """
+        SELECT session_id, created_at FROM chat_sessions WHERE user_id = %(user_id)s ORDER BY created_at DESC LIMIT 1
+    """,
+    "get_artifact": """
+        SELECT a.content
+        FROM chat_artifacts a
+        WHERE a.digest = repeat('0', 64)
+          AND EXISTS (SELECT 1 FROM chat_history h WHERE h.artifact_digest = a.digest AND h.user_id = %(user_id)s)
+    """,
+    "delete_chat_session": """
+        DELETE FROM chat_history WHERE chat_session_id = %(session_id)s AND user_id = %(user_id)s
+    """,
+}
+
+
+def connect(dbname):
+    conn = psycopg2.connect(
+        dbname=dbname,
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=os.getenv("POSTGRES_PORT", "5432")
+    )
+    conn.autocommit = True
+    return conn
+
+
+def recreate_scratch_database(drop_only=False):
+    admin = get_db_connection()
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {SCRATCH_DB}")
+            if not drop_only:
+                cur.execute(f"CREATE DATABASE {SCRATCH_DB}")
+    finally:
+        admin.close()
+
+
+def seed(conn, messages, messages_per_session, sessions_per_user):
+    sessions = max(1, messages // messages_per_session)
+    users = max(1, sessions // sessions_per_user)
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO users (full_name, email, password_hash)
+            SELECT 'User ' || n, 'user' || n || '@example.invalid', '-' FROM generate_series(1, %s) AS n
+        """, (users,))
+        cur.execute("""
+            INSERT INTO chat_sessions (user_id, title, created_at)
+            SELECT 1 + (n - 1) %% %s, 'Session ' || n, now() - n * interval '1 minute'
+            FROM generate_series(1, %s) AS n
+        """, (users, sessions))
+        cur.execute("""
+            INSERT INTO chat_history (chat_session_id, user_id, sender, message, created_at)
+            SELECT s.session_id, s.user_id,
+                   CASE WHEN m %% 2 = 0 THEN 'user' ELSE 'bot' END,
+                   'Seeded message ' || m,
+                   s.created_at + m * interval '1 second'
+            FROM chat_sessions s CROSS JOIN generate_series(1, %s) AS m
+        """, (messages_per_session,))
+        cur.execute("ANALYZE")
+        cur.execute("SELECT session_id, user_id FROM chat_sessions ORDER BY session_id LIMIT 1 OFFSET %s", (sessions // 2,))
+        session_id, user_id = cur.fetchone()
+    return {"session_id": session_id, "user_id": user_id}
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+
+def check_plans(conn, params):
+    failures = []
+    with conn.cursor() as cur:
+        for name, query in HOT_QUERIES.items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = list(walk_plan(plan[0]["Plan"]))
+            seq_scans = [n["Relation Name"] for n in nodes
+                         if n["Node Type"] == "Seq Scan" and n.get("Relation Name") in WATCHED_TABLES]
+            summary = " -> ".join(
+                n["Node Type"] + (f" ({n['Index Name']})" if "Index Name" in n else "") for n in nodes
+            )
+            print(f"{'FAIL' if seq_scans else 'ok':>4}  {name}: {summary}")
+            if seq_scans:
+                failures.append((name, seq_scans))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--messages-per-session", type=int, default=50)
+    parser.add_argument("--sessions-per-user", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="leave the scratch database in place")
+    args = parser.parse_args()
+
+    recreate_scratch_database()
+    try:
+        conn = connect(SCRATCH_DB)
+        try:
+            with open(INIT_SQL, 'r', encoding='utf-8') as f, conn.cursor() as cur:
+                cur.execute(f.read())
+            apply_migrations(conn)
+            start = time.perf_counter()
+            params = seed(conn, args.messages, args.messages_per_session, args.sessions_per_user)
+            print(f"Seeded {args.messages} messages in {time.perf_counter() - start:.1f}s")
+            failures = check_plans(conn, params)
+        finally:
+            conn.close()
+    finally:
+        if not args.keep:
+            recreate_scratch_database(drop_only=True)
+
+    if failures:
+        for name, tables in failures:
+            print(f"{name} falls back to a sequential scan of {', '.join(tables)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-request session overhead: Flask's signed-cookie sessions vs. the
+server-side session store.
+
+A bare Flask app stores --payload bytes in the session once, then serves
+--requests reads through the test client. For each mode this reports the
+Cookie header the browser uploads on every request and the mean time per
+request. The server-side mode uses a throwaway SQLite store, so no
+Postgres is needed.
+
+    python -m benchmarks.session_store
+    python -m benchmarks.session_store --payload 0 4000 50000 --requests 2000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from flask import Flask, session # type: ignore
+
+from utils.session_store import ServerSideSessionInterface, SQLiteSessionStore
+
+WORDS = "furnace efficiency warranty model price listing seller mileage engine heating cooling rating".split()
+
+
+def make_app(session_interface=None):
+    app = Flask(__name__)
+    app.secret_key = "benchmark"
+    if session_interface is not None:
+        app.session_interface = session_interface
+
+    @app.route("/write/<int:size>")
+    def write(size):
+        session["user_id"] = 1
+        # Random words, so the cookie's zlib compression does not flatter it
+        rng = random.Random(size)
+        session["context"] = " ".join(rng.choice(WORDS) for _ in range(size // 6))[:size]
+        return "ok"
+
+    @app.route("/read")
+    def read():
+        return str(session.get("user_id"))
+
+    return app
+
+
+def measure(app, payload, requests):
+    client = app.test_client()
+    client.get(f"/write/{payload}")
+    cookie = client.get_cookie("session")
+    cookie_bytes = len(cookie.key) + len(cookie.value) + 1 if cookie else 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get("/read")
+    return cookie_bytes, (time.perf_counter() - start) * 1000 / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payload", type=int, nargs="+", default=[0, 3000, 30000])
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'mode':>12} {'payload':>8} {'cookie bytes':>13} {'ms/request':>11}")
+        for payload in args.payload:
+            interface = ServerSideSessionInterface(SQLiteSessionStore(os.path.join(tmp, f"{payload}.sqlite3")))
+            modes = (("cookie", make_app()), ("server-side", make_app(interface)))
+            for name, app in modes:
+                cookie_bytes, ms = measure(app, payload, args.requests)
+                # Browsers refuse cookies over 4 KB, so the large cookie payloads would not even be sent
+                print(f"{name:>12} {payload:>8} {cookie_bytes:>13} {ms:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
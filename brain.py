@@ -1,13 +1,19 @@
 import os
-import pdfplumber # type: ignore
+import threading
 from werkzeug.utils import secure_filename # type: ignore
 from langchain_groq import ChatGroq # type: ignore
 from langchain_core.prompts import PromptTemplate# type: ignore 
 from langchain.chains import RetrievalQA # type: ignore
 from langchain_community.vectorstores.faiss import FAISS # type: ignore
-from langchain_huggingface import HuggingFaceEmbeddings # type: ignore
 from dotenv import load_dotenv # type: ignore
 import os
+from utils.index_cache import DocumentIndexCache, hash_text
+from utils.embeddings import get_embeddings, get_batched_embeddings, get_embedding_stats
+from utils.document_store import save_document, load_document, remember_file, lookup_file
+from utils.chunking import PAGE_BREAK, CHUNK_SIZE, CHUNK_OVERLAP, split_document, chunk_page, estimate_tokens
+from utils.pdf_extraction import PDF_BACKEND, iter_pdf_pages, hash_file, get_extraction_stats
+from utils.llm_gateway import LLMGateway
+from utils.response_cache import ResponseCache
 
 load_dotenv()
 
@@ -18,6 +24,32 @@ print("Loaded GROQ_API_KEY:", groq_api_key)
 ollama_api_key = os.getenv("OLLAMA_API_KEY")
 llm = ChatGroq(groq_api_key=groq_api_key, model_name="llama-3.3-70b-versatile", max_tokens=32768)
 
+# All model calls of a worker share one event loop, capped at LLM_MAX_CONCURRENCY in flight
+llm_gateway = LLMGateway(llm)
+
+# Answers to repeated questions, shared with the other workers through RESPONSE_CACHE_PATH
+response_cache = ResponseCache()
+
+# FAISS indexes keyed by document hash, shared with the other workers through INDEX_CACHE_DIR
+index_cache = DocumentIndexCache()
+
+# Number of chunks handed to the "stuff" chain per question
+RETRIEVER_TOP_K = int(os.getenv("RETRIEVER_TOP_K", 4))
+
+# Totals of rag_query_stats over this worker's RAG queries, reported by /metrics
+_rag_stats_lock = threading.Lock()
+_rag_stats = {"queries": 0, "retrieved_chunks": 0, "prompt_tokens_estimate": 0}
+
+RAG_PROMPT_TEMPLATE = """
+    Use the following document to answer the question. If the question asks for a summary or bullet points, format the response using markdown with proper bullet points (using - or *). Make sure each point is on a new line:
+
+    Context:
+    {context}
+    
+    Question: {question}
+    
+    Answer (use markdown formatting if summarizing):"""
+
 
 # Step 2: Build the RAG pipeline
 # def build_rag_pipeline(vector_store):
@@ -33,21 +65,12 @@ def build_rag_pipeline(vector_store):
     Returns:
         A RetrievalQA chain.
     """
-    retriever = vector_store.as_retriever()
+    retriever = vector_store.as_retriever(search_kwargs={"k": RETRIEVER_TOP_K})
 
     # Define a prompt template for the QA chain
-    prompt_template = """
-    Use the following document to answer the question. If the question asks for a summary or bullet points, format the response using markdown with proper bullet points (using - or *). Make sure each point is on a new line:
-
-    Context:
-    {context}
-    
-    Question: {question}
-    
-    Answer (use markdown formatting if summarizing):"""
     prompt = PromptTemplate(
         input_variables=["context", "question"],
-        template=prompt_template,
+        template=RAG_PROMPT_TEMPLATE,
     )
 
     # Wrap ChatGroq with the prompt
@@ -59,26 +82,18 @@ def build_rag_pipeline(vector_store):
         chain_type_kwargs={"prompt": prompt},
     )
 
-# Extract text from the uploaded PDF
-def extract_text_from_pdf(pdf_path):
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text
-        if not text.strip():
-            return "No extractable text found in the PDF."
-        return text
-    except Exception as e:
-        return f"Error during PDF extraction: {str(e)}"
 
+def index_key(document_id):
+    # The chunking parameters are part of the key so a config change rebuilds the index
+    return f"{document_id}-c{CHUNK_SIZE}o{CHUNK_OVERLAP}"
 
 
 def create_vector_store(text):
     """
     Create a FAISS vector store from the provided text using Llama embeddings.
+    The text is split into small chunks (one vector each) and the index is
+    cached by content hash, so repeat questions on the same document skip
+    embedding entirely.
     Args:
         text (str): Input text for embeddings.
     Returns:
@@ -94,43 +109,238 @@ def create_vector_store(text):
     if not text.strip():
         raise ValueError("Cannot create a vector store with empty text.")
     try:
-        embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        vector_store = FAISS.from_texts([text], embedding=embeddings)
-        return vector_store
+        embeddings = get_embeddings()
+        key = index_key(hash_text(text))
+
+        def build():
+            chunks, metadatas = split_document(text)
+            # Chunks from concurrent uploads share forward passes through the micro-batcher
+            return FAISS.from_texts(chunks, embedding=get_batched_embeddings(), metadatas=metadatas)
+
+        return index_cache.get_or_build(key, embeddings, build)
     except Exception as e:
         raise RuntimeError(f"Error creating vector store: {e}")
 
 
+def ingest_pdf(pdf_path, backend=PDF_BACKEND):
+    """
+    Extract, chunk and embed an uploaded PDF.
+    A file that was already extracted with the same backend is never parsed
+    again: its stored text and cached index are reused. Otherwise pages come
+    back from the extraction pool as they finish and are chunked right away.
+    The chunks go to the embedding micro-batcher only once the whole text is
+    known and its index is not cached, so a document whose text was indexed
+    before (e.g. the same PDF saved again) is never re-embedded.
+    Args:
+        pdf_path (str): Path to the saved PDF.
+        backend (str): PDF extraction backend ("pypdf2" or "pdfplumber").
+    Returns:
+        tuple: (document ID, number of chunks in the index).
+    """
+    file_hash = hash_file(pdf_path)
+    document_id = lookup_file(file_hash, backend)
+    if document_id:
+        return document_id, load_vector_store(document_id).index.ntotal
+
+    pages = {}
+    page_chunks = {}
+    for page_number, page_text in iter_pdf_pages(pdf_path, backend):
+        pages[page_number] = page_text
+        page_chunks[page_number] = chunk_page(page_number, page_text)
+
+    text = PAGE_BREAK.join(pages[number] for number in sorted(pages))
+    if not text.strip():
+        raise ValueError("No extractable text found in the PDF.")
+    document_id = save_document(text)
+    remember_file(file_hash, backend, document_id)
+    key = index_key(document_id)
+
+    vector_store = index_cache.get(key, get_embeddings())
+    if vector_store is None:
+        embeddings = get_batched_embeddings()
+        chunks = []
+        metadatas = []
+        pending_vectors = []
+        # One batcher submission per page, so pages are embedded in parallel micro-batches
+        for number in sorted(page_chunks):
+            chunk_texts, chunk_metadatas = page_chunks[number]
+            if chunk_texts:
+                chunks.extend(chunk_texts)
+                metadatas.extend(chunk_metadatas)
+                pending_vectors.append(embeddings.executor.submit(chunk_texts))
+        vectors = [vector for future in pending_vectors for vector in future.result()]
+        vector_store = FAISS.from_embeddings(list(zip(chunks, vectors)), embeddings, metadatas=metadatas)
+        index_cache.put(key, vector_store)
+    return document_id, vector_store.index.ntotal
+
+
+def load_vector_store(document_id):
+    """
+    Look up the prebuilt index for an uploaded document.
+    Falls back to rebuilding from the stored text if the index was evicted
+    from every cache level.
+    Args:
+        document_id (str): ID returned by ingest_pdf.
+    Returns:
+        FAISS: FAISS vector store.
+    """
+    vector_store = index_cache.get(index_key(document_id), get_embeddings())
+    if vector_store is not None:
+        return vector_store
+    text = load_document(document_id)
+    if text is None:
+        raise LookupError(f"Unknown document: {document_id}")
+    return create_vector_store(text)
+
+
+def get_index_cache_stats():
+    """
+    Report document index cache counters for this worker.
+    Returns:
+        dict: hit/miss/eviction counters and current size.
+    """
+    return index_cache.stats()
+
 
-def generate_response(question, pdf_text=None):
+def get_llm_gateway_stats():
+    """
+    Report LLM gateway counters for this worker.
+    Returns:
+        dict: in-flight, completed, rejected calls and mean latency.
+    """
+    return llm_gateway.stats()
+
+
+def get_response_cache_stats():
+    """
+    Report response cache counters for this worker.
+    Returns:
+        dict: exact/semantic hits, misses, hit rate and shared entry count.
+    """
+    return response_cache.stats()
+
+
+def get_rag_stats():
+    """
+    Report RAG query counters for this worker.
+    Returns:
+        dict: queries, and mean chunks retrieved and prompt tokens per query.
+    """
+    with _rag_stats_lock:
+        stats = dict(_rag_stats)
+    queries = stats["queries"]
+    chunks, tokens = stats.pop("retrieved_chunks"), stats.pop("prompt_tokens_estimate")
+    stats["avg_retrieved_chunks"] = round(chunks / queries, 2) if queries else None
+    stats["avg_prompt_tokens_estimate"] = round(tokens / queries) if queries else None
+    return stats
+
+
+def record_rag_query(stats):
+    """Add one query's rag_query_stats to the worker's totals."""
+    with _rag_stats_lock:
+        _rag_stats["queries"] += 1
+        _rag_stats["retrieved_chunks"] += stats["retrieved_chunks"]
+        _rag_stats["prompt_tokens_estimate"] += stats["prompt_tokens_estimate"]
+
+
+def rag_query_stats(vector_store, question, source_documents):
+    """
+    Summarise how much of a document one RAG query used.
+    Args:
+        vector_store: The FAISS vector store that was queried.
+        question (str): The user's question.
+        source_documents (list): Documents returned by the retriever.
+    Returns:
+        dict: Chunk count of the index, chunks retrieved and prompt token estimate.
+    """
+    context = "\n\n".join(doc.page_content for doc in source_documents)
+    prompt_text = RAG_PROMPT_TEMPLATE.format(context=context, question=question)
+    return {
+        "chunk_count": vector_store.index.ntotal,
+        "retrieved_chunks": len(source_documents),
+        "prompt_tokens_estimate": estimate_tokens(prompt_text),
+    }
+
+
+def generate_response(question, document_id=None):
     """
     Generate a response to a user query with or without PDF context.
     Args:
         question (str): The user's question.
-        pdf_text (str, optional): Text extracted from an uploaded PDF. Defaults to None.
+        document_id (str, optional): ID of a document ingested at upload time. Defaults to None.
     Returns:
         str: Response from the model.
     """
     try:
-        if pdf_text:
-            if os.path.exists(pdf_text):
-                pdf_text = extract_text_from_pdf(pdf_text)
-            # Use RAG pipeline with the PDF context
-            vector_store = create_vector_store(pdf_text)
+        if document_id:
+            # Use RAG pipeline with the prebuilt document index
+            cached = response_cache.get(question, scope=index_key(document_id))
+            if cached is not None:
+                return {"query": question, "result": cached}
+            vector_store = load_vector_store(document_id)
             rag_pipeline = build_rag_pipeline(vector_store)
-            response = rag_pipeline.invoke({"query": question})  # Ensure this function works with your RAG pipeline
+            response = llm_gateway.call(lambda: rag_pipeline.ainvoke({"query": question}))  # Ensure this function works with your RAG pipeline
+            response["rag_stats"] = rag_query_stats(vector_store, question, response.get("source_documents", []))
+            record_rag_query(response["rag_stats"])
+            response_cache.put(question, response["result"], scope=index_key(document_id))
 
             
         else:
             # Use LLM directly without PDF context for general questions
             # llm = ChatGroq(groq_api_key=groq_api_key, model_name="llama-3.3-70b-versatile", max_tokens=32768)
+            cached = response_cache.get(question)
+            if cached is not None:
+                return cached
 
             messages = [{"role": "user", "content": question}]
 
             # Directly pass the question string as a prompt (simpler method)
-            response = llm.invoke(question)  # Just passing the question directly as a string
+            response = llm_gateway.invoke(question)  # Just passing the question directly as a string
+            response_cache.put(question, response.content)
         
             
         return response
     except Exception as e:
         return f"Error generating response: {e}"
+
+
+def stream_response(question, document_id=None):
+    """
+    Stream a response to a user query token by token.
+    The RAG path retrieves the top chunks itself and streams the prompt
+    through the LLM, since the RetrievalQA chain only returns whole answers.
+    Args:
+        question (str): The user's question.
+        document_id (str, optional): ID of a document ingested at upload time. Defaults to None.
+    Yields:
+        str: Pieces of the answer as the model generates them.
+    """
+    scope = index_key(document_id) if document_id else ""
+    cached = response_cache.get(question, scope=scope)
+    if cached is not None:
+        yield cached
+        return
+
+    if document_id:
+        vector_store = load_vector_store(document_id)
+        retriever = vector_store.as_retriever(search_kwargs={"k": RETRIEVER_TOP_K})
+        source_documents = retriever.invoke(question)
+        context = "\n\n".join(doc.page_content for doc in source_documents)
+        prompt = RAG_PROMPT_TEMPLATE.format(context=context, question=question)
+        record_rag_query(rag_query_stats(vector_store, question, source_documents))
+    else:
+        prompt = question
+
+    pieces = []
+    completed = False
+    try:
+        for chunk in llm_gateway.stream(prompt):
+            if chunk.content:
+                pieces.append(chunk.content)
+                yield chunk.content
+        completed = True
+    finally:
+        # Only complete, non-empty answers are cached: an upstream error or a client gone before
+        # the first token must not leave an empty answer for everyone asking the same question
+        if completed and pieces:
+            response_cache.put(question, "".join(pieces), scope=scope)
@@ -8,9 +8,18 @@ done
 
 echo "Database is ready!"
 
+# The scraper service runs the scrape worker instead of the web server; the
+# web service alone migrates, so two containers never run migrations at once
+if [ "$1" = "scrape-worker" ]; then
+    exec python -m utils.scrape_worker
+fi
+
+# Bring the schema up to date before any worker starts serving
+python -m utils.migrations || exit 1
+
 # Now, start the application
 if [ "$FLASK_ENV" = "production" ]; then
-    exec gunicorn -w 4 -b 0.0.0.0:5000 app:app
+    exec gunicorn -c gunicorn.conf.py app:app
 else
     exec python app.py
 fi
\ No newline at end of file
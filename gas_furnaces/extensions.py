@@ -0,0 +1,89 @@
+# Scrapy extensions for crawls started by the scrape worker (utils/scrape_worker.py)
+
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import threads
+
+from utils.db_pool import get_db_connection
+from utils.scrape_jobs import record_progress
+
+
+class JobProgress:
+    """
+    Reports item and page counts to the crawl's scrape_jobs row.
+
+    Enabled when the crawl is started with `-s SCRAPE_JOB_ID=<id>`. Counts
+    are written at most once every SCRAPE_PROGRESS_INTERVAL seconds and once
+    more when the spider closes, so /scrape_jobs/<id> can show progress
+    without a database write per item. Writes run on the reactor's thread
+    pool: the scrape worker runs many crawls on one reactor, and none of
+    them should wait on another's database round trip.
+    """
+
+    def __init__(self, job_id, interval):
+        self.job_id = job_id
+        self.interval = interval
+        self.items = 0
+        self.pages = 0
+        self.last_report = 0.0
+        self.conn = None
+        self.writing = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        job_id = crawler.settings.getint("SCRAPE_JOB_ID")
+        if not job_id:
+            raise NotConfigured
+        ext = cls(job_id, crawler.settings.getfloat("SCRAPE_PROGRESS_INTERVAL", 2.0))
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        if self.writing is not None:
+            # One write at a time; the final report waits for the one in flight
+            if force:
+                self.writing.addBoth(lambda _: self.report(force=True))
+            return self.writing
+        self.last_report = now
+        self.writing = threads.deferToThread(self._write, self.items, self.pages)
+        self.writing.addBoth(self._written)
+        return self.writing
+
+    def _written(self, result):
+        self.writing = None
+        return result
+
+    def _write(self, items, pages):
+        try:
+            if self.conn is None or self.conn.closed:
+                self.conn = get_db_connection()
+            with self.conn.cursor() as cur:
+                record_progress(cur, self.job_id, items, pages)
+            self.conn.commit()
+        except Exception as e:
+            # Progress is informational; the crawl carries on without it
+            print(f"Error reporting progress for scrape job {self.job_id}: {e}")
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def item_scraped(self, item, spider):
+        self.items += 1
+        self.report()
+
+    def response_received(self, response, request, spider):
+        self.pages += 1
+        self.report()
+
+    def spider_closed(self, spider):
+        # spider_closed waits for a returned Deferred, so the final counts are stored before the crawl ends
+        d = self.report(force=True)
+        d.addBoth(lambda _: self.conn.close() if self.conn is not None else None)
+        return d
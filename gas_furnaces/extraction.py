@@ -0,0 +1,50 @@
+# Precompiled extraction helpers for the spiders' per-page hot paths
+
+import functools
+
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+
+_translator = HTMLTranslator()
+
+# Text of an element and its descendants, whitespace-normalized, as parsel's .xpath('normalize-space()')
+normalize_space = etree.XPath("normalize-space()")
+
+
+def compile_css(selectors):
+    """
+    Translate and compile a table of CSS selectors once, at import.
+
+    parsel translates a CSS query to XPath and lxml compiles that XPath on
+    every .css() call, and each match is wrapped in a Selector. The compiled
+    queries run directly on lxml elements (Selector.root) and return
+    elements or strings.
+    Args:
+        selectors (dict): {name: CSS selector}; parsel's ::text and ::attr() are supported.
+    Returns:
+        dict: {name: lxml.etree.XPath}, relative to the element they are called on like Selector.css().
+    """
+    return {name: etree.XPath(_translator.css_to_xpath(css)) for name, css in selectors.items()}
+
+
+def first(query, node, default=""):
+    """First string matched by a compiled ::text or ::attr() query, like .get(default)."""
+    for value in query(node):
+        return str(value)
+    return default
+
+
+def texts(query, node):
+    """All strings matched by a compiled ::text or ::attr() query, like .getall()."""
+    return [str(value) for value in query(node)]
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_label(label):
+    """Spec and feature labels as item keys: "Engine Capacity:" -> "engine_capacity"."""
+    return label.strip().replace(":", "").replace(" ", "_").lower()
+
+
+def unique(values):
+    """The values without repeats, in first-seen order."""
+    return list(dict.fromkeys(values))
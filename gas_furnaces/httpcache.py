@@ -0,0 +1,250 @@
+# HTTP cache storage shared by every gas_furnaces spider (HTTPCACHE_STORAGE in settings.py)
+
+import os
+import gzip
+import time
+import zlib
+import sqlite3
+import hashlib
+
+import zstandard # type: ignore
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fingerprint TEXT PRIMARY KEY,
+    domain TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers BLOB NOT NULL,
+    body_hash TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE INDEX IF NOT EXISTS responses_body_hash ON responses (body_hash);
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    dictionary_id INTEGER,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bodies_dictionary ON bodies (dictionary_id);
+CREATE TABLE IF NOT EXISTS dictionaries (
+    dictionary_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    domain TEXT NOT NULL UNIQUE,
+    data BLOB NOT NULL
+);
+"""
+
+# Bodies smaller than this are not worth a dictionary of their own
+MIN_DICTIONARY_BYTES = 8 * 1024
+ZSTD_LEVEL = 3
+
+
+def decode_body(headers, body):
+    """
+    Undo a gzip or deflate Content-Encoding, which would hide the body's
+    similarity to other pages from the compressor.
+    Returns:
+        tuple: (headers, body), unchanged if the body is not encoded that way.
+    """
+    encoding = headers.get(b"Content-Encoding", b"").strip().lower()
+    try:
+        if encoding in (b"gzip", b"x-gzip"):
+            body = gzip.decompress(body)
+        elif encoding == b"deflate":
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                body = zlib.decompress(body, -zlib.MAX_WBITS)
+        else:
+            return headers, body
+    except (OSError, EOFError, zlib.error):
+        return headers, body
+    headers = headers.copy()
+    del headers[b"Content-Encoding"]
+    headers.pop(b"Content-Length", None)
+    return headers, body
+
+
+class SQLiteCacheStorage:
+    """
+    Cached responses of every spider in one compressed SQLite file.
+
+    Scrapy's FilesystemCacheStorage writes six files in a directory per
+    request, per spider, with the body as sent (usually gzipped). Here a
+    response is one row keyed by its request fingerprint, and its decoded
+    body is stored once per distinct content, keyed by SHA-1. Bodies are
+    compressed with zstd using the first large page cached from the same
+    domain as a dictionary: pages of one site share most of their markup
+    and scripts, so each body costs little more than what sets it apart.
+
+    Settings:
+        HTTPCACHE_DIR: Directory of the database, relative to .scrapy/ like Scrapy's own storages.
+        HTTPCACHE_EXPIRATION_SECS: Default lifetime of a response; 0 never expires.
+        HTTPCACHE_DOMAIN_EXPIRATION_SECS: {domain: seconds}, overriding the default for the domain
+            and its subdomains.
+        HTTPCACHE_MAX_BYTES: Cap on the stored (compressed) data; past it the least recently used
+            responses are evicted down to 90% of it. 0 means no cap.
+    """
+
+    def __init__(self, settings):
+        self.path = os.path.join(data_path(settings["HTTPCACHE_DIR"], createdir=True), "responses.sqlite3")
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        # Longest suffix first, so "www.ebay.com" wins over "ebay.com"
+        self.domain_expiration = sorted(settings.getdict("HTTPCACHE_DOMAIN_EXPIRATION_SECS").items(),
+                                        key=lambda item: -len(item[0]))
+        self.max_bytes = settings.getint("HTTPCACHE_MAX_BYTES")
+        self.conn = None
+        self.size = 0
+        self.stats = None
+        self._fingerprinter = None
+        self._plain_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        self._plain_decompressor = zstandard.ZstdDecompressor()
+        self._codecs = {}  # dictionary_id -> (ZstdCompressor, ZstdDecompressor)
+
+    def open_spider(self, spider):
+        self.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        # Lets evict() hand freed pages back to the filesystem; only takes effect on a new database
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.size = self._measure()
+        self.stats = spider.crawler.stats
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        spider.logger.debug(f"Using SQLite cache storage in {self.path}")
+
+    def close_spider(self, spider):
+        self.conn.close()
+        self.conn = None
+
+    def _measure(self):
+        return self.conn.execute("""
+            SELECT (SELECT total(length(headers)) FROM responses) + (SELECT total(length(data)) FROM bodies)
+                 + (SELECT total(length(data)) FROM dictionaries)
+        """).fetchone()[0]
+
+    def _codec(self, dictionary_id):
+        codec = self._codecs.get(dictionary_id)
+        if codec is None:
+            row = self.conn.execute("SELECT data FROM dictionaries WHERE dictionary_id = ?",
+                                    (dictionary_id,)).fetchone()
+            content = self._plain_decompressor.decompress(row[0])
+            dictionary = zstandard.ZstdCompressionDict(content, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+            codec = (zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary),
+                     zstandard.ZstdDecompressor(dict_data=dictionary))
+            self._codecs[dictionary_id] = codec
+        return codec
+
+    def _dictionary_for(self, domain, body):
+        # The domain's dictionary, created from this body if the domain has none yet
+        row = self.conn.execute("SELECT dictionary_id FROM dictionaries WHERE domain = ?", (domain,)).fetchone()
+        if row is not None:
+            return row[0]
+        if len(body) < MIN_DICTIONARY_BYTES:
+            return None
+        data = self._plain_compressor.compress(body)
+        self.size += len(data)
+        return self.conn.execute("INSERT INTO dictionaries (domain, data) VALUES (?, ?)", (domain, data)).lastrowid
+
+    def expiration_for(self, domain):
+        """Lifetime in seconds of responses from `domain`; 0 means they never expire."""
+        for suffix, seconds in self.domain_expiration:
+            if domain == suffix or domain.endswith("." + suffix):
+                return int(seconds)
+        return self.expiration_secs
+
+    def retrieve_response(self, spider, request):
+        """Return the cached response, or None if it is missing or expired."""
+        key = self._fingerprinter.fingerprint(request).hex()
+        row = self.conn.execute("""
+            SELECT r.domain, r.url, r.status, r.headers, r.stored_at, b.dictionary_id, b.data
+            FROM responses r JOIN bodies b ON b.hash = r.body_hash
+            WHERE r.fingerprint = ?
+        """, (key,)).fetchone()
+        if row is None:
+            return None
+        domain, url, status, headers, stored_at, dictionary_id, body = row
+        now = time.time()
+        expiration = self.expiration_for(domain)
+        if 0 < expiration < now - stored_at:
+            return None
+        self.conn.execute("UPDATE responses SET last_used = ? WHERE fingerprint = ?", (now, key))
+        decompressor = self._plain_decompressor if dictionary_id is None else self._codec(dictionary_id)[1]
+        headers = Headers(headers_raw_to_dict(self._plain_decompressor.decompress(headers)))
+        body = decompressor.decompress(body)
+        request.meta["cache_timestamp"] = stored_at
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        """Store the response, replacing any older copy for the same request."""
+        key = self._fingerprinter.fingerprint(request).hex()
+        domain = urlparse_cached(request).hostname or ""
+        headers, body = decode_body(response.headers, response.body)
+        body_hash = hashlib.sha1(body).hexdigest()
+        headers = self._plain_compressor.compress(headers_dict_to_raw(headers))
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.conn.execute("SELECT 1 FROM bodies WHERE hash = ?", (body_hash,)).fetchone() is None:
+                dictionary_id = self._dictionary_for(domain, body)
+                compressor = self._plain_compressor if dictionary_id is None else self._codec(dictionary_id)[0]
+                data = compressor.compress(body)
+                self.conn.execute("INSERT INTO bodies (hash, dictionary_id, data) VALUES (?, ?, ?)",
+                                  (body_hash, dictionary_id, data))
+                self.size += len(data)
+            self.conn.execute("""
+                INSERT OR REPLACE INTO responses
+                    (fingerprint, domain, url, status, headers, body_hash, stored_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, domain, response.url, response.status, headers, body_hash, now, now))
+            self.size += len(headers)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if self.max_bytes and self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop least recently used responses until under 90% of the cap, with the
+        bodies and dictionaries nothing refers to any more.
+        """
+        target = self.max_bytes * 0.9
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Other processes may have stored or evicted since this storage last measured
+            self.size = self._measure()
+            evicted = 0
+            while self.size > target:
+                rows = self.conn.execute(
+                    "SELECT fingerprint FROM responses ORDER BY last_used LIMIT 100"
+                ).fetchall()
+                if not rows:
+                    break
+                self.conn.executemany("DELETE FROM responses WHERE fingerprint = ?", rows)
+                self.conn.execute(
+                    "DELETE FROM bodies WHERE NOT EXISTS (SELECT 1 FROM responses WHERE body_hash = bodies.hash)"
+                )
+                self.conn.execute("""
+                    DELETE FROM dictionaries
+                    WHERE NOT EXISTS (SELECT 1 FROM bodies WHERE dictionary_id = dictionaries.dictionary_id)
+                """)
+                self.size = self._measure()
+                evicted += len(rows)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        # Frees the codecs of deleted dictionaries; the rest are rebuilt on demand
+        self._codecs.clear()
+        self.conn.execute("PRAGMA incremental_vacuum")
+        if self.stats is not None:
+            self.stats.inc_value("httpcache/evicted", evicted)
@@ -0,0 +1,290 @@
+# Incremental re-scrapes of listing pages (SPIDER_MIDDLEWARES in settings.py)
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+
+from itemadapter import ItemAdapter, is_item
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import data_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    spider TEXT NOT NULL,
+    key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    listing_hash TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT NOT NULL,
+    items TEXT NOT NULL,
+    crawled_at REAL NOT NULL,
+    PRIMARY KEY (spider, key)
+);
+CREATE INDEX IF NOT EXISTS pages_crawled_at ON pages (crawled_at);
+"""
+
+_UNIT_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 60 * 60,
+    "day": 24 * 60 * 60,
+    "week": 7 * 24 * 60 * 60,
+    "month": 30 * 24 * 60 * 60,
+    "year": 365 * 24 * 60 * 60,
+}
+_AGO = re.compile(r"\b(\d+|an?)\s+(second|minute|hour|day|week|month|year)s?\b", re.IGNORECASE)
+
+
+def updated_before(updated_time, now=None):
+    """
+    Latest time a listing can have been updated, from a relative "Updated"
+    text such as "2 hours ago" or "about 1 month ago".
+
+    The text is rounded to its unit, so half a unit is taken off: a listing
+    shown as updated "1 day ago" is only trusted to be 12 hours old.
+    Returns:
+        float: Unix time, or None if the text is not understood.
+    """
+    match = _AGO.search(updated_time or "")
+    if match is None:
+        return None
+    count = 1 if match.group(1).lower() in ("a", "an") else int(match.group(1))
+    now = time.time() if now is None else now
+    return now - (count - 0.5) * _UNIT_SECONDS[match.group(2).lower()]
+
+
+def listing_hash(listing):
+    """SHA-1 of a listing card's fields, leaving out the relative updated_time that changes by itself."""
+    fields = {k: v for k, v in listing.items() if k != "updated_time"}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class FingerprintStore:
+    """
+    What was last scraped from each detail page, per spider, in one SQLite file.
+
+    A row keeps the page's ETag, Last-Modified and body hash, the hash of
+    the listing card that linked to it, and the items the page produced,
+    so an unchanged page can be answered without parsing or fetching it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def get(self, spider, key):
+        """
+        Returns:
+            dict: The stored row with its items decoded, or None.
+        """
+        row = self.conn.execute("""
+            SELECT url, listing_hash, etag, last_modified, content_hash, items, crawled_at
+            FROM pages WHERE spider = ? AND key = ?
+        """, (spider, key)).fetchone()
+        if row is None:
+            return None
+        url, listing, etag, last_modified, content_hash, items, crawled_at = row
+        return {"url": url, "listing_hash": listing, "etag": etag, "last_modified": last_modified,
+                "content_hash": content_hash, "items": json.loads(items), "crawled_at": crawled_at}
+
+    def put(self, spider, key, url, listing, etag, last_modified, content_hash, items):
+        self.conn.execute("""
+            INSERT OR REPLACE INTO pages
+                (spider, key, url, listing_hash, etag, last_modified, content_hash, items, crawled_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (spider, key, url, listing, etag, last_modified, content_hash,
+              json.dumps(items, ensure_ascii=False, default=str), time.time()))
+
+    def touch(self, spider, key):
+        """Mark a page as confirmed unchanged now."""
+        self.conn.execute("UPDATE pages SET crawled_at = ? WHERE spider = ? AND key = ?", (time.time(), spider, key))
+
+    def expire(self, max_age):
+        """Delete pages not confirmed for `max_age` seconds; they would be fetched again anyway."""
+        return self.conn.execute("DELETE FROM pages WHERE crawled_at < ?", (time.time() - max_age,)).rowcount
+
+    def close(self):
+        self.conn.close()
+
+
+class IncrementalMiddleware:
+    """
+    Skips detail pages that have not changed since the last crawl and
+    outputs the items they produced then.
+
+    A listing callback opts a detail request in with
+    meta["incremental"] = {"key": <stable page id>, "listing": <card fields>}.
+    For such a request:
+
+    - If the card is the same as when the page was last scraped, and its
+      updated_time (if any) says the listing has not been updated since,
+      the request is dropped and the stored items are output instead,
+      with the fields they share with the card refreshed from it.
+    - Otherwise it is sent with If-None-Match / If-Modified-Since from the
+      last response. A 304, or a body with the same hash as last time, is
+      answered with the stored items without running the callback.
+    - Any other response goes to the callback as usual, and its items are
+      stored for next time.
+
+    Settings:
+        INCREMENTAL_ENABLED: Turns the middleware on.
+        INCREMENTAL_DIR: Directory of the database, relative to .scrapy/.
+        INCREMENTAL_MAX_AGE: Seconds after which a page is fetched again even if its card is unchanged.
+
+    Stats: incremental/requests_saved (requests dropped), incremental/not_modified
+    (304 responses) and incremental/unchanged (same body, callback skipped).
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("INCREMENTAL_ENABLED"):
+            raise NotConfigured
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.path = os.path.join(data_path(settings["INCREMENTAL_DIR"], createdir=True), "pages.sqlite3")
+        self.max_age = settings.getint("INCREMENTAL_MAX_AGE")
+        self.store = None
+        self.spider_name = None
+        self.reused_keys = set()
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_opened(self, spider):
+        # The spider argument of process_spider_output is deprecated in newer Scrapy
+        self.spider_name = spider.name
+        self.store = FingerprintStore(self.path)
+        if self.max_age:
+            self.store.expire(self.max_age)
+
+    def spider_closed(self, spider):
+        self.store.close()
+        self.store = None
+
+    def process_spider_output(self, response, result, spider=None):
+        incremental = response.request.meta.get("incremental")
+        if incremental is not None:
+            reused, content_hash = self._reuse(response, incremental)
+            if reused is not None:
+                yield from reused
+                return
+            items = []
+            for entry in result:
+                self._collect(items, entry)
+                yield entry
+            self._record(response, incremental, content_hash, items)
+            return
+        for entry in result:
+            if isinstance(entry, Request) and "incremental" in entry.meta:
+                yield from self._detail_request(entry)
+            else:
+                yield entry
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        # Same as process_spider_output, for callbacks that are async generators
+        incremental = response.request.meta.get("incremental")
+        if incremental is not None:
+            reused, content_hash = self._reuse(response, incremental)
+            if reused is not None:
+                for item in reused:
+                    yield item
+                return
+            items = []
+            async for entry in result:
+                self._collect(items, entry)
+                yield entry
+            self._record(response, incremental, content_hash, items)
+            return
+        async for entry in result:
+            if isinstance(entry, Request) and "incremental" in entry.meta:
+                for output in self._detail_request(entry):
+                    yield output
+            else:
+                yield entry
+
+    def _detail_request(self, request):
+        """
+        Returns:
+            list: The stored items in place of the request, or the request itself to send.
+        """
+        incremental = request.meta["incremental"]
+        listing = incremental.get("listing") or {}
+        # Hashed now, before the callback can add to the card's dict
+        incremental["listing_hash"] = listing_hash(listing) if listing else None
+        stored = self.store.get(self.spider_name, incremental["key"])
+        if stored is None:
+            return [request]
+        if self._listing_unchanged(stored, incremental["listing_hash"], listing):
+            # The dupefilter never sees a dropped request, so repeated links to a page are dropped here
+            if incremental["key"] in self.reused_keys:
+                return []
+            self.reused_keys.add(incremental["key"])
+            # Not touched: only a fetch confirms the page, so INCREMENTAL_MAX_AGE still forces one
+            self.stats.inc_value("incremental/requests_saved")
+            return self._stored_items(stored, listing)
+        headers = {}
+        if stored["etag"]:
+            headers["If-None-Match"] = stored["etag"]
+        if stored["last_modified"]:
+            headers["If-Modified-Since"] = stored["last_modified"]
+        if headers:
+            for name, value in headers.items():
+                request.headers.setdefault(name, value)
+            request.meta["handle_httpstatus_list"] = request.meta.get("handle_httpstatus_list", []) + [304]
+        return [request]
+
+    def _listing_unchanged(self, stored, card_hash, listing):
+        if card_hash is None or stored["listing_hash"] != card_hash:
+            return False
+        if self.max_age and time.time() - stored["crawled_at"] > self.max_age:
+            return False
+        if "updated_time" in listing:
+            updated = updated_before(listing["updated_time"])
+            return updated is not None and updated <= stored["crawled_at"]
+        return True
+
+    def _stored_items(self, stored, listing):
+        items = stored["items"]
+        for item in items:
+            # The card may be fresher than the stored item, e.g. its updated_time
+            item.update((k, v) for k, v in listing.items() if k in item)
+        return items
+
+    def _reuse(self, response, incremental):
+        """
+        Returns:
+            tuple: (items, content_hash): the stored items if the page is unchanged, else None.
+        """
+        key = incremental["key"]
+        stored = self.store.get(self.spider_name, key)
+        if stored is not None and response.status == 304:
+            self.store.touch(self.spider_name, key)
+            self.stats.inc_value("incremental/not_modified")
+            return self._stored_items(stored, incremental.get("listing") or {}), stored["content_hash"]
+        content_hash = hashlib.sha1(response.body).hexdigest()
+        if stored is not None and stored["content_hash"] == content_hash:
+            self.store.touch(self.spider_name, key)
+            self.stats.inc_value("incremental/unchanged")
+            return self._stored_items(stored, incremental.get("listing") or {}), content_hash
+        return None, content_hash
+
+    def _collect(self, items, entry):
+        if is_item(entry):
+            items.append(ItemAdapter(entry).asdict())
+
+    def _record(self, response, incremental, content_hash, items):
+        self.store.put(self.spider_name, incremental["key"], response.url, incremental.get("listing_hash"),
+                       response.headers.get("ETag", b"").decode("latin-1") or None,
+                       response.headers.get("Last-Modified", b"").decode("latin-1") or None,
+                       content_hash, items)
@@ -7,6 +7,8 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+
 BOT_NAME = "gas_furnaces"
 
 SPIDER_MODULES = ["gas_furnaces.spiders"]
@@ -51,6 +53,14 @@ USER_AGENT = 'Mozilla/5.0 (iPad; CPU OS 12_2 like Mac OS X) AppleWebKit/605.1.15
 #    "gas_furnaces.middlewares.GasFurnacesSpiderMiddleware": 543,
 #}
 
+# Re-scrapes of the same listing pages skip the detail pages that have not changed (gas_furnaces/incremental.py)
+SPIDER_MIDDLEWARES = {
+    "gas_furnaces.incremental.IncrementalMiddleware": 600,
+}
+INCREMENTAL_ENABLED = os.getenv("SCRAPE_INCREMENTAL", "1") == "1"
+INCREMENTAL_DIR = "incremental"
+INCREMENTAL_MAX_AGE = int(os.getenv("SCRAPE_INCREMENTAL_MAX_AGE", 7 * 24 * 60 * 60))
+
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #DOWNLOADER_MIDDLEWARES = {
@@ -63,6 +73,11 @@ USER_AGENT = 'Mozilla/5.0 (iPad; CPU OS 12_2 like Mac OS X) AppleWebKit/605.1.15
 #    "scrapy.extensions.telnet.TelnetConsole": None,
 #}
 
+# Progress reporting for crawls run by the scrape worker; inactive unless SCRAPE_JOB_ID is set
+EXTENSIONS = {
+    "gas_furnaces.extensions.JobProgress": 500,
+}
+
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 #ITEM_PIPELINES = {
@@ -82,13 +97,23 @@ USER_AGENT = 'Mozilla/5.0 (iPad; CPU OS 12_2 like Mac OS X) AppleWebKit/605.1.15
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
-# Enable and configure HTTP caching (disabled by default)
+# HTTP cache shared by all spiders: one compressed SQLite file under .scrapy/httpcache
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_ENABLED = os.getenv("SCRAPE_CACHE_ENABLED", "1") == "1"
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_STORAGE = "gas_furnaces.httpcache.SQLiteCacheStorage"
+HTTPCACHE_EXPIRATION_SECS = 6 * 60 * 60
+# Listings and news change faster than product catalogues
+HTTPCACHE_DOMAIN_EXPIRATION_SECS = {
+    "cnn.com": 15 * 60,
+    "pakwheels.com": 60 * 60,
+    "ebay.com": 60 * 60,
+    "lennoxpros.com": 24 * 60 * 60,
+}
+HTTPCACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_MB", 512)) * 1024 * 1024
+# Blocks, throttling and server errors are retried, never replayed from the cache; a 304 only
+# answers the conditional request IncrementalMiddleware sent, so it is not cached either
+HTTPCACHE_IGNORE_HTTP_CODES = [304, 403, 408, 429, 500, 502, 503, 504]
 
 # Set settings whose default value is deprecated to a future-proof value
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
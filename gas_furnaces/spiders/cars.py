@@ -4,6 +4,51 @@ import re
 from urllib.parse import urljoin
 from itertools import zip_longest
 
+from lxml import etree
+
+from gas_furnaces.extraction import compile_css, first, normalize_label, normalize_space, texts, unique
+
+# URL patterns of parse(), compiled once
+VEHICLE_DETAIL_URL = re.compile(r'/(used-cars|used-bikes)/[^/]+/\d+/')
+CITY_LISTING_URL = re.compile(r'/(used-cars|used-bikes)/[a-z-]+/$')
+PRICE_NUMBER = re.compile(r'[\d.]+')
+NON_DIGITS = re.compile(r'[^\d]')
+
+# Every CSS query of the parse methods, translated and compiled once (see gas_furnaces/extraction.py)
+SELECTORS = compile_css({
+    'next_page': 'a.next_page::attr(href)',
+    'json_ld': 'script[type="application/ld+json"]::text',
+    # Listing cards
+    'used_cards': 'li.classified-listing',
+    'new_cards': 'li > div.new-car-box',
+    'car_link': 'a.car-name::attr(href)',
+    'car_title': 'a.car-name h3::text',
+    'price': '.price-details::text',
+    'city': '.search-vehicle-info li:first-child::text',
+    'updated': '.dated::text',
+    'used_specs': '.search-vehicle-info-2 li::text',
+    'new_specs': '.ad-specs li::text',
+    # Detail pages
+    'detail_groups': '#scroll_car_detail',
+    'detail_labels': 'li.ad-data::text',
+    'detail_values': 'li:not(.ad-data)',
+    'spec_table_rows': '.table.table-striped tr',
+    'spec_sections': '.specs-wrapper',
+    'feature_sections': '#carfeatures .specs-wrapper',
+    'section_heading': '.specs-heading::text',
+    'section_rows': 'table tr',
+    'first_cell_text': 'td:first-child::text',
+    'last_cell': 'td:last-child',
+    'last_cell_text': 'td:last-child::text',
+    'last_cell_check': 'td:last-child .fa-check',
+    'last_cell_cross': 'td:last-child .fa-times',
+    'slider_images': '.lightSlider li img',
+    'gallery_thumbs': '.lSGallery img.slider-thumb',
+    'lazy_images': 'img[data-original]',
+    'seller_comments': 'div.description-details',
+})
+SELLER_COMMENT_LINES = etree.XPath('.//text()[not(ancestor::label)]')
+
 class CarsSpider(scrapy.Spider):
     name = "cars"
     allowed_domains = ["pakwheels.com"]
@@ -32,7 +77,7 @@ class CarsSpider(scrapy.Spider):
             return
 
         # Handle specific vehicle detail pages (containing numeric IDs)
-        if re.search(r'/(used-cars|used-bikes)/[^/]+/\d+/', base_url):
+        if VEHICLE_DETAIL_URL.search(base_url):
             yield from self.parse_used_vehicle_detail(response)
             return
 
@@ -42,7 +87,7 @@ class CarsSpider(scrapy.Spider):
             if '/search/' in base_url:
                 pass
             # Don't modify city/region pages
-            elif re.search(r'/(used-cars|used-bikes)/[a-z-]+/$', base_url):
+            elif CITY_LISTING_URL.search(base_url):
                 pass
             # Only add /search/-/ to root category pages
             elif base_url.endswith(('used-cars/', 'used-bikes/')):
@@ -73,54 +118,60 @@ class CarsSpider(scrapy.Spider):
 
     def parse_used_listing(self, response):
         """Parse used vehicle listings"""
-        for listing in response.css('li.classified-listing'):
-            vehicle_url = listing.css('a.car-name::attr(href)').get()
+        for listing in SELECTORS['used_cards'](response.selector.root):
+            vehicle_url = first(SELECTORS['car_link'], listing, None)
             if vehicle_url:
                 full_url = urljoin('https://www.pakwheels.com', vehicle_url)
+                basic_info = self.extract_basic_info(listing)
                 yield scrapy.Request(
                     url=full_url,
                     callback=self.parse_used_vehicle_detail,
                     meta={
-                        'basic_info': self.extract_basic_info(listing)
+                        'basic_info': basic_info,
+                        # Lets IncrementalMiddleware skip the ad if the card is unchanged since the last crawl
+                        'incremental': {'key': full_url, 'listing': dict(basic_info)},
                     }
                 )
         
-        next_page = response.css('a.next_page::attr(href)').get()
+        next_page = first(SELECTORS['next_page'], response.selector.root, None)
         if next_page:
             yield scrapy.Request(url=urljoin(response.url, next_page), callback=self.parse)
 
     def parse_new_listing(self, response):
         """Parse new vehicle listings"""
-        for listing in response.css('li > div.new-car-box'):
-            vehicle_url = listing.css('a.car-name::attr(href)').get()
+        for listing in SELECTORS['new_cards'](response.selector.root):
+            vehicle_url = first(SELECTORS['car_link'], listing, None)
             if vehicle_url:
                 full_url = urljoin('https://www.pakwheels.com', vehicle_url)
+                basic_info = self.extract_new_basic_info(listing)
                 yield scrapy.Request(
                     url=full_url,
                     callback=self.parse_new_vehicle_detail,
                     meta={
-                        'basic_info': self.extract_new_basic_info(listing)
+                        'basic_info': basic_info,
+                        # Lets IncrementalMiddleware skip the ad if the card is unchanged since the last crawl
+                        'incremental': {'key': full_url, 'listing': dict(basic_info)},
                     }
                 )
         
-        next_page = response.css('a.next_page::attr(href)').get()
+        next_page = first(SELECTORS['next_page'], response.selector.root, None)
         if next_page:
             yield scrapy.Request(url=urljoin(response.url, next_page), callback=self.parse)
 
     def extract_basic_info(self, listing):
-        """Extract basic info from used vehicle listing card"""
+        """Extract basic info from used vehicle listing card (an lxml element)"""
         item = {
-            'listing_url': urljoin('https://www.pakwheels.com', listing.css('a.car-name::attr(href)').get()),
-            'title': listing.css('a.car-name h3::text').get('').strip(),
-            'price': self.parse_price(listing.css('.price-details::text').getall()),
-            'city': listing.css('.search-vehicle-info li:first-child::text').get('').strip(),
-            'is_featured': 'featured' in listing.css('::attr(class)').get(''),
-            'updated_time': listing.css('.dated::text').get('').replace('Updated', '').strip(),
+            'listing_url': urljoin('https://www.pakwheels.com', first(SELECTORS['car_link'], listing, None)),
+            'title': first(SELECTORS['car_title'], listing).strip(),
+            'price': self.parse_price(texts(SELECTORS['price'], listing)),
+            'city': first(SELECTORS['city'], listing).strip(),
+            'is_featured': 'featured' in listing.get('class', ''),
+            'updated_time': first(SELECTORS['updated'], listing).replace('Updated', '').strip(),
             'listing_type': 'used'
         }
 
         # Extract from JSON-LD if available
-        script_data = listing.css('script[type="application/ld+json"]::text').get()
+        script_data = first(SELECTORS['json_ld'], listing, None)
         if script_data:
             try:
                 json_data = json.loads(script_data)
@@ -138,7 +189,7 @@ class CarsSpider(scrapy.Spider):
                 pass
 
         # Extract from visible specs
-        specs = listing.css('.search-vehicle-info-2 li::text').getall()
+        specs = texts(SELECTORS['used_specs'], listing)
         if len(specs) >= 1 and not item.get('year'):
             item['year'] = specs[0].strip()
         if len(specs) >= 2 and not item.get('mileage'):
@@ -153,16 +204,16 @@ class CarsSpider(scrapy.Spider):
         return {k: v for k, v in item.items() if v}
 
     def extract_new_basic_info(self, listing):
-        """Extract basic info from new vehicle listing card"""
+        """Extract basic info from new vehicle listing card (an lxml element)"""
         item = {
-            'listing_url': urljoin('https://www.pakwheels.com', listing.css('a.car-name::attr(href)').get()),
-            'title': listing.css('a.car-name h3::text').get('').strip(),
-            'price': self.parse_price(listing.css('.price-details::text').getall()),
+            'listing_url': urljoin('https://www.pakwheels.com', first(SELECTORS['car_link'], listing, None)),
+            'title': first(SELECTORS['car_title'], listing).strip(),
+            'price': self.parse_price(texts(SELECTORS['price'], listing)),
             'listing_type': 'new'
         }
 
         # Extract from JSON-LD if available
-        script_data = listing.css('script[type="application/ld+json"]::text').get()
+        script_data = first(SELECTORS['json_ld'], listing, None)
         if script_data:
             try:
                 json_data = json.loads(script_data)
@@ -179,7 +230,7 @@ class CarsSpider(scrapy.Spider):
                 pass
 
         # Extract from visible specs
-        specs = listing.css('.ad-specs li::text').getall()
+        specs = texts(SELECTORS['new_specs'], listing)
         if specs:
             item['specs'] = [s.strip() for s in specs if s.strip()]
 
@@ -191,12 +242,12 @@ class CarsSpider(scrapy.Spider):
         
         # Extract specifications
         specs = {}
-        for group in response.css('#scroll_car_detail'):
-            labels = group.css('li.ad-data::text').getall()
-            values = group.css('li:not(.ad-data)').xpath('normalize-space()').getall()
+        for group in SELECTORS['detail_groups'](response.selector.root):
+            labels = texts(SELECTORS['detail_labels'], group)
+            values = [normalize_space(li) for li in SELECTORS['detail_values'](group)]
             
             for label, value in zip_longest(labels, values, fillvalue=''):
-                clean_label = label.strip().replace(':', '').replace(' ', '_').lower()
+                clean_label = normalize_label(label)
                 if clean_label and value.strip():
                     specs[clean_label] = value.strip()
         item.update(specs)
@@ -218,8 +269,8 @@ class CarsSpider(scrapy.Spider):
 
         # Extract seller comments
         seller_comments = []
-        for comment_div in response.css('div.description-details'):
-            comment_lines = comment_div.xpath('.//text()[not(ancestor::label)]').getall()
+        for comment_div in SELECTORS['seller_comments'](response.selector.root):
+            comment_lines = SELLER_COMMENT_LINES(comment_div)
             for line in comment_lines:
                 cleaned_line = line.strip()
                 if cleaned_line and not cleaned_line.startswith('Mention PakWheels.com'):
@@ -236,12 +287,11 @@ class CarsSpider(scrapy.Spider):
         
         # Extract specifications from table
         specs = {}
-        for row in response.css('.table.table-striped tr'):
-            label = row.css('td:first-child::text').get('').strip()
-            value = row.css('td:last-child::text').get('').strip()
+        for row in SELECTORS['spec_table_rows'](response.selector.root):
+            label = first(SELECTORS['first_cell_text'], row).strip()
+            value = first(SELECTORS['last_cell_text'], row).strip()
             if label and value:
-                clean_label = label.strip().replace(':', '').replace(' ', '_').lower()
-                specs[clean_label] = value
+                specs[normalize_label(label)] = value
         item.update(specs)
 
         # Extract detailed specifications and features from tabs
@@ -260,7 +310,7 @@ class CarsSpider(scrapy.Spider):
             item['images'] = images
 
         # Extract additional details from JSON-LD
-        script_data = response.css('script[type="application/ld+json"]::text').get()
+        script_data = first(SELECTORS['json_ld'], response.selector.root, None)
         if script_data:
             try:
                 json_data = json.loads(script_data)
@@ -284,88 +334,56 @@ class CarsSpider(scrapy.Spider):
 
     def extract_detailed_specs(self, response):
         """Extract detailed specifications from specification tabs"""
+        return self.extract_spec_sections(SELECTORS['spec_sections'](response.selector.root))
+
+    def extract_features(self, response):
+        """Extract features from features tabs"""
+        return self.extract_spec_sections(SELECTORS['feature_sections'](response.selector.root))
+
+    def extract_spec_sections(self, sections):
+        """{section: {label: value}} from .specs-wrapper sections of label/value tables"""
         specs = {}
         
-        # Process each specification section
-        for section in response.css('.specs-wrapper'):
-            section_name = section.css('.specs-heading::text').get('').strip()
+        # Process each section
+        for section in sections:
+            section_name = first(SELECTORS['section_heading'], section).strip()
             if not section_name:
                 continue
                 
             section_specs = {}
-            for row in section.css('table tr'):
-                label = row.css('td:first-child::text').get('').strip()
-                value = row.css('td:last-child').xpath('normalize-space()').get('').strip()
+            for row in SELECTORS['section_rows'](section):
+                label = first(SELECTORS['first_cell_text'], row).strip()
+                cells = SELECTORS['last_cell'](row)
+                value = normalize_space(cells[0]).strip() if cells else ''
                 
                 # Handle checkmark icons
                 if not value:
-                    if row.css('td:last-child .fa-check'):
+                    if SELECTORS['last_cell_check'](row):
                         value = 'Yes'
-                    elif row.css('td:last-child .fa-times'):
+                    elif SELECTORS['last_cell_cross'](row):
                         value = 'No'
                 
                 if label and value:
-                    clean_label = label.strip().replace(':', '').replace(' ', '_').lower()
-                    section_specs[clean_label] = value
+                    section_specs[normalize_label(label)] = value
             
             if section_specs:
                 specs[section_name.lower().replace(' ', '_')] = section_specs
         
         return specs if specs else None
 
-    def extract_features(self, response):
-        """Extract features from features tabs"""
-        features = {}
-        
-        # Process each feature section
-        for section in response.css('#carfeatures .specs-wrapper'):
-            section_name = section.css('.specs-heading::text').get('').strip()
-            if not section_name:
-                continue
-                
-            section_features = {}
-            for row in section.css('table tr'):
-                label = row.css('td:first-child::text').get('').strip()
-                value = row.css('td:last-child').xpath('normalize-space()').get('').strip()
-                
-                # Handle checkmark icons
-                if not value:
-                    if row.css('td:last-child .fa-check'):
-                        value = 'Yes'
-                    elif row.css('td:last-child .fa-times'):
-                        value = 'No'
-                
-                if label and value:
-                    clean_label = label.strip().replace(':', '').replace(' ', '_').lower()
-                    section_features[clean_label] = value
-            
-            if section_features:
-                features[section_name.lower().replace(' ', '_')] = section_features
-        
-        return features if features else None
-
     def extract_images(self, response):
         """Extract all images from vehicle detail page"""
-        images = []
-        
+        root = response.selector.root
         # Method 1: From lightSlider main images
-        for img in response.css('.lightSlider li img'):
-            img_url = img.css('::attr(data-original)').get() or img.css('::attr(src)').get()
-            if img_url and not img_url.startswith('data:image') and img_url not in images:
-                images.append(img_url)
-        
+        candidates = [img.get('data-original') or img.get('src') for img in SELECTORS['slider_images'](root)]
         # Method 2: From thumbnail gallery
-        for thumb in response.css('.lSGallery img.slider-thumb'):
-            thumb_url = thumb.css('::attr(src)').get() or thumb.css('::attr(data-original)').get()
-            if thumb_url and not thumb_url.startswith('data:image') and thumb_url not in images:
-                images.append(thumb_url)
+        candidates += [thumb.get('src') or thumb.get('data-original') for thumb in SELECTORS['gallery_thumbs'](root)]
+        images = unique(url for url in candidates if url and not url.startswith('data:image'))
         
         # Method 3: Fallback to any image with data-original attribute
         if not images:
-            for img in response.css('img[data-original]'):
-                img_url = img.css('::attr(data-original)').get()
-                if img_url and img_url not in images:
-                    images.append(img_url)
+            images = unique(img.get('data-original') for img in SELECTORS['lazy_images'](root))
+            images = [url for url in images if url]
         
         # Clean image URLs
         clean_images = []
@@ -386,12 +404,12 @@ class CarsSpider(scrapy.Spider):
         
         if 'lac' in price_text.lower():
             try:
-                num = float(re.search(r'[\d.]+', price_text).group())
+                num = float(PRICE_NUMBER.search(price_text).group())
                 return int(num * 100000)
             except (AttributeError, ValueError):
                 pass
         
         try:
-            return int(re.sub(r'[^\d]', '', price_text))
+            return int(NON_DIGITS.sub('', price_text))
         except ValueError:
             return None
\ No newline at end of file
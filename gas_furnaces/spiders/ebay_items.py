@@ -1,3 +1,5 @@
+import re
+
 import scrapy
 
 
@@ -18,7 +20,6 @@ class EbayItemsSpider(scrapy.Spider):
         'CONCURRENT_REQUESTS': 1,  # Reduced from 4
         'COOKIES_ENABLED': True,
         'AUTOTHROTTLE_ENABLED': True,
-        'HTTPCACHE_ENABLED': True,
         'RETRY_TIMES': 5,
         'RETRY_HTTP_CODES': [500, 502, 503, 504, 400, 403, 404, 408, 429, 307]
     }
@@ -26,13 +27,19 @@ class EbayItemsSpider(scrapy.Spider):
     def parse(self, response):
         response = response.replace(encoding='utf-8')
         # First, collect all product URLs from the listing page
-        product_urls = response.css('div.brwrvr__item-card__image-wrapper a::attr(href)').getall()
-        
-        for url in product_urls:
+        for link in response.css('div.brwrvr__item-card__image-wrapper a'):
+            url = link.attrib.get('href')
+            if not url:
+                continue
+            card = link.xpath('ancestor::li[contains(@class, "brwrvr__item-card")][1]')
             yield response.follow(
                 url,
                 callback=self.parse_product,
-                meta={'original_url': url}
+                meta={
+                    'original_url': url,
+                    # Lets IncrementalMiddleware skip the item if its card is unchanged since the last crawl
+                    'incremental': {'key': self.item_key(url), 'listing': self.extract_card(card)},
+                }
             )
 
         # Pagination handling
@@ -40,6 +47,20 @@ class EbayItemsSpider(scrapy.Spider):
         if next_page:
             yield response.follow(next_page, self.parse)
 
+    def item_key(self, url):
+        """Item URLs carry per-page-load tracking parameters; the item number identifies the page."""
+        match = re.search(r'/itm/(\d+)', url)
+        return f"itm/{match.group(1)}" if match else url.split('#')[0]
+
+    def extract_card(self, card):
+        """Title, price and shipping shown on the listing card, if the card has loaded"""
+        fields = {
+            'card_title': card.css('.bsig__title__text::text').get('').strip(),
+            'card_price': ''.join(card.css('.bsig__price--displayprice::text').getall()).strip(),
+            'card_shipping': card.css('.bsig__logisticsCost::text').get('').strip(),
+        }
+        return {k: v for k, v in fields.items() if v}
+
     def parse_product(self, response):
         # Extract basic product info
         product = {
@@ -1,14 +1,28 @@
 import scrapy
-from bs4 import BeautifulSoup, Comment
+import copy
 import re
+from lxml.html import tostring
+
+# Mis-decoded characters (mojibake of bullets, quotes and trademark signs)
+JUNK_CHARACTERS = re.compile(r'[Ââ€¢€™®]')
+WHITESPACE = re.compile(r'\s+')
+
+
+def clean_text(text):
+    if not text:
+        return text
+    return WHITESPACE.sub(' ', JUNK_CHARACTERS.sub('', text))
+
 
 class GasSpider(scrapy.Spider):
     name = "gas"
     allowed_domains = ["lennoxpros.com"]
     #start_urls = ["https://www.lennoxpros.com/hvac/furnaces/gas-furnaces/c/r109"]
 
-    def __init__(self, start_url=None, *args, **kwargs):
+    def __init__(self, start_url=None, description=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # The cleaned description is costly and large, so it is only scraped with `-a description=1`
+        self.include_description = description in ('1', 'true', 'yes')
         if start_url:
             self.start_urls = [start_url]  # Set the start URL from the command line
         else:
@@ -23,65 +37,57 @@ class GasSpider(scrapy.Spider):
     }
 
 
-    def clean_and_prettify_html(self, html_content):
-        # Create a BeautifulSoup object for parsing
-        soup = BeautifulSoup(html_content, 'html.parser')   
-        
-            
-        # Remove comments and unnecessary tags like divs containing PDFs
-        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-            comment.extract()
+    def clean_description(self, element):
+        """
+        Cleaned HTML of the product overview, from the element parsel already parsed.
 
-        # # Remove divs containing .pdf links
-        
-        # Remove divs containing links to PDF files
-        for link in soup.find_all('a', href=True):
-            if '.pdf' in link['href']:
-                parent_div = link.find_parent('div')
-                if parent_div:
-                    parent_div.decompose()  # Remove the entire div containing the PDF link
+        One bottom-up walk over a copy of the element's tree: comments, style
+        and script go; a div holding a PDF link is removed with it; the
+        "Product Overview" heading and empty paragraphs are removed; div and
+        span tags are unwrapped; stray encoding characters are removed from the
+        text and its runs of whitespace, tabs included, collapsed to one space.
+        Args:
+            element (lxml.html.HtmlElement): The description container, e.g. Selector.root.
+        Returns:
+            str: The container's inner HTML.
+        """
+        root = copy.deepcopy(element)
+        root.tail = None
+        if self._clean_children(root):
+            # PDF links with no div of their own inside the container
+            for link in list(root.iter('a')):
+                if '.pdf' in link.get('href', ''):
+                    link.drop_tree()
+        html = (root.text or '') + ''.join(tostring(child, encoding='unicode') for child in root)
+        return html.strip()
 
-        # Clean up weird characters
-        text = str(soup)
-        clean_text = re.sub(r'[Ââ€¢€™®]', '', text)
-        
-        # Remove tab characters and extra whitespace
-        clean_text = clean_text.replace('\t', '').strip()
-        
-        # Parse the cleaned text back into BeautifulSoup for pretty output (optional)
-        clean_soup = BeautifulSoup(clean_text, 'html.parser')
-        # Return prettified HTML content
-        prettified_html = clean_soup.prettify()
-
-        return prettified_html
-    
-    def simplify_html(self, html_code):
-	
-        # Replace the soup content with the cleaned HTML
-        soup = BeautifulSoup(html_code, 'html.parser')
-
-        # Remove h2 tags containing the text 'Product Overview'
-        for h2_tag in soup.find_all('h2'):
-            if 'Product Overview' in h2_tag.get_text():
-                h2_tag.decompose()  # Remove the entire h2 tag
-    
-    # Remove specified tags: div, span, style
-        for tag in soup.find_all(['div', 'span', 'style']):
-                tag.unwrap()
-
-    
-    # Find all <p> tags and remove the empty ones
-        for p in soup.find_all('p'):
-            if not p.get_text(strip=True):  # Check if <p> tag is empty or contains only whitespace
-                p.decompose()
+    def _clean_children(self, parent):
+        """Clean the subtree under `parent`; returns True if a PDF link is left whose div is still to be removed."""
+        parent.text = clean_text(parent.text)
+        pdf_link = False
+        for child in list(parent):
+            child.tail = clean_text(child.tail)
+            if not isinstance(child.tag, str) or child.tag in ('style', 'script'):
+                child.drop_tree()
+                continue
+            child_pdf_link = self._clean_children(child)
+            if child.tag == 'a' and '.pdf' in child.get('href', ''):
+                child_pdf_link = True
+            if child.tag == 'div':
+                if child_pdf_link:
+                    child.drop_tree()
+                    child_pdf_link = False
+                else:
+                    child.drop_tag()
+            elif child.tag == 'span':
+                child.drop_tag()
+            elif child.tag == 'h2' and 'Product Overview' in child.text_content():
+                child.drop_tree()
+            elif child.tag == 'p' and not child.text_content().strip():
+                child.drop_tree()
+            pdf_link = pdf_link or child_pdf_link
+        return pdf_link
 
-        cleaned_html = soup.prettify()
-    
-        # Clean up unnecessary spaces and newlines
-        cleaned_html = ' '.join(line.strip() for line in cleaned_html.splitlines() if line.strip())
-        cleaned_html = soup.prettify()
-        return cleaned_html
-    
     def parse(self, response):
         # Extract product page links and images from the main product list page
         product_links = response.css('.inner a::attr(href)').getall()
@@ -101,11 +107,12 @@ class GasSpider(scrapy.Spider):
     def parse_product(self, response):
         # Extract product name and image URL
         product_title = response.css('h1::text').get()
-        product_description = response.css('div.col-12.col-xl-8.Product-overview').get()
-        product_description = self.clean_and_prettify_html(product_description)
-        product_description_new = self.simplify_html(product_description)
-        
-        
+        product_description = None
+        if self.include_description:
+            overview = response.css('div.col-12.col-xl-8.Product-overview')
+            if overview:
+                product_description = self.clean_description(overview[0].root)
+
         # Extract specification table
         specifications = {}
         spec_rows = response.css('.specification-container')
@@ -125,14 +132,15 @@ class GasSpider(scrapy.Spider):
         image_url = response.meta.get('image_url', '')
         
         # Store product data
-        yield {
+        product = {
             'Product Page_url': response.url,
             'Product Image_url': image_url,
             'Image_Large': image_url.replace("?$product_related$", ""),
             'Product Name': product_name,
             'Product Title': product_title,
-            #'Product Description': product_description,
-            #'Product Description New': product_description_new,
             'Product Listing Title': product_listing_title,
             **specifications
-        }
\ No newline at end of file
+        }
+        if self.include_description:
+            product['Product Description'] = product_description
+        yield product
\ No newline at end of file
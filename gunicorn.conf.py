@@ -0,0 +1,29 @@
+# Gunicorn picks this file up automatically from the working directory.
+import os
+
+bind = "0.0.0.0:5000"
+workers = int(os.getenv("WEB_CONCURRENCY", 4))
+
+# Threaded workers: a request waiting on the LLM gateway parks a cheap thread,
+# not a whole process, so logins and history fetches keep being served.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 32))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+
+def post_fork(server, worker):
+    # Load and warm the embedding model in every worker before it accepts
+    # requests, so the first PDF question does not pay the cold start.
+    if os.getenv("EMBEDDING_WARMUP", "1") != "1":
+        return
+    from utils.embeddings import warm_up, get_embedding_stats
+
+    try:
+        warm_up()
+        stats = get_embedding_stats()
+        server.log.info(
+            "Worker %s embedding model ready (load %ss, warm-up %ss)",
+            worker.pid, stats["load_seconds"], stats["warmup_seconds"],
+        )
+    except Exception as e:
+        server.log.warning("Embedding warm-up failed in worker %s: %s", worker.pid, e)
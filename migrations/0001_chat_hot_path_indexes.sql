@@ -0,0 +1,12 @@
+-- migrate: no-transaction
+-- Indexes for the chat history and session list hot paths. Built CONCURRENTLY so
+-- an existing deployment keeps serving writes while they are created.
+
+-- get_chat_history: WHERE chat_session_id = ? ORDER BY created_at, message_id;
+-- delete_chat_session filters on the same leading column.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_history_session_created_idx
+    ON public.chat_history (chat_session_id, created_at, message_id);
+
+-- get_user_chat_sessions and store_message: WHERE user_id = ? ORDER BY created_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_sessions_user_created_idx
+    ON public.chat_sessions (user_id, created_at DESC) INCLUDE (session_id);
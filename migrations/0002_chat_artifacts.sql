@@ -0,0 +1,19 @@
+-- migrate: no-transaction
+-- Large message bodies (scrape previews, long answers) live in chat_artifacts,
+-- zlib-compressed and keyed by the SHA-256 of the text. chat_history keeps a
+-- short summary in `message` and points at the full body.
+
+CREATE TABLE IF NOT EXISTS public.chat_artifacts
+(
+    digest character(64) PRIMARY KEY,
+    content bytea NOT NULL,
+    size_bytes integer NOT NULL,
+    created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE public.chat_history
+    ADD COLUMN IF NOT EXISTS artifact_digest character(64) REFERENCES public.chat_artifacts (digest);
+
+-- /artifacts/<id> checks the requesting user owns a message that references the artifact
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_history_artifact_idx
+    ON public.chat_history (artifact_digest, user_id) WHERE artifact_digest IS NOT NULL;
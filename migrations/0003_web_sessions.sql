@@ -0,0 +1,12 @@
+-- Server-side Flask sessions (utils/session_store.py, SESSION_BACKEND=postgres).
+-- The session cookie carries only the signed session_id.
+
+CREATE TABLE IF NOT EXISTS public.web_sessions
+(
+    session_id text PRIMARY KEY,
+    data text NOT NULL,
+    expires_at timestamp with time zone NOT NULL
+);
+
+-- Expiry sweeping deletes by expires_at
+CREATE INDEX IF NOT EXISTS web_sessions_expires_idx ON public.web_sessions (expires_at);
@@ -0,0 +1,35 @@
+-- Scrape requests from /ask are queued here and run by the scrape worker
+-- (python -m utils.scrape_worker), so a crawl never holds a web worker and
+-- a queued or running job survives restarts of either process.
+
+CREATE TABLE IF NOT EXISTS public.scrape_jobs
+(
+    job_id integer PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    user_id integer NOT NULL,
+    chat_session_id integer,
+    spider text NOT NULL,
+    url text NOT NULL,
+    output_format character varying(10) NOT NULL,
+    status character varying(10) NOT NULL DEFAULT 'queued',
+    attempts integer NOT NULL DEFAULT 0,
+    items_scraped integer NOT NULL DEFAULT 0,
+    pages_crawled integer NOT NULL DEFAULT 0,
+    output_file text,
+    answer text,
+    error text,
+    created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    started_at timestamp with time zone,
+    heartbeat_at timestamp with time zone,
+    finished_at timestamp with time zone,
+    CONSTRAINT scrape_jobs_user_id_fkey FOREIGN KEY (user_id)
+        REFERENCES public.users (id)
+        ON DELETE CASCADE,
+    CONSTRAINT scrape_jobs_chat_session_id_fkey FOREIGN KEY (chat_session_id)
+        REFERENCES public.chat_sessions (session_id)
+        ON DELETE SET NULL,
+    CONSTRAINT scrape_jobs_status_check CHECK (status IN ('queued', 'running', 'succeeded', 'failed'))
+);
+
+-- Workers claim the oldest queued job, and look for running jobs whose worker stopped sending heartbeats
+CREATE INDEX IF NOT EXISTS scrape_jobs_queued_idx ON public.scrape_jobs (created_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS scrape_jobs_running_idx ON public.scrape_jobs (heartbeat_at) WHERE status = 'running';
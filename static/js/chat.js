@@ -30,6 +30,17 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         }
     });
+    // Cursor of the oldest loaded history page; null once the first message is shown
+    let historyCursor = null;
+    let loadingOlderHistory = false;
+
+    // Fetch the previous history page when the user scrolls near the top
+    chatBody.addEventListener('scroll', function() {
+        if (chatBody.scrollTop < 100 && historyCursor && !loadingOlderHistory) {
+            loadOlderHistory();
+        }
+    });
+
     // Add session storage variables
     let isNewLogin = !sessionStorage.getItem('wasLoggedIn');
     sessionStorage.setItem('wasLoggedIn', 'true');
@@ -93,9 +104,9 @@ document.addEventListener('DOMContentLoaded', function() {
                         throw new Error(data.error);
                     }
 
-                    // Store the file context
-                    currentFileContext = data.context;
-                    console.log('File context stored:', currentFileContext ? 'yes' : 'no');
+                    // Store the server-side document ID
+                    currentDocumentId = data.document_id;
+                    console.log('Document ID stored:', currentDocumentId ? 'yes' : 'no');
 
                     // Update UI
                     if (fileName && attachmentPreview) {
@@ -126,7 +137,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (fileInput) {
                 fileInput.value = '';
             }
-            currentFileContext = null; // Clear the file context
+            currentDocumentId = null; // Clear the uploaded document
             attachmentPreview.classList.remove('show');
         });
     }
@@ -178,8 +189,10 @@ document.addEventListener('DOMContentLoaded', function() {
     let sentMessages = new Set();
     let isWaitingForResponse = false;
     let currentAttachedFile = null;
-    let currentFileContext = null;
+    let currentDocumentId = null;
     let lastScrapingMessage = '';
+    // How often a queued scrape's progress is checked
+    const SCRAPE_POLL_INTERVAL_MS = 2000;
 
     // Initialize
     initializeTheme();
@@ -364,8 +377,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 fileName.textContent = file.name;
                 attachmentPreview.classList.add('show');
                 
-                // Store the context
-                currentFileContext = data.context;
+                // Store the server-side document ID
+                currentDocumentId = data.document_id;
 
                 // Add remove file handler
                 const removeFileBtn = attachmentPreview.querySelector('.remove-file');
@@ -373,7 +386,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     console.log('Remove button clicked'); // Debug log
                     e.stopPropagation(); // Prevent event bubbling
                     currentAttachedFile = null;
-                    currentFileContext = null;
+                    currentDocumentId = null;
                     attachmentPreview.classList.remove('show');
                     fileInput.value = ''; // Clear the file input
                     fileName.textContent = ''; // Clear the file name
@@ -542,6 +555,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Update current session ID and localStorage
         currentChatSessionId = sessionId;
         localStorage.setItem('lastActiveSession', sessionId);
+        historyCursor = null;
 
         // Clear and show loading state
         const chatBody = document.getElementById('chat-body');
@@ -558,7 +572,8 @@ document.addEventListener('DOMContentLoaded', function() {
             const response = await fetch(`/get_chat_history?session_id=${sessionId}`);
             if (!response.ok) throw new Error('Failed to fetch chat history');
             
-            const data = await response.json();
+            const page = await response.json();
+            const data = page.messages;
             chatBody.innerHTML = ''; // Clear loading indicator
 
             if (!Array.isArray(data) || data.length === 0) {
@@ -571,22 +586,18 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
 
-            // Sort messages by timestamp
-            data.sort((a, b) => {
-                const timeA = new Date(a.created_at).getTime();
-                const timeB = new Date(b.created_at).getTime();
-                return timeA - timeB;
-            });
-
-            // Display messages
+            // Display messages (the server returns the latest page, oldest first)
             data.forEach(message => {
                 if (message.message && message.sender) {
-                    displayMessage(message.message, message.sender, message.created_at);
+                    const messageDiv = displayMessage(message.message, message.sender, message.created_at);
+                    attachArtifactLink(messageDiv, message.artifact_id);
                 }
             });
+            historyCursor = page.next_before;
 
             // Scroll to bottom after loading messages
             scrollToBottom();
+            fillChatBody();
 
         } catch (error) {
             console.error('Error loading chat history:', error);
@@ -600,6 +611,72 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Prepend the page of messages preceding the oldest one on screen
+    async function loadOlderHistory() {
+        const sessionId = currentChatSessionId;
+        let loaded = false;
+        loadingOlderHistory = true;
+        try {
+            const response = await fetch(`/get_chat_history?session_id=${sessionId}&before=${encodeURIComponent(historyCursor)}`);
+            if (!response.ok) throw new Error('Failed to fetch chat history');
+            const page = await response.json();
+            // The user switched sessions while this page was loading
+            if (sessionId !== currentChatSessionId) return;
+
+            // Keep the messages the user is looking at in place
+            const previousHeight = chatBody.scrollHeight;
+            const previousTop = chatBody.scrollTop;
+            const firstMessage = chatBody.firstChild;
+            page.messages.forEach(message => {
+                if (message.message && message.sender) {
+                    const messageDiv = displayMessage(message.message, message.sender, message.created_at);
+                    attachArtifactLink(messageDiv, message.artifact_id);
+                    chatBody.insertBefore(messageDiv, firstMessage);
+                }
+            });
+            chatBody.scrollTop = chatBody.scrollHeight - previousHeight + previousTop;
+            historyCursor = page.next_before;
+            loaded = true;
+        } catch (error) {
+            console.error('Error loading older messages:', error);
+        } finally {
+            loadingOlderHistory = false;
+        }
+        if (loaded) fillChatBody();
+    }
+
+    // A page too short to scroll fires no scroll event, so keep loading until the chat
+    // body overflows or the first message is shown
+    function fillChatBody() {
+        if (historyCursor && !loadingOlderHistory && chatBody.scrollHeight <= chatBody.clientHeight) {
+            loadOlderHistory();
+        }
+    }
+
+    // Large messages come back from history as a summary; fetch the full text on request
+    function attachArtifactLink(messageDiv, artifactId) {
+        if (!artifactId) return;
+        const button = document.createElement('button');
+        button.className = 'show-full-message-btn';
+        button.textContent = 'Show full message';
+        button.addEventListener('click', async () => {
+            button.disabled = true;
+            button.textContent = 'Loading...';
+            try {
+                const response = await fetch(`/artifacts/${artifactId}`);
+                if (!response.ok) throw new Error('Failed to fetch message');
+                const data = await response.json();
+                messageDiv.querySelector('.markdown-content').innerHTML = marked.parse(data.content);
+                button.remove();
+            } catch (error) {
+                console.error('Error loading full message:', error);
+                button.disabled = false;
+                button.textContent = 'Show full message';
+            }
+        });
+        messageDiv.querySelector('.markdown-content').after(button);
+    }
+
     // Add retry function
     function retryLoadHistory(sessionId) {
         if (sessionId) {
@@ -828,6 +905,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Reset current session ID
             currentChatSessionId = null;
+            historyCursor = null;
             localStorage.removeItem('lastActiveSession');
             
             // Remove active class from all sessions
@@ -931,6 +1009,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 currentChatSessionId = sessionData.session_id;
             }
 
+            // Stream regular chat answers; scraping requests still use /ask
+            const isScrapeRequest = /https?:\/\/\S+/.test(message) && message.toLowerCase().includes('scrape');
+            if (!isScrapeRequest) {
+                await streamAnswer(message, loadingMessage);
+                return;
+            }
+
             // Send message to server
             const response = await fetch('/ask', {
                 method: 'POST',
@@ -940,7 +1025,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: JSON.stringify({
                     message: message,
                     session_id: currentChatSessionId,
-                    file_context: currentFileContext
+                    document_id: currentDocumentId
                 })
             });
 
@@ -960,6 +1045,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
 
+            // Scrapes run in the background; follow the job until it finishes
+            if (data.type === 'scrape_job') {
+                followScrapeJob(data);
+                return;
+            }
+
             // Display the bot's response
             displayMessage(data.answer, 'bot');
 
@@ -973,6 +1064,137 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Stream an answer from /ask/stream and render tokens as they arrive
+    async function streamAnswer(message, loadingMessage) {
+        const response = await fetch('/ask/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                message: message,
+                session_id: currentChatSessionId,
+                document_id: currentDocumentId
+            })
+        });
+
+        if (!response.ok) {
+            loadingMessage.remove();
+            const data = await response.json().catch(() => ({}));
+            displayErrorMessage(data.error);
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        let messageDiv = null;
+        let renderPending = false;
+
+        // Re-render markdown at most once per animation frame
+        const render = (text) => {
+            if (!messageDiv) {
+                loadingMessage.remove();
+                messageDiv = displayMessage(' ', 'bot');
+            }
+            if (renderPending) return;
+            renderPending = true;
+            requestAnimationFrame(() => {
+                renderPending = false;
+                const content = messageDiv.querySelector('.markdown-content');
+                try {
+                    content.innerHTML = marked.parse(answer);
+                } catch (error) {
+                    content.textContent = answer;
+                }
+                scrollToBottom();
+            });
+        };
+
+        const handleEvent = (frame) => {
+            let eventName = 'message';
+            let payload = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) payload += line.slice(6);
+            });
+            if (!payload) return;
+            const data = JSON.parse(payload);
+
+            if (eventName === 'error') {
+                if (!messageDiv) loadingMessage.remove();
+                displayErrorMessage(data.error);
+            } else if (eventName === 'done') {
+                // The server sends the final, formatted answer once generation ends
+                answer = data.answer;
+                render(answer);
+            } else if (data.token) {
+                answer += data.token;
+                render(answer);
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                handleEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+            }
+        }
+
+        if (!messageDiv && loadingMessage.isConnected) {
+            loadingMessage.remove();
+            displayErrorMessage();
+        }
+    }
+
+    // Show a queued scrape and poll its progress until the answer is ready
+    function followScrapeJob(job) {
+        const messageDiv = displayMessage(job.message, 'bot');
+        const content = messageDiv.querySelector('.markdown-content');
+        const status = document.createElement('p');
+        status.className = 'scrape-job-status';
+        status.textContent = 'Waiting for a scraper...';
+        content.appendChild(status);
+
+        const poll = async () => {
+            // Stop once the user has switched to another chat
+            if (!messageDiv.isConnected) return;
+            try {
+                const response = await fetch(`/scrape_jobs/${job.job_id}`);
+                const data = await response.json();
+                if (!response.ok) {
+                    status.textContent = data.error || 'Could not check the scrape progress.';
+                    return;
+                }
+                if (data.status === 'succeeded' || data.status === 'failed') {
+                    try {
+                        content.innerHTML = marked.parse(data.answer || data.error || '');
+                    } catch (error) {
+                        content.textContent = data.answer || data.error || '';
+                    }
+                    scrollToBottom();
+                    return;
+                }
+                if (data.status === 'running') {
+                    status.textContent = `Scraping... ${data.items_scraped} items from ${data.pages_crawled} pages so far.`;
+                } else {
+                    status.textContent = data.jobs_ahead
+                        ? `Queued behind ${data.jobs_ahead} other scrape${data.jobs_ahead === 1 ? '' : 's'}...`
+                        : 'Waiting for a scraper...';
+                }
+            } catch (error) {
+                console.error('Error checking scrape job:', error);
+            }
+            setTimeout(poll, SCRAPE_POLL_INTERVAL_MS);
+        };
+        setTimeout(poll, SCRAPE_POLL_INTERVAL_MS);
+    }
+
     // Update handleFormatSelection function
     async function handleFormatSelection(selectedFormat) {
         if (!lastScrapingMessage) {
@@ -994,7 +1216,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     message: lastScrapingMessage,
                     session_id: currentChatSessionId,
                     selected_format: selectedFormat,
-                    file_context: currentFileContext
+                    document_id: currentDocumentId
                 })
             });
             
@@ -1009,7 +1231,11 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             
             // Display the response
-            displayMessage(data.answer, 'bot');
+            if (data.type === 'scrape_job') {
+                followScrapeJob(data);
+            } else {
+                displayMessage(data.answer, 'bot');
+            }
             
             // Clear the stored scraping message after successful processing
             lastScrapingMessage = '';
@@ -1128,6 +1354,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     sessionElement.remove();
                     if (currentChatSessionId === sessionId) {
                         currentChatSessionId = null;
+                        historyCursor = null;
                         chatBody.innerHTML = '';
                         displayWelcomeScreen();
                     }
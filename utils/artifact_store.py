@@ -0,0 +1,99 @@
+import os
+import re
+import zlib
+
+from psycopg2.extras import execute_values # type: ignore
+
+from utils.index_cache import hash_text
+
+# Messages larger than this (UTF-8 bytes) are stored as artifacts
+ARTIFACT_MIN_BYTES = int(os.getenv("ARTIFACT_MIN_BYTES", 2048))
+ARTIFACT_SUMMARY_CHARS = int(os.getenv("ARTIFACT_SUMMARY_CHARS", 400))
+
+# Artifact IDs are SHA-256 content hashes
+ARTIFACT_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# A last line this short is kept in the summary; for scrape results it is the download link
+MAX_KEPT_LAST_LINE = 300
+
+
+def is_valid_artifact_id(artifact_id):
+    return isinstance(artifact_id, str) and bool(ARTIFACT_ID_PATTERN.match(artifact_id))
+
+
+def summarize(text, max_chars=ARTIFACT_SUMMARY_CHARS):
+    """
+    Short stand-in for a large message: its opening lines and, if short, its last line.
+    Args:
+        text (str): The full message.
+        max_chars (int): Approximate length of the opening part.
+    Returns:
+        str: The summary shown in chat history until the full message is requested.
+    """
+    head = text[:max_chars]
+    # Cut at a line break when there is one, so markdown and JSON lines stay whole, else between words
+    if '\n' in head[max_chars // 2:]:
+        head = head[:head.rindex('\n')]
+    elif ' ' in head[max_chars // 2:]:
+        head = head[:head.rindex(' ')]
+    summary = head.rstrip() + "\n\n…"
+    last_line = text.rstrip().rsplit('\n', 1)[-1].strip()
+    if last_line and len(last_line) <= MAX_KEPT_LAST_LINE and last_line not in head:
+        summary += "\n\n" + last_line
+    return summary
+
+
+def externalize(rows, min_bytes=ARTIFACT_MIN_BYTES):
+    """
+    Split large chat_history rows into a summary row plus an artifact.
+    Args:
+        rows (list): (session_id, user_id, sender, message) tuples.
+        min_bytes (int): Messages above this size become artifacts.
+    Returns:
+        tuple: (rows with an artifact digest appended, or None for small
+            messages; artifacts as (digest, compressed content, size) tuples).
+    """
+    stored_rows = []
+    artifacts = {}
+    for session_id, user_id, sender, message in rows:
+        encoded = message.encode('utf-8')
+        if len(encoded) <= min_bytes:
+            stored_rows.append((session_id, user_id, sender, message, None))
+            continue
+        digest = hash_text(message)
+        if digest not in artifacts:
+            artifacts[digest] = (digest, zlib.compress(encoded, 6), len(encoded))
+        stored_rows.append((session_id, user_id, sender, summarize(message), digest))
+    return stored_rows, list(artifacts.values())
+
+
+def save_artifacts(cur, artifacts):
+    """Insert artifacts in the cursor's transaction; identical content is stored once."""
+    if artifacts:
+        execute_values(
+            cur,
+            "INSERT INTO chat_artifacts (digest, content, size_bytes) VALUES %s ON CONFLICT (digest) DO NOTHING",
+            artifacts,
+        )
+
+
+def load_artifact(cur, artifact_id, user_id):
+    """
+    Fetch the full text of an artifact the user has in their chat history.
+    Args:
+        cur: psycopg2 cursor.
+        artifact_id (str): Digest returned with the summarized message.
+        user_id: The requesting user.
+    Returns:
+        str or None: The text, or None if unknown or not referenced by the user's messages.
+    """
+    if not is_valid_artifact_id(artifact_id):
+        return None
+    cur.execute("""
+        SELECT a.content
+        FROM chat_artifacts a
+        WHERE a.digest = %s
+          AND EXISTS (SELECT 1 FROM chat_history h WHERE h.artifact_digest = a.digest AND h.user_id = %s)
+    """, (artifact_id, user_id))
+    row = cur.fetchone()
+    return zlib.decompress(bytes(row[0])).decode('utf-8') if row else None
@@ -0,0 +1,114 @@
+import os
+import re
+
+# Extractors separate pages with a form feed so chunks never straddle a page boundary
+PAGE_BREAK = "\f"
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 150))
+
+# Markdown headings, numbered section titles ("2.1 Results") and short ALL CAPS lines
+HEADING_PATTERN = re.compile(
+    r'^(?:#{1,6}\s+\S.*'
+    r'|(?:\d+\.)+\d*\s+[A-Z][^.!?]{0,80}'
+    r'|[A-Z][A-Z0-9 ,&/\-]{2,60})$'
+)
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1 if text else 0
+
+
+def _split_sections(page_text):
+    """Split a page into (heading, body) sections at heading-looking lines."""
+    sections = []
+    heading = None
+    lines = []
+    for line in page_text.splitlines():
+        stripped = line.strip()
+        if stripped and HEADING_PATTERN.match(stripped):
+            if any(l.strip() for l in lines):
+                sections.append((heading, "\n".join(lines)))
+            heading = stripped.lstrip('#').strip()
+            lines = [line]
+        else:
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((heading, "\n".join(lines)))
+    return sections
+
+
+def _make_splitter(chunk_size, chunk_overlap):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter # type: ignore
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+
+
+def chunk_page(page_number, page_text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, splitter=None):
+    """
+    Split one page into chunks at heading boundaries.
+    Only sections longer than `chunk_size` are cut further with a recursive
+    character splitter; short neighbouring sections are packed together.
+    Args:
+        page_number (int): 1-based page number recorded in the metadata.
+        page_text (str): Text of the page.
+        chunk_size (int): Maximum characters per chunk.
+        chunk_overlap (int): Characters shared between neighbouring chunks.
+        splitter: Optional pre-built splitter to reuse across pages.
+    Returns:
+        tuple: (list of chunk strings, list of metadata dicts with page and heading).
+    """
+    chunks = []
+    metadatas = []
+    if not page_text.strip():
+        return chunks, metadatas
+
+    pending_heading, pending = None, ""
+    for heading, section in _split_sections(page_text):
+        if pending and len(pending) + len(section) + 1 <= chunk_size:
+            pending += "\n" + section
+            continue
+        if pending:
+            chunks.append(pending.strip())
+            metadatas.append({"page": page_number, "heading": pending_heading})
+            pending = ""
+        if len(section) <= chunk_size:
+            pending_heading, pending = heading, section
+            continue
+        if splitter is None:
+            splitter = _make_splitter(chunk_size, chunk_overlap)
+        for piece in splitter.split_text(section):
+            piece = piece.strip()
+            if piece:
+                chunks.append(piece)
+                metadatas.append({"page": page_number, "heading": heading})
+    if pending.strip():
+        chunks.append(pending.strip())
+        metadatas.append({"page": page_number, "heading": pending_heading})
+    return chunks, metadatas
+
+
+def split_document(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Split extracted document text into small, retrievable chunks.
+    Pages are split first, then heading-delimited sections (see chunk_page).
+    Args:
+        text (str): Document text, pages separated by PAGE_BREAK.
+        chunk_size (int): Maximum characters per chunk.
+        chunk_overlap (int): Characters shared between neighbouring chunks.
+    Returns:
+        tuple: (list of chunk strings, list of metadata dicts with page and heading).
+    """
+    splitter = _make_splitter(chunk_size, chunk_overlap)
+    chunks = []
+    metadatas = []
+    for page_number, page_text in enumerate(text.split(PAGE_BREAK), 1):
+        page_chunks, page_metadatas = chunk_page(page_number, page_text, chunk_size, chunk_overlap, splitter)
+        chunks.extend(page_chunks)
+        metadatas.extend(page_metadatas)
+    return chunks, metadatas
@@ -0,0 +1,154 @@
+"""
+In-process Scrapy runner for the scrape worker.
+
+`scrapy crawl` re-imports Scrapy, Twisted and the gas_furnaces project and
+starts a new reactor for every job before its first request goes out.
+CrawlerService starts the reactor once, on its own thread, and runs every
+job as a crawl on one CrawlerRunner, so the cars, ebay_items, gas and cnn
+spiders of concurrent jobs share a process that is already warm.
+
+Each crawl gets the same per-job settings the subprocess was started with
+(the JSON Lines feed and SCRAPE_JOB_ID), so the output and the JobProgress
+extension behave the same either way.
+"""
+import threading
+
+from scrapy.crawler import Crawler, CrawlerRunner
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.log import configure_logging
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+from twisted.python.failure import Failure
+
+
+class CrawlError(RuntimeError):
+    """A crawl could not be started or ended with an error."""
+
+
+class Crawl:
+    """A crawl submitted to CrawlerService; the in-process counterpart of the `scrapy crawl` Popen."""
+
+    def __init__(self, service, spidercls, settings, start_url):
+        self.service = service
+        self.spidercls = spidercls
+        self.settings = settings
+        self.start_url = start_url
+        self.crawler = None
+        self.error = None
+        self.stats = {}  # Scrapy stats, once the crawl has ended
+        self._done = threading.Event()
+
+    def _start(self):
+        # Runs on the reactor thread
+        try:
+            self.crawler = Crawler(self.spidercls, self.settings)
+            d = self.service.runner.crawl(self.crawler, start_url=self.start_url)
+        except Exception as e:
+            self._finished(Failure(e))
+            return
+        d.addBoth(self._finished)
+
+    def _finished(self, result):
+        if isinstance(result, Failure):
+            self.error = f"{result.type.__name__}: {result.getErrorMessage()}"
+        if self.crawler is not None and self.crawler.stats is not None:
+            self.stats = self.crawler.stats.get_stats()
+        self._done.set()
+
+    def _stop(self):
+        if self.crawler is None or not self.crawler.crawling:
+            return
+        if hasattr(self.crawler, "stop_async"):  # Scrapy 2.14+
+            deferred_from_coro(self.crawler.stop_async())
+        else:
+            self.crawler.stop()
+
+    def wait(self, timeout=None):
+        """
+        Block until the crawl has ended.
+        Returns:
+            bool: False if it is still running after `timeout` seconds.
+        """
+        return self._done.wait(timeout)
+
+    def terminate(self):
+        """
+        Stop the crawl the way SIGTERM stops `scrapy crawl`: no new requests
+        are sent, the spider closes and the feed is flushed. Requests already
+        in flight still finish or time out (DOWNLOAD_TIMEOUT) first.
+        """
+        self.service.reactor.callFromThread(self._stop)
+
+    def raise_for_error(self):
+        if self.error is not None:
+            raise CrawlError(f"Crawl of {self.spidercls.name} failed: {self.error}")
+
+
+class CrawlerService:
+    """
+    A reactor thread and a CrawlerRunner shared by every crawl of this process.
+
+    Twisted's reactor cannot be restarted, so there is one service per
+    process; call close() only when the process is done crawling.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings if settings is not None else get_project_settings()
+        configure_logging(self.settings)
+        self.reactor = None
+        self.runner = None
+        self._start_error = None
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(started,), name="crawler-reactor", daemon=True)
+        self._thread.start()
+        started.wait()
+        if self._start_error is not None:
+            raise CrawlError(f"The crawler reactor did not start: {self._start_error}") from self._start_error
+
+    def _run(self, started):
+        try:
+            # Installed on this thread so the asyncio loop behind the reactor belongs to it
+            install_reactor(self.settings["TWISTED_REACTOR"])
+            from twisted.internet import reactor
+            self.reactor = reactor
+            # Loads every spider module once, instead of once per crawl
+            self.runner = CrawlerRunner(self.settings)
+        except Exception as e:
+            self._start_error = e
+            return
+        finally:
+            started.set()
+        reactor.run(installSignalHandlers=False)
+
+    def submit(self, spider_name, start_url, output_path, job_id=None):
+        """
+        Start a crawl; returns at once.
+        Args:
+            spider_name (str): Spider from identify_spider.
+            start_url (str): Passed to the spider as its start_url argument.
+            output_path (str): JSON Lines file the items are written to, replaced if it exists.
+            job_id (int): scrape_jobs row the JobProgress extension reports to, if any.
+        Returns:
+            Crawl: Handle to wait for or stop the crawl.
+        """
+        try:
+            spidercls = self.runner.spider_loader.load(spider_name)
+        except KeyError:
+            raise CrawlError(f"Spider not found: {spider_name}")
+        settings = self.settings.copy()
+        # Same as `-O <output_path>:jsonlines -s SCRAPE_JOB_ID=<job_id>` on the command line
+        settings.set("FEEDS", {output_path: {"format": "jsonlines", "overwrite": True}}, priority="cmdline")
+        if job_id is not None:
+            settings.set("SCRAPE_JOB_ID", job_id, priority="cmdline")
+        crawl = Crawl(self, spidercls, settings, start_url)
+        self.reactor.callFromThread(crawl._start)
+        return crawl
+
+    def close(self, timeout=30):
+        """Stop the crawls still running and the reactor."""
+        self.reactor.callFromThread(self._shutdown)
+        self._thread.join(timeout)
+
+    def _shutdown(self):
+        d = self.runner.stop()
+        d.addBoth(lambda _: self.reactor.stop())
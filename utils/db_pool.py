@@ -0,0 +1,201 @@
+import os
+import time
+import threading
+import traceback
+from contextlib import contextmanager
+
+import psycopg2 # type: ignore
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE # type: ignore
+
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# Connections idle longer than this are pinged before being handed out again
+DB_POOL_CHECK_INTERVAL = float(os.getenv("DB_POOL_CHECK_INTERVAL", 30))
+# Connections held longer than this are reported as probable leaks
+DB_POOL_LEAK_SECONDS = float(os.getenv("DB_POOL_LEAK_SECONDS", 60))
+
+
+# Database connection
+def get_db_connection():
+    return psycopg2.connect(
+        # dbname="user_auth",
+        # user="postgres",
+        # password="fypwork",
+        # host=os.getenv('POSTGRES_HOST', 'localhost'),
+        # port="5432"
+        dbname=os.getenv("POSTGRES_DB", "user_auth"),
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=os.getenv("POSTGRES_PORT", "5432")
+    )
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no connection frees up within the pool timeout."""
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of Postgres connections for one gunicorn worker.
+
+    Use `with pool.connection() as conn:`; the connection goes back to the
+    pool when the block exits, with any transaction the block left open
+    rolled back, so an error path can no longer leak a connection or leave
+    it mid-transaction. At most `max_size` connections are open; callers
+    beyond that wait up to `timeout` seconds and then get PoolTimeout.
+    Connections that sat idle longer than `check_interval` are pinged before
+    reuse and replaced if the server dropped them. Connections held longer
+    than `leak_seconds` are logged once with the stack that checked them out.
+    """
+
+    def __init__(self, connect=get_db_connection, max_size=DB_POOL_MAX_SIZE,
+                 timeout=DB_POOL_TIMEOUT, check_interval=DB_POOL_CHECK_INTERVAL, leak_seconds=DB_POOL_LEAK_SECONDS):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.leak_seconds = leak_seconds
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        self._idle = []  # (connection, time it was returned), most recent last
+        self._size = 0
+        self._checked_out = {}  # id(connection) -> [checked out at, stack, reported yet]
+        self._stats = {"acquired": 0, "created": 0, "discarded": 0, "health_checks": 0, "failed_checks": 0,
+                       "timeouts": 0, "leaks_reported": 0, "wait_seconds": 0.0}
+
+    def _check_fork(self):
+        # Connections inherited through fork share their socket with the parent;
+        # closing them here would close the parent's session, so they are only dropped.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._size = 0
+            self._checked_out = {}
+
+    def _report_leaks(self, now):
+        for entry in self._checked_out.values():
+            since, stack, reported = entry
+            if not reported and now - since > self.leak_seconds:
+                entry[2] = True
+                self._stats["leaks_reported"] += 1
+                print(f"Possible connection leak: held for {now - since:.0f}s, checked out at:\n{''.join(stack)}")
+
+    def _healthy(self, conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        with self._cond:
+            self._stats["health_checks"] += 1
+            self._stats["failed_checks"] += not healthy
+        return healthy
+
+    def _discard(self, conn):
+        _close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def _acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            with self._cond:
+                self._check_fork()
+                self._report_leaks(time.monotonic())
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    conn, returned_at = None, None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats["created"] += 1
+            elif conn.closed or (time.monotonic() - returned_at > self.check_interval and not self._healthy(conn)):
+                self._discard(conn)
+                continue
+
+            now = time.monotonic()
+            with self._cond:
+                # Drop the pool's own frames so the report points at the caller
+                self._checked_out[id(conn)] = [now, traceback.format_stack(limit=8)[:-3], False]
+                self._stats["acquired"] += 1
+                self._stats["wait_seconds"] += now - started
+            return conn
+
+    def _release(self, conn):
+        with self._cond:
+            self._checked_out.pop(id(conn), None)
+        if not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                _close_quietly(conn)
+        if conn.closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Check a connection out for the duration of a `with` block.
+        Yields:
+            psycopg2 connection: Commit explicitly; uncommitted work is rolled back on exit.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def stats(self):
+        """
+        Snapshot of the pool counters for this worker.
+        Returns:
+            dict: open, idle and checked-out connections, oldest checkout age and lifetime counters.
+        """
+        with self._cond:
+            now = time.monotonic()
+            stats = dict(self._stats)
+            stats.update({
+                "open": self._size,
+                "idle": len(self._idle),
+                "checked_out": len(self._checked_out),
+                "oldest_checkout_seconds": round(now - min(
+                    (entry[0] for entry in self._checked_out.values()), default=now), 3),
+                "max_size": self.max_size,
+            })
+        stats["avg_wait_ms"] = round(stats.pop("wait_seconds") * 1000 / stats["acquired"], 3) if stats["acquired"] else None
+        return stats
@@ -0,0 +1,87 @@
+import os
+import re
+import threading
+
+from utils.index_cache import hash_text
+
+DOCUMENT_DIR = os.getenv("DOCUMENT_DIR", "documents")
+
+# Document IDs are SHA-256 content hashes; anything else is rejected before touching the disk
+DOCUMENT_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_valid_document_id(document_id):
+    return isinstance(document_id, str) and bool(DOCUMENT_ID_PATTERN.match(document_id))
+
+
+def _document_path(document_id):
+    return os.path.join(DOCUMENT_DIR, f"{document_id}.txt")
+
+
+def save_document(text):
+    """
+    Store extracted document text server-side.
+    Args:
+        text (str): Extracted document text.
+    Returns:
+        str: The document ID (content hash of the text).
+    """
+    document_id = hash_text(text)
+    path = _document_path(document_id)
+    if not os.path.exists(path):
+        os.makedirs(DOCUMENT_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    return document_id
+
+
+def load_document(document_id):
+    """
+    Load stored document text.
+    Args:
+        document_id (str): ID returned by save_document.
+    Returns:
+        str or None: The text, or None if the ID is invalid or unknown.
+    """
+    if not is_valid_document_id(document_id):
+        return None
+    try:
+        with open(_document_path(document_id), 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _file_index_path(file_hash, backend):
+    return os.path.join(DOCUMENT_DIR, "by_file", f"{file_hash}-{backend}")
+
+
+def remember_file(file_hash, backend, document_id):
+    """Record that the PDF with `file_hash` extracts to `document_id` with `backend`."""
+    path = _file_index_path(file_hash, backend)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(document_id)
+    os.replace(tmp_path, path)
+
+
+def lookup_file(file_hash, backend):
+    """
+    Find the document previously extracted from a PDF file.
+    Args:
+        file_hash (str): SHA-256 of the PDF bytes.
+        backend (str): Extraction backend the text was produced with.
+    Returns:
+        str or None: The document ID, or None if this file was never extracted.
+    """
+    try:
+        with open(_file_index_path(file_hash, backend), 'r', encoding='utf-8') as f:
+            document_id = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if not is_valid_document_id(document_id) or not os.path.exists(_document_path(document_id)):
+        return None
+    return document_id
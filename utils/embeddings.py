@@ -0,0 +1,243 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings # type: ignore
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", 64))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", 10))
+
+_model = None
+_model_lock = threading.Lock()
+_executor = None
+_stats_lock = threading.Lock()
+_stats = {
+    "model": EMBEDDING_MODEL,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "batches": 0,
+    "texts": 0,
+    "total_embed_seconds": 0.0,
+    "last_batch_ms": None,
+    "max_batch_ms": None,
+}
+
+
+def _record_batch(count, seconds):
+    with _stats_lock:
+        _stats["batches"] += 1
+        _stats["texts"] += count
+        _stats["total_embed_seconds"] += seconds
+        _stats["last_batch_ms"] = round(seconds * 1000, 2)
+        _stats["max_batch_ms"] = max(_stats["max_batch_ms"] or 0, _stats["last_batch_ms"])
+
+
+class TimedEmbeddings(Embeddings):
+    """Delegates to the shared HuggingFace model and records per-batch latency."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        vectors = self.model.embed_documents(texts)
+        _record_batch(len(texts), time.perf_counter() - start)
+        return vectors
+
+    def embed_query(self, text):
+        start = time.perf_counter()
+        vector = self.model.embed_query(text)
+        _record_batch(1, time.perf_counter() - start)
+        return vector
+
+
+def get_embeddings():
+    """
+    Return the process-wide embedding model, loading it on first use.
+    Every brain.py code path shares this instance, so the model is read
+    from disk once per gunicorn worker instead of once per request.
+    Returns:
+        TimedEmbeddings: The shared embedding model.
+    """
+    global _model
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is None:
+            from langchain_huggingface import HuggingFaceEmbeddings # type: ignore
+
+            start = time.perf_counter()
+            model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+            with _stats_lock:
+                _stats["load_seconds"] = round(time.perf_counter() - start, 3)
+            _model = TimedEmbeddings(model)
+            print(f"Loaded embedding model {EMBEDDING_MODEL} in {_stats['load_seconds']}s (pid {os.getpid()})")
+    return _model
+
+
+class _EmbeddingJob:
+    """One caller's texts; resolved once every text has come back from a batch."""
+
+    def __init__(self, count):
+        self.future = Future()
+        self.vectors = [None] * count
+        self.remaining = count
+
+
+class MicroBatchExecutor:
+    """
+    Groups texts from concurrent callers into micro-batches for one forward pass.
+
+    Texts queue individually, so a 500-chunk upload and a 3-chunk upload share
+    batches fairly. A batch is flushed when it reaches `max_batch_size` texts or
+    `max_wait_ms` after its first text arrived, whichever comes first.
+    """
+
+    def __init__(self, embed_fn, max_batch_size=EMBED_MAX_BATCH, max_wait_ms=EMBED_MAX_WAIT_MS):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._batches = 0
+        self._texts = 0
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+            return self._queue
+
+    def submit(self, texts):
+        """
+        Queue texts for embedding.
+        Args:
+            texts (list[str]): Texts to embed.
+        Returns:
+            Future: Resolves to the list of vectors, in input order.
+        """
+        job = _EmbeddingJob(len(texts))
+        if not texts:
+            job.future.set_result([])
+            return job.future
+        work_queue = self._ensure_worker()
+        for index, text in enumerate(texts):
+            work_queue.put((job, index, text))
+        return job.future
+
+    def embed(self, texts):
+        """Blocking form of submit()."""
+        return self.submit(texts).result()
+
+    def _collect(self, work_queue):
+        batch = [work_queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(work_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        work_queue = self._queue
+        while True:
+            batch = self._collect(work_queue)
+            try:
+                vectors = self.embed_fn([text for _, _, text in batch])
+            except Exception as e:
+                for job, _, _ in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+            self._batches += 1
+            self._texts += len(batch)
+            for (job, index, _), vector in zip(batch, vectors):
+                if job.future.done():
+                    continue
+                job.vectors[index] = vector
+                job.remaining -= 1
+                if job.remaining == 0:
+                    job.future.set_result(job.vectors)
+
+    def stats(self):
+        """Batch count and mean batch size since this worker started."""
+        return {
+            "batches": self._batches,
+            "texts": self._texts,
+            "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings adapter that routes document batches through the shared
+    MicroBatchExecutor. Single queries go straight to the model since there
+    is nothing to amortise for them.
+    """
+
+    def __init__(self, executor, model):
+        self.executor = executor
+        self.model = model
+
+    def embed_documents(self, texts):
+        return self.executor.embed(list(texts))
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+
+def get_batched_embeddings():
+    """
+    Return embeddings whose document calls are micro-batched with other
+    concurrent requests in this worker.
+    Returns:
+        BatchedEmbeddings: Adapter over the shared model and executor.
+    """
+    global _executor
+    model = get_embeddings()
+    if _executor is None:
+        with _model_lock:
+            if _executor is None:
+                _executor = MicroBatchExecutor(model.embed_documents)
+    return BatchedEmbeddings(_executor, model)
+
+
+def warm_up():
+    """
+    Load the model and run a dummy batch so the first real request does not
+    pay for lazy initialisation inside the tokenizer and torch.
+    """
+    embeddings = get_embeddings()
+    start = time.perf_counter()
+    embeddings.embed_documents(["warm-up sentence for the embedding model", "second warm-up sentence"])
+    with _stats_lock:
+        _stats["warmup_seconds"] = round(time.perf_counter() - start, 3)
+
+
+def get_embedding_stats():
+    """
+    Snapshot of the embedding model metrics for this worker.
+    Returns:
+        dict: load time, warm-up time and batch latency counters.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["loaded"] = _model is not None
+    stats["avg_batch_ms"] = (
+        round(stats["total_embed_seconds"] * 1000 / stats["batches"], 2) if stats["batches"] else None
+    )
+    stats["micro_batching"] = _executor.stats() if _executor is not None else None
+    return stats
@@ -0,0 +1,157 @@
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", "index_cache")
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def hash_text(text):
+    """
+    Compute the cache key for a document.
+    Args:
+        text (str): Extracted document text.
+    Returns:
+        str: Hex SHA-256 digest of the text.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def estimate_index_size(vector_store):
+    """Rough in-memory footprint of a FAISS store: the float32 vectors plus the stored texts."""
+    index = vector_store.index
+    size = index.ntotal * index.d * 4
+    for doc in getattr(vector_store.docstore, '_dict', {}).values():
+        size += len(getattr(doc, 'page_content', ''))
+    return size
+
+
+class DocumentIndexCache:
+    """
+    Two-level cache of FAISS vector stores keyed by document hash.
+
+    Level one is a per-process LRU bounded by an estimated byte size. Level two
+    is a directory of `FAISS.save_local` snapshots shared by every gunicorn
+    worker, so a document embedded by one worker is loaded, not re-embedded,
+    by the others.
+    """
+
+    def __init__(self, cache_dir=INDEX_CACHE_DIR, max_bytes=INDEX_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _remember(self, key, vector_store):
+        size = estimate_index_size(vector_store)
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (vector_store, size)
+            self._current_bytes += size
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self._current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def _load_from_disk(self, key, embeddings):
+        from langchain_community.vectorstores.faiss import FAISS # type: ignore
+
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        except Exception as e:
+            print(f"Error loading cached index {key}: {e}")
+            return None
+
+    def _save_to_disk(self, key, vector_store):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            vector_store.save_local(tmp_path)
+            # Another worker may have published the same document meanwhile; either copy is fine
+            os.rename(tmp_path, path)
+        except OSError:
+            pass
+        except Exception as e:
+            print(f"Error saving index {key}: {e}")
+        finally:
+            if os.path.isdir(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def get(self, key, embeddings):
+        """
+        Look up an index in memory, then on disk.
+        Args:
+            key (str): Document hash.
+            embeddings: Embedding model used to rehydrate a disk snapshot.
+        Returns:
+            FAISS or None: The cached vector store, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+
+        vector_store = self._load_from_disk(key, embeddings)
+        if vector_store is not None:
+            with self._lock:
+                self._stats["disk_hits"] += 1
+            self._remember(key, vector_store)
+        return vector_store
+
+    def get_or_build(self, key, embeddings, build):
+        """
+        Return the cached index for `key`, building and persisting it on a miss.
+        Args:
+            key (str): Document hash.
+            embeddings: Embedding model used to rehydrate a disk snapshot.
+            build (callable): Zero-argument function returning a new FAISS store.
+        Returns:
+            FAISS: The vector store.
+        """
+        vector_store = self.get(key, embeddings)
+        if vector_store is not None:
+            return vector_store
+
+        with self._lock:
+            self._stats["misses"] += 1
+        vector_store = build()
+        self._save_to_disk(key, vector_store)
+        self._remember(key, vector_store)
+        return vector_store
+
+    def put(self, key, vector_store):
+        """Persist and remember an index that was built outside get_or_build."""
+        with self._lock:
+            self._stats["misses"] += 1
+        self._save_to_disk(key, vector_store)
+        self._remember(key, vector_store)
+
+    def stats(self):
+        """
+        Snapshot of the cache counters.
+        Returns:
+            dict: hits, disk_hits, misses, evictions, entries and bytes.
+        """
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
@@ -0,0 +1,138 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 30))
+
+_DONE = object()
+
+
+class LLMGatewayBusy(RuntimeError):
+    """Raised when no LLM slot frees up within the queue timeout."""
+
+
+class LLMGateway:
+    """
+    Runs every LLM call of a worker process on one asyncio event loop.
+
+    Request threads hand their call to the loop and wait on the result, so a
+    worker with many cheap threads can keep dozens of slow Groq calls in
+    flight without a thread or process per call doing blocking I/O. At most
+    `max_concurrency` calls run at once per worker; the rest wait up to
+    `queue_timeout` seconds for a slot and then fail with LLMGatewayBusy.
+    """
+
+    def __init__(self, llm, max_concurrency=LLM_MAX_CONCURRENCY, queue_timeout=LLM_QUEUE_TIMEOUT):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._semaphore = None
+        self._stats = {"in_flight": 0, "peak_in_flight": 0, "completed": 0, "failed": 0, "rejected": 0,
+                       "total_seconds": 0.0}
+
+    def _ensure_loop(self):
+        # The loop thread does not survive a fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                self._semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), loop).result()
+                self._loop = loop
+                self._pid = os.getpid()
+            return self._loop
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrency)
+
+    async def _acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise LLMGatewayBusy("All LLM slots are busy, please try again shortly.")
+        self._stats["in_flight"] += 1
+        self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._stats["in_flight"])
+        return time.perf_counter()
+
+    def _release(self, started, ok):
+        self._stats["in_flight"] -= 1
+        self._stats["completed" if ok else "failed"] += 1
+        self._stats["total_seconds"] += time.perf_counter() - started
+        self._semaphore.release()
+
+    async def _run(self, make_coroutine):
+        started = await self._acquire()
+        ok = False
+        try:
+            result = await make_coroutine()
+            ok = True
+            return result
+        finally:
+            self._release(started, ok)
+
+    def call(self, make_coroutine):
+        """
+        Run an async LLM call on the gateway loop and wait for its result.
+        Args:
+            make_coroutine (callable): Zero-argument function returning the coroutine,
+                e.g. `lambda: chain.ainvoke(inputs)`.
+        Returns:
+            The coroutine's result.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._run(make_coroutine), loop).result()
+
+    def invoke(self, prompt):
+        """Gateway equivalent of `llm.invoke(prompt)`."""
+        return self.call(lambda: self.llm.ainvoke(prompt))
+
+    def stream(self, prompt):
+        """
+        Gateway equivalent of `llm.stream(prompt)`.
+        Yields:
+            Message chunks as the model produces them.
+        """
+        loop = self._ensure_loop()
+        chunks = queue.Queue()
+
+        async def pump():
+            async def consume():
+                async for chunk in self.llm.astream(prompt):
+                    chunks.put(chunk)
+            try:
+                await self._run(consume)
+            except BaseException as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_DONE)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), loop)
+        try:
+            while True:
+                item = chunks.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Stop generating if the client went away mid-stream
+            future.cancel()
+
+    def stats(self):
+        """
+        Snapshot of gateway counters for this worker.
+        Returns:
+            dict: in-flight and peak calls, completions, failures, rejections and mean latency.
+        """
+        stats = dict(self._stats)
+        finished = stats["completed"] + stats["failed"]
+        stats["avg_seconds"] = round(stats.pop("total_seconds") / finished, 3) if finished else None
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
@@ -0,0 +1,163 @@
+import os
+import time
+import atexit
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+# Threads, and so SMTP connections, per worker
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", 2))
+# Emails that may wait for a sender thread; beyond this send() refuses new ones
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 100))
+# A connection unused for longer than this is checked with NOOP before reuse
+MAIL_IDLE_SECONDS = float(os.getenv("MAIL_IDLE_SECONDS", 60))
+
+
+class Mailer:
+    """
+    Sends email from a small per-worker thread pool over reused SMTP connections.
+
+    `send` queues the message and returns at once, so a request never waits
+    for the SMTP handshake, STARTTLS and login. Each of the `workers`
+    threads keeps one authenticated connection open and reuses it for every
+    message it sends; a connection idle for longer than `idle_seconds` is
+    checked with NOOP first, and one the server has dropped is reopened and
+    the message retried once. At most `max_queue` messages wait at a time.
+    """
+
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, sender=SENDER_EMAIL, password=SENDER_PASSWORD,
+                 starttls=SMTP_STARTTLS, workers=MAIL_WORKERS, max_queue=MAIL_QUEUE_SIZE, idle_seconds=MAIL_IDLE_SECONDS):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.starttls = starttls
+        self.workers = workers
+        self.max_queue = max_queue
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._stats = {"queued": 0, "sent": 0, "failed": 0, "rejected": 0, "connections_opened": 0,
+                       "reconnects": 0, "send_seconds": 0.0}
+
+    def _ensure_executor(self):
+        # Executor threads do not survive a fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mailer")
+                self._pending = 0
+                self._pid = os.getpid()
+                atexit.register(self.close)
+            return self._executor
+
+    def _open(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            server.starttls()
+        if self.password:
+            server.login(self.sender, self.password)
+        with self._lock:
+            self._stats["connections_opened"] += 1
+        return server
+
+    def _connection(self):
+        server = getattr(self._local, "server", None)
+        if server is not None and time.monotonic() - self._local.last_used > self.idle_seconds:
+            try:
+                if server.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP refused")
+            except smtplib.SMTPException:
+                self._drop_connection()
+                server = None
+        if server is None:
+            server = self._local.server = self._open()
+            self._local.last_used = time.monotonic()
+        return server
+
+    def _drop_connection(self):
+        server = getattr(self._local, "server", None)
+        self._local.server = None
+        if server is not None:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _deliver(self, to, message):
+        started = time.perf_counter()
+        try:
+            try:
+                self._connection().sendmail(self.sender, to, message)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+                # The server closed an idle connection between our check and the send
+                self._drop_connection()
+                with self._lock:
+                    self._stats["reconnects"] += 1
+                self._connection().sendmail(self.sender, to, message)
+            self._local.last_used = time.monotonic()
+            with self._lock:
+                self._stats["sent"] += 1
+                self._stats["send_seconds"] += time.perf_counter() - started
+            return True
+        except Exception as e:
+            print(f"Error sending email to {to}: {e}")
+            self._drop_connection()
+            with self._lock:
+                self._stats["failed"] += 1
+            return False
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def send(self, to, subject, body):
+        """
+        Queue a plain-text email.
+        Args:
+            to (str): Recipient address.
+            subject (str): Subject line.
+            body (str): Message text.
+        Returns:
+            Future or None: Resolves to True once sent (False on failure); None if the queue is full.
+        """
+        msg = MIMEText(body)
+        msg["From"] = self.sender
+        msg["To"] = to
+        msg["Subject"] = subject
+        executor = self._ensure_executor()
+        with self._lock:
+            if self._pending >= self.max_queue + self.workers:
+                self._stats["rejected"] += 1
+                return None
+            self._pending += 1
+            self._stats["queued"] += 1
+        return executor.submit(self._deliver, to, msg.as_string())
+
+    def close(self):
+        """Wait for queued messages to be sent; used at worker exit."""
+        with self._lock:
+            executor = self._executor if self._pid == os.getpid() else None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        """
+        Snapshot of the mailer counters for this worker.
+        Returns:
+            dict: queued, sent, failed and rejected messages, connections opened and average send time.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending if self._pid == os.getpid() else 0
+        send_seconds = stats.pop("send_seconds")
+        stats["avg_send_ms"] = round(send_seconds * 1000 / stats["sent"], 3) if stats["sent"] else None
+        stats["workers"] = self.workers
+        return stats
@@ -0,0 +1,178 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from collections import deque
+
+from psycopg2.extras import execute_values # type: ignore
+
+from utils.artifact_store import externalize, save_artifacts
+
+# Off: every turn is committed before the request returns.
+# On: turns are queued and committed in batches by a background thread.
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "0") == "1"
+# Rows that may sit in the queue; this bounds what a crash can lose
+CHAT_WRITE_QUEUE_ROWS = int(os.getenv("CHAT_WRITE_QUEUE_ROWS", 10000))
+CHAT_WRITE_FLUSH_MS = float(os.getenv("CHAT_WRITE_FLUSH_MS", 50))
+CHAT_WRITE_MAX_BATCH_ROWS = int(os.getenv("CHAT_WRITE_MAX_BATCH_ROWS", 500))
+
+INSERT_SQL = "INSERT INTO chat_history (chat_session_id, user_id, sender, message, artifact_digest, created_at) VALUES %s"
+# NOW() is fixed per transaction, so rows of one commit share a timestamp and
+# keep their VALUES order through message_id
+ROW_TEMPLATE = "(%s, %s, %s, %s, %s, NOW())"
+
+RATE_WINDOW_SECONDS = 60
+
+
+class MessageWriter:
+    """
+    Persists chat messages one turn at a time.
+
+    A turn (the user's message and the bot's answer, or a single bot notice)
+    is written with one multi-row INSERT in one transaction; messages too
+    large to keep inline go to the artifact store in that same transaction. With
+    `write_behind`, turns are queued instead and a background thread
+    commits everything that arrived within `flush_ms` together; if that
+    batch fails, its turns are retried one transaction each and only the
+    turns that fail again are dropped (counted in failed_rows). The queue
+    holds at most `max_queue_rows` rows; when it is full the caller writes
+    synchronously, so a crash can lose at most that many rows and a
+    database outage slows requests down instead of growing memory.
+    """
+
+    def __init__(self, pool, write_behind=CHAT_WRITE_BEHIND, max_queue_rows=CHAT_WRITE_QUEUE_ROWS,
+                 flush_ms=CHAT_WRITE_FLUSH_MS, max_batch_rows=CHAT_WRITE_MAX_BATCH_ROWS):
+        self.pool = pool
+        self.write_behind = write_behind
+        self.max_queue_rows = max_queue_rows
+        self.flush_ms = flush_ms
+        self.max_batch_rows = max_batch_rows
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self._queued_rows = 0
+        self._commit_times = deque()
+        self._stats = {"commits": 0, "rows": 0, "queued_turns": 0, "sync_fallbacks": 0, "failed_rows": 0,
+                       "artifacts": 0, "commit_seconds": 0.0}
+
+    def _ensure_worker(self):
+        # The flush thread does not survive a fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._queued_rows = 0
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, args=(self._queue,), name="message-writer", daemon=True).start()
+                atexit.register(self.flush)
+            return self._queue
+
+    def _insert(self, rows):
+        start = time.perf_counter()
+        stored_rows, artifacts = externalize(rows)
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            save_artifacts(cur, artifacts)
+            execute_values(cur, INSERT_SQL, stored_rows, template=ROW_TEMPLATE, page_size=len(stored_rows))
+            conn.commit()
+        now = time.monotonic()
+        with self._lock:
+            self._stats["commits"] += 1
+            self._stats["rows"] += len(rows)
+            self._stats["artifacts"] += len(artifacts)
+            self._stats["commit_seconds"] += time.perf_counter() - start
+            self._commit_times.append(now)
+            while self._commit_times and now - self._commit_times[0] > RATE_WINDOW_SECONDS:
+                self._commit_times.popleft()
+
+    def write(self, session_id, user_id, messages):
+        """
+        Persist one turn.
+        Args:
+            session_id: chat_sessions.session_id of the conversation.
+            user_id: The user the messages belong to.
+            messages (list): (sender, text) pairs in display order.
+        """
+        rows = [(session_id, user_id, sender, text) for sender, text in messages]
+        if not rows:
+            return
+        if self.write_behind:
+            work_queue = self._ensure_worker()
+            with self._lock:
+                if self._queued_rows + len(rows) <= self.max_queue_rows:
+                    self._queued_rows += len(rows)
+                    self._stats["queued_turns"] += 1
+                    work_queue.put(rows)
+                    return
+                self._stats["sync_fallbacks"] += 1
+        self._insert(rows)
+
+    def _collect(self, work_queue):
+        """
+        Returns:
+            list: The turns that arrived within flush_ms, up to about max_batch_rows rows.
+        """
+        turns = [work_queue.get()]
+        rows = len(turns[0])
+        deadline = time.monotonic() + self.flush_ms / 1000
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                more = work_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            turns.append(more)
+            rows += len(more)
+        return turns
+
+    def _insert_each(self, turns):
+        # Each turn in its own transaction, so one bad turn (e.g. its chat session
+        # was deleted while it was queued) does not take the others down with it
+        for rows in turns:
+            try:
+                self._insert(rows)
+            except Exception as e:
+                print(f"Error writing a turn of {len(rows)} chat messages, dropping it: {e}")
+                with self._lock:
+                    self._stats["failed_rows"] += len(rows)
+
+    def _run(self, work_queue):
+        while True:
+            turns = self._collect(work_queue)
+            rows = [row for turn in turns for row in turn]
+            try:
+                self._insert(rows)
+            except Exception as e:
+                print(f"Error writing {len(rows)} chat messages in one batch, retrying turn by turn: {e}")
+                self._insert_each(turns)
+            finally:
+                with self._lock:
+                    self._queued_rows -= len(rows)
+
+    def flush(self, timeout=5.0):
+        """Wait up to `timeout` seconds for queued turns to be committed."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._pid != os.getpid() or self._queued_rows == 0:
+                    return
+            time.sleep(0.01)
+
+    def stats(self):
+        """
+        Snapshot of writer counters for this worker.
+        Returns:
+            dict: commits, rows, commits per second over the last minute, queue depth and failures.
+        """
+        with self._lock:
+            now = time.monotonic()
+            recent = sum(1 for t in self._commit_times if now - t <= RATE_WINDOW_SECONDS)
+            stats = dict(self._stats)
+            stats["queued_rows"] = self._queued_rows if self._pid == os.getpid() else 0
+        stats["commits_per_sec"] = round(recent / RATE_WINDOW_SECONDS, 3)
+        commit_seconds = stats.pop("commit_seconds")
+        stats["rows_per_commit"] = round(stats["rows"] / stats["commits"], 2) if stats["commits"] else None
+        stats["avg_commit_ms"] = round(commit_seconds * 1000 / stats["commits"], 3) if stats["commits"] else None
+        stats["write_behind"] = self.write_behind
+        return stats
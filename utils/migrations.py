@@ -0,0 +1,122 @@
+"""
+Versioned schema migrations.
+
+init.sql creates the base schema when the database volume is first
+initialised; every later change is a numbered file in migrations/
+(`0001_description.sql`). Applied versions are recorded in
+`schema_migrations`, so each file runs exactly once per database.
+
+    python -m utils.migrations
+"""
+import os
+import re
+import time
+
+from utils.db_pool import get_db_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d{4})_(\w+)\.sql$')
+# Statements such as CREATE INDEX CONCURRENTLY cannot run inside a transaction
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+# Serialises runners started at the same time against the same database
+MIGRATION_LOCK_KEY = 7270001
+# How often a runner retries the lock while another one is migrating, and for how long
+MIGRATION_LOCK_POLL_SECONDS = 1
+MIGRATION_LOCK_TIMEOUT = 600
+
+
+def list_migrations(directory=MIGRATIONS_DIR):
+    """
+    Find migration files.
+    Args:
+        directory (str): Directory holding the numbered .sql files.
+    Returns:
+        list: (version, name, path) tuples ordered by version.
+    """
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def _split_statements(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def _acquire_lock(cur, poll_seconds=MIGRATION_LOCK_POLL_SECONDS, timeout=MIGRATION_LOCK_TIMEOUT):
+    # Polled rather than a blocking pg_advisory_lock: a session waiting inside that
+    # statement holds a snapshot, and CREATE INDEX CONCURRENTLY in the runner that
+    # has the lock waits for every older snapshot, so the two would wait on each other
+    deadline = time.monotonic() + timeout
+    while True:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        if cur.fetchone()[0]:
+            return
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Another migration runner held the lock for over {timeout:.0f}s")
+        time.sleep(poll_seconds)
+
+
+def apply_migrations(conn, directory=MIGRATIONS_DIR):
+    """
+    Apply every migration newer than the database's recorded versions.
+    Args:
+        conn: psycopg2 connection; left in autocommit mode.
+        directory (str): Directory holding the numbered .sql files.
+    Returns:
+        list: Names of the migrations applied by this call.
+    """
+    conn.autocommit = True
+    applied_now = []
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS public.schema_migrations (
+                version integer PRIMARY KEY,
+                name text NOT NULL,
+                applied_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        _acquire_lock(cur)
+        try:
+            cur.execute("SELECT version FROM public.schema_migrations")
+            applied = {row[0] for row in cur.fetchall()}
+            for version, name, path in list_migrations(directory):
+                if version in applied:
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    sql = f.read()
+                print(f"Applying migration {version:04d}_{name}")
+                if NO_TRANSACTION_MARKER in sql:
+                    # Each statement commits on its own, so these files must be safe to re-run
+                    for statement in _split_statements(sql):
+                        cur.execute(statement)
+                    cur.execute("INSERT INTO public.schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                else:
+                    cur.execute("BEGIN")
+                    try:
+                        cur.execute(sql)
+                        cur.execute("INSERT INTO public.schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                        cur.execute("COMMIT")
+                    except Exception:
+                        cur.execute("ROLLBACK")
+                        raise
+                applied_now.append(f"{version:04d}_{name}")
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    return applied_now
+
+
+def main():
+    conn = get_db_connection()
+    try:
+        applied = apply_migrations(conn)
+    finally:
+        conn.close()
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
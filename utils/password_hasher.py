@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+
+# bcrypt releases the GIL, so each concurrent hash can occupy a full core
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", 2))
+# How long a login waits for a free hashing slot before it is turned away
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 5))
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when no hashing slot frees up within the queue timeout."""
+
+
+class PasswordHasher:
+    """
+    Bounded bcrypt hashing for signup, login and password reset.
+
+    At most `max_concurrency` hashes run at once in a worker; further calls
+    wait up to `queue_timeout` seconds for a slot and then raise
+    PasswordHasherBusy. A login storm therefore uses a fixed number of cores
+    while the worker's other request threads keep serving chat traffic.
+    """
+
+    def __init__(self, bcrypt, max_concurrency=PASSWORD_HASH_CONCURRENCY, queue_timeout=PASSWORD_HASH_QUEUE_TIMEOUT):
+        self.bcrypt = bcrypt
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._stats = {"hashes": 0, "checks": 0, "rejected": 0, "wait_seconds": 0.0, "hash_seconds": 0.0}
+
+    def _run(self, kind, fn, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self._stats["rejected"] += 1
+        if not acquired:
+            raise PasswordHasherBusy(f"No password hashing slot free after {self.queue_timeout}s")
+        running = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._stats[kind] += 1
+                self._stats["wait_seconds"] += running - started
+                self._stats["hash_seconds"] += time.perf_counter() - running
+
+    def hash(self, password):
+        """
+        Hash a new password.
+        Args:
+            password (str): The plain-text password.
+        Returns:
+            str: The bcrypt hash to store in users.password_hash.
+        """
+        return self._run("hashes", self.bcrypt.generate_password_hash, password).decode('utf-8')
+
+    def check(self, pw_hash, password):
+        """
+        Check a password against a stored hash.
+        Args:
+            pw_hash (str): users.password_hash
+            password (str): The password the user entered.
+        Returns:
+            bool: True if they match.
+        """
+        return self._run("checks", self.bcrypt.check_password_hash, pw_hash, password)
+
+    def stats(self):
+        """
+        Snapshot of the hashing counters for this worker.
+        Returns:
+            dict: hashes, checks, rejections, callers waiting and average wait and hash times.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["waiting"] = self._waiting
+        done = stats["hashes"] + stats["checks"]
+        stats["avg_wait_ms"] = round(stats.pop("wait_seconds") * 1000 / done, 3) if done else None
+        stats["avg_hash_ms"] = round(stats.pop("hash_seconds") * 1000 / done, 3) if done else None
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
@@ -0,0 +1,155 @@
+import os
+import time
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.chunking import PAGE_BREAK
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+
+# "pypdf2" is fast; "pdfplumber" is slower but keeps layout and spacing more faithfully
+PDF_BACKENDS = ("pypdf2", "pdfplumber")
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pypdf2")
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {backend: {"documents": 0, "pages": 0, "seconds": 0.0} for backend in PDF_BACKENDS}
+
+
+def _get_pool(workers):
+    """Process pool for this worker; recreated after a fork since pools do not survive one."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # forkserver children start from a clean interpreter, not a copy of a threaded web worker
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def hash_file(path):
+    """
+    Compute the extraction cache key for a PDF file.
+    Args:
+        path (str): Path to the file.
+    Returns:
+        str: Hex SHA-256 digest of the file bytes.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_document(path, backend):
+    """Open a PDF with `backend`; returns (pages, page -> text function, close function or None)."""
+    if backend == "pdfplumber":
+        import pdfplumber # type: ignore
+
+        pdf = pdfplumber.open(path)
+        return pdf.pages, lambda page: page.extract_text(), pdf.close
+    if backend == "pypdf2":
+        from PyPDF2 import PdfReader # type: ignore
+
+        reader = PdfReader(path)
+        return reader.pages, lambda page: page.extract_text(), None
+    raise ValueError(f"Unknown PDF backend: {backend}")
+
+
+def _close_document(document):
+    if document is not None and document[2] is not None:
+        document[2]()
+
+
+def _extract_pages(document, start, end):
+    pages, extract, _ = document
+    return [(number + 1, extract(pages[number]) or "") for number in range(start, end)]
+
+
+def _extract_range(path, start, end, backend):
+    """Extract pages [start, end) of one PDF. Runs inside a single-threaded pool process."""
+    # Closed before returning: the pool processes live as long as the web worker, and the
+    # upload the document was opened from is deleted once it is ingested
+    document = _load_document(path, backend)
+    try:
+        return _extract_pages(document, start, end)
+    finally:
+        _close_document(document)
+
+
+def iter_pdf_pages(path, backend=PDF_BACKEND, workers=PDF_EXTRACT_WORKERS, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    Extract a PDF page by page, spreading page ranges across a process pool.
+    Pages are yielded as soon as their range finishes, so callers can chunk
+    and embed early pages while later ones are still being parsed.
+    Args:
+        path (str): Path to the PDF file.
+        backend (str): One of PDF_BACKENDS.
+        workers (int): Pool size; 1 extracts in the calling process.
+        pages_per_task (int): Minimum pages handed to a pool process at a time.
+    Yields:
+        tuple: (1-based page number, page text), in completion order.
+    """
+    start_time = time.perf_counter()
+    document = _load_document(path, backend)
+    page_count = len(document[0])
+    if workers <= 1 or page_count <= pages_per_task:
+        try:
+            yield from _extract_pages(document, 0, page_count)
+        finally:
+            _close_document(document)
+    else:
+        _close_document(document)
+        # About two ranges per process: enough to balance uneven pages and to
+        # stream early results, few enough that setup cost per range stays small
+        range_size = max(pages_per_task, -(-page_count // (workers * 2)))
+        pool = _get_pool(workers)
+        futures = [
+            pool.submit(_extract_range, path, start, min(start + range_size, page_count), backend)
+            for start in range(0, page_count, range_size)
+        ]
+        for future in as_completed(futures):
+            yield from future.result()
+
+    with _stats_lock:
+        _stats[backend]["documents"] += 1
+        _stats[backend]["pages"] += page_count
+        _stats[backend]["seconds"] += time.perf_counter() - start_time
+
+
+def extract_pdf_text(path, backend=PDF_BACKEND, workers=PDF_EXTRACT_WORKERS):
+    """
+    Extract the whole text of a PDF, pages separated by PAGE_BREAK.
+    Args:
+        path (str): Path to the PDF file.
+        backend (str): One of PDF_BACKENDS.
+        workers (int): Pool size; 1 extracts in the calling process.
+    Returns:
+        str: The document text.
+    """
+    pages = dict(iter_pdf_pages(path, backend, workers))
+    return PAGE_BREAK.join(pages[number] for number in sorted(pages))
+
+
+def get_extraction_stats():
+    """
+    Per-backend extraction timings for this worker.
+    Returns:
+        dict: documents, pages, seconds and ms per page for each backend.
+    """
+    with _stats_lock:
+        stats = {backend: dict(values) for backend, values in _stats.items()}
+    for values in stats.values():
+        values["seconds"] = round(values["seconds"], 3)
+        values["ms_per_page"] = round(values["seconds"] * 1000 / values["pages"], 2) if values["pages"] else None
+    stats["default_backend"] = PDF_BACKEND
+    return stats
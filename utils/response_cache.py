@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+
+from utils.index_cache import hash_text
+
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join("response_cache", "responses.sqlite3"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 24 * 60 * 60))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 10000))
+# Semantic matching embeds every uncached question, so it is opt-in
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "0") == "1"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.95))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_scope_created ON responses (scope, created_at);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def normalize_question(question):
+    """Lower-case, collapse whitespace and drop trailing punctuation so trivial variants share a key."""
+    question = re.sub(r'\s+', ' ', question.strip().lower())
+    return question.rstrip('?!. ')
+
+
+class ResponseCache:
+    """
+    Cache of model answers keyed by normalized question and scope.
+
+    The scope is empty for general questions and the document index key for
+    RAG answers, so the same question about two documents never collides.
+    Entries live in one SQLite file shared by every gunicorn worker, expire
+    after `ttl` seconds and are evicted least recently used beyond
+    `max_entries`. With `semantic` on, a miss on the exact key falls back to
+    the closest cached question in the same scope whose MiniLM embedding has
+    cosine similarity of at least `similarity`.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                 semantic=RESPONSE_CACHE_SEMANTIC, similarity=RESPONSE_CACHE_SIMILARITY, embeddings=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity = similarity
+        self._embeddings = embeddings
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or forks
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _embed(self, normalized):
+        import numpy as np # type: ignore
+
+        if self._embeddings is None:
+            from utils.embeddings import get_embeddings
+
+            self._embeddings = get_embeddings()
+        vector = np.asarray(self._embeddings.embed_query(normalized), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _semantic_match(self, conn, scope, vector, now):
+        import numpy as np # type: ignore
+
+        rows = conn.execute(
+            "SELECT key, embedding FROM responses WHERE scope = ? AND created_at >= ? AND embedding IS NOT NULL",
+            (scope, now - self.ttl),
+        ).fetchall()
+        if not rows:
+            return None
+        matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        scores = matrix @ vector
+        best = int(scores.argmax())
+        return rows[best][0] if scores[best] >= self.similarity else None
+
+    def _touch(self, conn, key, now):
+        row = conn.execute(
+            "SELECT answer FROM responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return row[0]
+
+    def get(self, question, scope=""):
+        """
+        Look up a cached answer.
+        Args:
+            question (str): The user's question.
+            scope (str): "" for general questions, the document index key for RAG.
+        Returns:
+            str or None: The cached answer, or None on a miss.
+        """
+        normalized = normalize_question(question)
+        now = time.time()
+        try:
+            conn = self._connection()
+            answer = self._touch(conn, hash_text(f"{scope}\n{normalized}"), now)
+            if answer is not None:
+                self._count("exact_hits")
+                return answer
+            if self.semantic:
+                key = self._semantic_match(conn, scope, self._embed(normalized), now)
+                answer = self._touch(conn, key, now) if key else None
+                if answer is not None:
+                    self._count("semantic_hits")
+                    return answer
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+            self._count("errors")
+        self._count("misses")
+        return None
+
+    def put(self, question, answer, scope=""):
+        """
+        Cache an answer, then drop expired entries and trim to `max_entries`.
+        Args:
+            question (str): The user's question.
+            answer (str): The model's answer.
+            scope (str): "" for general questions, the document index key for RAG.
+        """
+        normalized = normalize_question(question)
+        now = time.time()
+        try:
+            embedding = self._embed(normalized).tobytes() if self.semantic else None
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, scope, question, answer, embedding, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (hash_text(f"{scope}\n{normalized}"), scope, normalized, answer, embedding, now, now),
+                )
+                conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._count("stores")
+        except Exception as e:
+            print(f"Error writing response cache: {e}")
+            self._count("errors")
+
+    def stats(self):
+        """
+        Snapshot of the cache counters.
+        Returns:
+            dict: this worker's hits, misses and hit rate, plus the shared entry count and lifetime hits.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 3) if lookups else None
+        try:
+            entries, hits = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM responses").fetchone()
+            stats["shared"] = {"entries": entries, "hits": hits}
+        except Exception as e:
+            print(f"Error reading response cache stats: {e}")
+        stats["semantic"] = self.semantic
+        return stats
@@ -0,0 +1,164 @@
+"""
+Scrape job queue, stored in the scrape_jobs table (migration 0004).
+
+/ask enqueues a job and returns its ID; utils.scrape_worker claims queued
+jobs with SELECT ... FOR UPDATE SKIP LOCKED, runs the spider, and records
+progress and the final answer here. Every function takes a cursor and
+leaves committing to the caller.
+"""
+import os
+
+# A running job whose worker has not sent a heartbeat for this long is taken back
+SCRAPE_STALE_SECONDS = float(os.getenv("SCRAPE_STALE_SECONDS", 120))
+SCRAPE_MAX_ATTEMPTS = int(os.getenv("SCRAPE_MAX_ATTEMPTS", 2))
+# NOTIFY channel that wakes idle scrape workers when a job is queued
+SCRAPE_JOBS_CHANNEL = "scrape_jobs"
+
+JOB_FIELDS = ("job_id", "user_id", "chat_session_id", "spider", "url", "output_format")
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+def enqueue_job(cur, user_id, chat_session_id, spider, url, output_format):
+    """
+    Queue a scrape. Listening workers are notified when the transaction commits.
+    Args:
+        cur: psycopg2 cursor.
+        user_id: Owner of the job.
+        chat_session_id: Chat the answer is posted to, if any.
+        spider (str): Spider name from identify_spider.
+        url (str): Start URL.
+        output_format (str): "json", "csv" or "xml".
+    Returns:
+        int: The job ID.
+    """
+    cur.execute("""
+        INSERT INTO scrape_jobs (user_id, chat_session_id, spider, url, output_format)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING job_id
+    """, (user_id, chat_session_id, spider, url, output_format))
+    job_id = cur.fetchone()[0]
+    cur.execute(f"NOTIFY {SCRAPE_JOBS_CHANNEL}")
+    return job_id
+
+
+def get_job(cur, job_id, user_id):
+    """
+    Read a job for its owner.
+    Args:
+        cur: psycopg2 cursor.
+        job_id (int): The job ID returned by /ask.
+        user_id: The requesting user.
+    Returns:
+        dict or None: Status, progress and, once finished, the answer; None if not the user's job.
+    """
+    cur.execute("""
+        SELECT j.job_id, j.status, j.spider, j.url, j.output_format, j.items_scraped, j.pages_crawled,
+               j.answer, j.error, j.created_at, j.started_at, j.finished_at,
+               CASE WHEN j.status = 'queued' THEN
+                   (SELECT count(*) FROM scrape_jobs q WHERE q.status = 'queued' AND q.created_at < j.created_at)
+               END
+        FROM scrape_jobs j
+        WHERE j.job_id = %s AND j.user_id = %s
+    """, (job_id, user_id))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    job = dict(zip(("job_id", "status", "spider", "url", "output_format", "items_scraped", "pages_crawled",
+                    "answer", "error", "created_at", "started_at", "finished_at", "jobs_ahead"), row))
+    for field in ("created_at", "started_at", "finished_at"):
+        job[field] = job[field].isoformat() if job[field] else None
+    return job
+
+
+def claim_job(cur):
+    """
+    Mark the oldest queued job as running; concurrent workers never claim the same job.
+    Returns:
+        dict or None: The job's JOB_FIELDS, or None if the queue is empty.
+    """
+    cur.execute(f"""
+        UPDATE scrape_jobs
+        SET status = 'running', attempts = attempts + 1, items_scraped = 0, pages_crawled = 0,
+            started_at = now(), heartbeat_at = now()
+        WHERE job_id = (
+            SELECT job_id FROM scrape_jobs WHERE status = 'queued'
+            ORDER BY created_at LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {", ".join(JOB_FIELDS)}
+    """)
+    row = cur.fetchone()
+    return dict(zip(JOB_FIELDS, row)) if row else None
+
+
+def heartbeat(cur, job_ids):
+    """Record that the worker running these jobs is alive."""
+    if job_ids:
+        cur.execute("UPDATE scrape_jobs SET heartbeat_at = now() WHERE job_id = ANY(%s) AND status = 'running'",
+                    (list(job_ids),))
+
+
+def record_progress(cur, job_id, items_scraped, pages_crawled):
+    """Store the spider's running item and page counts."""
+    cur.execute("""
+        UPDATE scrape_jobs SET items_scraped = %s, pages_crawled = %s, heartbeat_at = now()
+        WHERE job_id = %s AND status = 'running'
+    """, (items_scraped, pages_crawled, job_id))
+
+
+def finish_job(cur, job_id, status, answer, output_file=None, error=None):
+    """
+    Record a job's outcome.
+    Args:
+        cur: psycopg2 cursor.
+        job_id (int): The job.
+        status (str): "succeeded" or "failed".
+        answer (str): The chat message shown to the user.
+        output_file (str): Name of the converted file under scraped_data/, if any.
+        error (str): Failure detail for logs and /scrape_jobs.
+    """
+    cur.execute("""
+        UPDATE scrape_jobs SET status = %s, answer = %s, output_file = %s, error = %s,
+                               finished_at = now(), heartbeat_at = now()
+        WHERE job_id = %s
+    """, (status, answer, output_file, error, job_id))
+
+
+def release_job(cur, job_id):
+    """Put a job the worker is abandoning (e.g. on shutdown) back in the queue without using up an attempt."""
+    cur.execute("""
+        UPDATE scrape_jobs SET status = 'queued', attempts = greatest(attempts - 1, 0), heartbeat_at = NULL
+        WHERE job_id = %s AND status = 'running'
+    """, (job_id,))
+
+
+def requeue_stale_jobs(cur, stale_seconds=SCRAPE_STALE_SECONDS, max_attempts=SCRAPE_MAX_ATTEMPTS):
+    """
+    Take back running jobs whose worker died: requeue them, or fail them after `max_attempts`.
+    Returns:
+        list: JOB_FIELDS dicts of the jobs failed by this call, whose users should be told.
+    """
+    cur.execute(f"""
+        UPDATE scrape_jobs
+        SET status = CASE WHEN attempts >= %(max_attempts)s THEN 'failed' ELSE 'queued' END,
+            error = CASE WHEN attempts >= %(max_attempts)s THEN 'The scrape worker stopped while running this job'
+                         ELSE error END,
+            finished_at = CASE WHEN attempts >= %(max_attempts)s THEN now() END
+        WHERE status = 'running' AND heartbeat_at < now() - %(stale_seconds)s * interval '1 second'
+        RETURNING status, {", ".join(JOB_FIELDS)}
+    """, {"max_attempts": max_attempts, "stale_seconds": stale_seconds})
+    return [dict(zip(JOB_FIELDS, row[1:])) for row in cur.fetchall() if row[0] == "failed"]
+
+
+def queue_stats(cur):
+    """
+    Jobs waiting and in progress; finished jobs are not counted, so this stays cheap as history grows.
+    Returns:
+        dict: {"queued": n, "running": n}
+    """
+    cur.execute("""
+        SELECT count(*) FILTER (WHERE status = 'queued'), count(*) FILTER (WHERE status = 'running')
+        FROM scrape_jobs WHERE status IN ('queued', 'running')
+    """)
+    queued, running = cur.fetchone()
+    return {"queued": queued, "running": running}
@@ -0,0 +1,119 @@
+import os
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+from xml.dom.minidom import parseString
+
+SCRAPED_DATA_DIR = "scraped_data"
+# Raw spider output, one JSON Lines file per job, removed once converted
+SCRAPE_JOBS_DIR = os.path.join(SCRAPED_DATA_DIR, "jobs")
+
+
+def job_output_path(job_id):
+    """Where a job's spider appends its items, one JSON object per line."""
+    return os.path.join(SCRAPE_JOBS_DIR, f"{job_id}.jsonl")
+
+
+def iter_items(path):
+    """
+    Stream items from a JSON Lines file.
+    Args:
+        path (str): The job's output file.
+    Yields:
+        dict: One scraped item at a time. A torn last line, left by a crawl
+            that was killed mid-write, is skipped.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def preview_items(path, count=5):
+    """
+    Read the first `count` items and count the rest without holding them.
+    Returns:
+        tuple: (list of the first items, total number of items)
+    """
+    items = iter_items(path)
+    preview = list(islice(items, count))
+    return preview, len(preview) + sum(1 for _ in items)
+
+
+def _write_json(path, output_file):
+    # Same layout as json.dump(items, f, indent=2), written one item at a time
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("[")
+        written = 0
+        for item in iter_items(path):
+            f.write(",\n  " if written else "\n  ")
+            f.write(json.dumps(item, indent=2).replace("\n", "\n  "))
+            written += 1
+        f.write("\n]" if written else "]")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+
+def _write_csv(path, output_file):
+    # One pass for the header (every field, in order of first appearance), one for the rows
+    fieldnames = {}
+    for item in iter_items(path):
+        if not isinstance(item, dict):
+            return False
+        fieldnames.update(dict.fromkeys(item))
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(fieldnames))
+        writer.writeheader()
+        for item in iter_items(path):
+            writer.writerow({key: _csv_value(value) for key, value in item.items()})
+    return True
+
+
+def _write_xml(path, output_file):
+    from dicttoxml import dicttoxml # type: ignore
+
+    # Same document as dicttoxml(items, custom_root='items') pretty-printed, built one <item> at a time
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" ?>\n<items>\n')
+        for item in iter_items(path):
+            xml_item = dicttoxml(item, root=False, attr_type=False).decode('utf-8')
+            # The call Document.toprettyxml makes for each child of <items>
+            parseString(f"<item>{xml_item}</item>").documentElement.writexml(f, "\t", "\t", "\n")
+        f.write('</items>\n')
+
+
+def convert_output(path, job_id, spider_name, output_format):
+    """
+    Convert a job's JSON Lines output to the requested format under scraped_data/.
+    Args:
+        path (str): The job's output file.
+        job_id (int): Part of the file name, so jobs finishing in the same second never share a file.
+        spider_name (str): Used in the output file name.
+        output_format (str): "json", "csv" or "xml".
+    Returns:
+        str or None: The file name, or None if the items cannot be written as `output_format`.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = os.path.join(SCRAPED_DATA_DIR, f"{spider_name}_output_{timestamp}_{job_id}.{output_format}")
+    if output_format == 'json':
+        _write_json(path, output_file)
+    elif output_format == 'csv':
+        if not _write_csv(path, output_file):
+            return None
+    elif output_format == 'xml':
+        _write_xml(path, output_file)
+    else:
+        return None
+    return os.path.basename(output_file)
@@ -0,0 +1,329 @@
+"""
+Scrape worker: runs the spiders for jobs queued by /ask.
+
+Runs as its own process next to the web server (the `scraper` service in
+docker-compose.yml), so a crawl that takes minutes never holds a gunicorn
+worker. Each of --workers threads claims a job, crawls it, converts the
+output to the requested format, posts the answer to the user's chat and
+records it on the job. Jobs live in Postgres: on SIGTERM running crawls
+are stopped and their jobs put back in the queue, and jobs of a worker
+that died are requeued once their heartbeat goes stale. Idle workers
+LISTEN for the NOTIFY sent with each new job, so a job starts as soon as
+/ask commits it; SCRAPE_POLL_SECONDS is only the fallback.
+
+With --runner reactor (the default) crawls run on one warm Twisted
+reactor inside this process (utils.crawler_service); --runner subprocess
+starts a `scrapy crawl` process per job instead.
+
+    python -m utils.scrape_worker
+    python -m utils.scrape_worker --workers 4 --runner subprocess
+"""
+import os
+import json
+import select
+import signal
+import argparse
+import threading
+import subprocess
+
+from utils.crawler_service import CrawlError, CrawlerService
+from utils.db_pool import ConnectionPool, get_db_connection
+from utils.message_writer import MessageWriter
+from utils.scrape_jobs import (
+    claim_job, finish_job, heartbeat, release_job, requeue_stale_jobs, SCRAPE_JOBS_CHANNEL, SCRAPE_STALE_SECONDS,
+)
+from utils.scrape_output import SCRAPE_JOBS_DIR, convert_output, job_output_path, preview_items
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", 2))
+SCRAPE_POLL_SECONDS = float(os.getenv("SCRAPE_POLL_SECONDS", 2))
+SCRAPE_HEARTBEAT_SECONDS = float(os.getenv("SCRAPE_HEARTBEAT_SECONDS", 10))
+# A crawl running longer than this is stopped; the items it wrote so far are still delivered
+SCRAPE_JOB_TIMEOUT = float(os.getenv("SCRAPE_JOB_TIMEOUT", 60 * 60))
+# "reactor" runs crawls in this process on a shared reactor, "subprocess" runs `scrapy crawl` per job
+SCRAPE_RUNNER = os.getenv("SCRAPE_RUNNER", "reactor")
+
+EMPTY_RESULT_MESSAGE = (
+    "⚠️ No data could be scraped from this URL. This might be because:\n"
+    "• The page structure might have changed\n"
+    "• The content might be dynamically loaded\n"
+    "• The page might be empty\n\n"
+    "Please verify the URL and try again."
+)
+
+
+def format_answer(preview, total, spider_name, output_format, download_url, timed_out=False, stats=None):
+    """
+    The chat message for a finished scrape: a preview of the first items and the download link.
+    `stats` are the crawl's Scrapy stats, when it ran in this process; with
+    them the message says how much the incremental mode saved.
+    """
+    response_text = f"I've scraped the data using the {spider_name} spider.\n\n"
+    if timed_out:
+        response_text += "The crawl hit its time limit, so these are the items collected until then.\n\n"
+    stats = stats or {}
+    requests_saved = stats.get("incremental/requests_saved", 0)
+    reused = requests_saved + stats.get("incremental/not_modified", 0) + stats.get("incremental/unchanged", 0)
+    if reused:
+        response_text += (f"{reused} pages had not changed since the last scrape, so their items were reused "
+                          f"({requests_saved} requests saved).\n\n")
+    response_text += "Here's a preview of the scraped data:\n"
+    # Show preview in JSON format regardless of output format
+    for i, item in enumerate(preview, 1):
+        response_text += f"\n{i}. {json.dumps(item, indent=2)}"
+    if total > len(preview):
+        response_text += f"\n\n... and {total - len(preview)} more items."
+    response_text += f"\n\nTotal items scraped: {total}"
+    response_text += f"\n\nDownload the complete {output_format.upper()} file: [Click Here]({download_url})"
+    return response_text
+
+
+class ScrapeWorker:
+    """
+    Claims scrape jobs and crawls them, in process or as `scrapy crawl` subprocesses.
+
+    `workers` jobs run at once. A heartbeat thread marks this worker's jobs
+    alive every `heartbeat_seconds`, from claim until the job row is marked
+    done, so also while the output is converted, and requeues other
+    workers' jobs whose heartbeat is older than SCRAPE_STALE_SECONDS.
+    """
+
+    def __init__(self, workers=SCRAPE_WORKERS, poll_seconds=SCRAPE_POLL_SECONDS,
+                 heartbeat_seconds=SCRAPE_HEARTBEAT_SECONDS, job_timeout=SCRAPE_JOB_TIMEOUT,
+                 runner=SCRAPE_RUNNER):
+        if runner not in ("reactor", "subprocess"):
+            raise ValueError(f"Unknown scrape runner: {runner}")
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.job_timeout = job_timeout
+        self.runner = runner
+        self.crawler_service = None
+        if runner == "reactor":
+            self.crawler_service = CrawlerService()
+        self.pool = ConnectionPool(max_size=workers + 2)
+        self.message_writer = MessageWriter(self.pool, write_behind=False)
+        self.stopping = threading.Event()
+        self._job_queued = threading.Condition()
+        self._lock = threading.Lock()
+        self._running = {}  # job_id -> subprocess.Popen or crawler_service.Crawl
+        self._active = set()  # job_ids claimed and not yet finished or released; these get heartbeats
+
+    def _claim(self):
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            job = claim_job(cur)
+            conn.commit()
+        return job
+
+    def _finish(self, job, status, answer, output_file=None, error=None):
+        # The answer is posted to the chat first, so a reload after the job reports done shows it
+        if job["chat_session_id"] is not None:
+            self.message_writer.write(job["chat_session_id"], job["user_id"], [("bot", answer)])
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            finish_job(cur, job["job_id"], status, answer, output_file, error)
+            conn.commit()
+
+    def _crawl(self, job, raw_output):
+        """
+        Run the job's spider into `raw_output`.
+        Returns:
+            tuple: (timed_out, stats): True if the crawl was stopped at job_timeout, and
+                the crawl's Scrapy stats (empty for the subprocess runner).
+        Raises:
+            subprocess.CalledProcessError or CrawlError: The crawl failed.
+        """
+        if self.crawler_service is None:
+            return self._crawl_subprocess(job, raw_output)
+        crawl = self.crawler_service.submit(job["spider"], job["url"], raw_output, job_id=job["job_id"])
+        with self._lock:
+            self._running[job["job_id"]] = crawl
+        try:
+            timed_out = not crawl.wait(self.job_timeout)
+            if timed_out:
+                crawl.terminate()
+                crawl.wait()
+            crawl.raise_for_error()
+            return timed_out, crawl.stats
+        finally:
+            with self._lock:
+                self._running.pop(job["job_id"], None)
+
+    def _crawl_subprocess(self, job, raw_output):
+        process = subprocess.Popen([
+            'scrapy',
+            'crawl',
+            job["spider"],
+            '-a',
+            f'start_url={job["url"]}',
+            '-O',
+            # JSON Lines: each item is appended as it is scraped, never held as one array
+            f'{raw_output}:jsonlines',
+            '-s',
+            f'SCRAPE_JOB_ID={job["job_id"]}',
+        ])
+        with self._lock:
+            self._running[job["job_id"]] = process
+        try:
+            returncode = process.wait(timeout=self.job_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            return True, {}
+        finally:
+            with self._lock:
+                self._running.pop(job["job_id"], None)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, f"scrapy crawl {job['spider']}")
+        return False, {}
+
+    def run_job(self, job):
+        """Crawl, convert and report one claimed job."""
+        os.makedirs(SCRAPE_JOBS_DIR, exist_ok=True)
+        raw_output = job_output_path(job["job_id"])
+        print(f"Scrape job {job['job_id']}: {job['spider']} {job['url']} as {job['output_format']}")
+        with self._lock:
+            self._active.add(job["job_id"])
+        try:
+            try:
+                timed_out, stats = self._crawl(job, raw_output)
+            except (subprocess.CalledProcessError, CrawlError):
+                if not self.stopping.is_set():
+                    raise
+            if self.stopping.is_set():
+                # Stopped by shutdown rather than finished; another run picks the job up again
+                with self.pool.connection() as conn, conn.cursor() as cur:
+                    release_job(cur, job["job_id"])
+                    conn.commit()
+                return
+
+            preview, total = preview_items(raw_output)
+            if not total:
+                if timed_out:
+                    error_msg = f"Scraping did not finish within {self.job_timeout:.0f} seconds"
+                    self._finish(job, "failed",
+                                 f"Sorry, I encountered an error while trying to scrape the URL: {error_msg}",
+                                 error=error_msg)
+                else:
+                    self._finish(job, "succeeded", EMPTY_RESULT_MESSAGE)
+                return
+
+            output_file = convert_output(raw_output, job["job_id"], job["spider"], job["output_format"])
+            if output_file is None:
+                self._finish(job, "failed", "⚠️ The scraped data structure is not suitable for CSV format.",
+                             error="Data not suitable for CSV")
+                return
+            answer = format_answer(preview, total, job["spider"], job["output_format"],
+                                   f"/download/{output_file}", timed_out=timed_out, stats=stats)
+            self._finish(job, "succeeded", answer, output_file=output_file)
+        except (subprocess.CalledProcessError, CrawlError) as e:
+            error_msg = f"Error during scraping: {str(e)}"
+            print(error_msg)
+            self._finish(job, "failed", f"Sorry, I encountered an error while trying to scrape the URL: {error_msg}",
+                         error=error_msg)
+        except Exception as e:
+            error_msg = f"Unexpected error during scraping: {str(e)}"
+            print(error_msg)
+            self._finish(job, "failed",
+                         f"Sorry, something went wrong while processing the scraped data: {error_msg}",
+                         error=error_msg)
+        finally:
+            with self._lock:
+                self._active.discard(job["job_id"])
+            if os.path.exists(raw_output):
+                os.remove(raw_output)
+
+    def _work(self):
+        while not self.stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"Error claiming scrape job: {e}")
+                job = None
+            if job is None:
+                with self._job_queued:
+                    if not self.stopping.is_set():
+                        self._job_queued.wait(self.poll_seconds)
+                continue
+            try:
+                self.run_job(job)
+            except Exception as e:
+                # Most likely the database went away while reporting; the job's
+                # heartbeat stops, so it is requeued once it goes stale
+                print(f"Error finishing scrape job {job['job_id']}: {e}")
+
+    def _listen(self):
+        # Wakes the idle work threads on each NOTIFY from enqueue_job
+        while not self.stopping.is_set():
+            conn = None
+            try:
+                conn = get_db_connection()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {SCRAPE_JOBS_CHANNEL}")
+                while not self.stopping.is_set():
+                    if select.select([conn], [], [], self.poll_seconds)[0]:
+                        conn.poll()
+                        if conn.notifies:
+                            conn.notifies.clear()
+                            with self._job_queued:
+                                self._job_queued.notify_all()
+            except Exception as e:
+                # The work threads keep polling every poll_seconds meanwhile
+                print(f"Error listening for scrape jobs: {e}")
+                self.stopping.wait(self.poll_seconds)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _heartbeat(self):
+        while not self.stopping.wait(self.heartbeat_seconds):
+            try:
+                with self._lock:
+                    job_ids = list(self._active)
+                with self.pool.connection() as conn, conn.cursor() as cur:
+                    heartbeat(cur, job_ids)
+                    failed = requeue_stale_jobs(cur, SCRAPE_STALE_SECONDS)
+                    conn.commit()
+                for job in failed:
+                    print(f"Scrape job {job['job_id']} failed: its worker stopped too many times")
+                    self._finish(job, "failed", "Sorry, the scrape could not be completed. Please try again.",
+                                 error="The scrape worker stopped while running this job")
+            except Exception as e:
+                print(f"Error in scrape worker heartbeat: {e}")
+
+    def stop(self, *args):
+        """Stop claiming jobs and end running crawls; their jobs are put back in the queue."""
+        self.stopping.set()
+        with self._job_queued:
+            self._job_queued.notify_all()
+        with self._lock:
+            crawls = list(self._running.values())
+        for crawl in crawls:
+            crawl.terminate()
+
+    def run(self):
+        threads = [threading.Thread(target=self._heartbeat, name="scrape-heartbeat", daemon=True),
+                   threading.Thread(target=self._listen, name="scrape-listen", daemon=True)]
+        work_threads = [threading.Thread(target=self._work, name=f"scrape-worker-{i}") for i in range(self.workers)]
+        for thread in threads + work_threads:
+            thread.start()
+        print(f"Scrape worker running {self.workers} job(s) at a time ({self.runner} runner)")
+        for thread in work_threads:
+            thread.join()
+        if self.crawler_service is not None:
+            self.crawler_service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=SCRAPE_WORKERS)
+    parser.add_argument("--runner", choices=("reactor", "subprocess"), default=SCRAPE_RUNNER)
+    args = parser.parse_args()
+
+    worker = ScrapeWorker(workers=args.workers, runner=args.runner)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import os
+import time
+import sqlite3
+import secrets
+import threading
+
+from flask.json.tag import TaggedJSONSerializer # type: ignore
+from flask.sessions import SecureCookieSession, SessionInterface # type: ignore
+from itsdangerous import BadSignature, Signer # type: ignore
+
+# "sqlite": one file shared by the workers on this host; "postgres": the web_sessions table (migration 0003)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", os.path.join("sessions", "sessions.sqlite3"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", 10 * 60))
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+"""
+
+
+class SQLiteSessionStore:
+    """Sessions in one SQLite file in WAL mode, shared by every gunicorn worker on the host."""
+
+    def __init__(self, path=SESSION_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or forks
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SQLITE_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, session_id):
+        return self._connection().execute(
+            "SELECT data, expires_at FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())
+        ).fetchone()
+
+    def save(self, session_id, data, expires_at):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+            (session_id, data, expires_at),
+        )
+
+    def delete(self, session_id):
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def sweep(self):
+        return self._connection().execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class PostgresSessionStore:
+    """Sessions in the web_sessions table, for deployments with more than one host."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def load(self, session_id):
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT data, extract(epoch FROM expires_at) FROM web_sessions WHERE session_id = %s AND expires_at > now()",
+                (session_id,)
+            )
+            row = cur.fetchone()
+        return (row[0], float(row[1])) if row else None
+
+    def save(self, session_id, data, expires_at):
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO web_sessions (session_id, data, expires_at) VALUES (%s, %s, to_timestamp(%s))
+                ON CONFLICT (session_id) DO UPDATE SET data = EXCLUDED.data, expires_at = EXCLUDED.expires_at
+            """, (session_id, data, expires_at))
+            conn.commit()
+
+    def delete(self, session_id):
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM web_sessions WHERE session_id = %s", (session_id,))
+            conn.commit()
+
+    def sweep(self):
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM web_sessions WHERE expires_at <= now()")
+            deleted = cur.rowcount
+            conn.commit()
+        return deleted
+
+
+def make_session_store(backend=SESSION_BACKEND, pool=None):
+    """
+    Build the configured session store.
+    Args:
+        backend (str): "sqlite" or "postgres".
+        pool: utils.db_pool.ConnectionPool, required for "postgres".
+    Returns:
+        SQLiteSessionStore or PostgresSessionStore
+    """
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "postgres":
+        if pool is None:
+            raise ValueError("The postgres session backend needs a connection pool")
+        return PostgresSessionStore(pool)
+    raise ValueError(f"Unknown SESSION_BACKEND {backend!r}; expected 'sqlite' or 'postgres'")
+
+
+class ServerSideSession(SecureCookieSession):
+    """A Flask session whose contents live in a session store under `sid`."""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Move the contents to a fresh ID on the next save, e.g. at login, so a pre-login ID stops working."""
+        if self.sid is not None:
+            self.replaced_sid = self.replaced_sid or self.sid
+            self.sid = None
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface that keeps session data server-side.
+
+    The cookie holds only a signed random ID, so its size and the cost of
+    verifying it stay constant however much the session holds. Every
+    request reads its session from the store by primary key, never from a
+    per-worker copy, so a logout or regenerate() in one worker takes effect
+    in all of them at once. A session is written only when it changed or when less than half
+    of its lifetime (`PERMANENT_SESSION_LIFETIME`) is left, and a background
+    thread deletes expired sessions every `sweep_interval` seconds.
+    """
+
+    serializer = TaggedJSONSerializer()
+    salt = "server-side-session"
+
+    def __init__(self, store, sweep_interval=SESSION_SWEEP_INTERVAL):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stats = {"store_reads": 0, "not_found": 0, "saves": 0, "skipped_saves": 0,
+                       "deletes": 0, "swept": 0, "sweep_errors": 0}
+
+    def _ensure_sweeper(self):
+        # The sweep thread does not survive a fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._sweep_forever, name="session-sweeper", daemon=True).start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                deleted = self.store.sweep()
+            except Exception as e:
+                print(f"Error sweeping expired sessions: {e}")
+                with self._lock:
+                    self._stats["sweep_errors"] += 1
+                continue
+            with self._lock:
+                self._stats["swept"] += deleted
+
+    def _load(self, sid):
+        row = self.store.load(sid)
+        with self._lock:
+            self._stats["store_reads"] += 1
+            if row is None:
+                self._stats["not_found"] += 1
+                return None
+        return self.serializer.loads(row[0]), row[1]
+
+    def _delete(self, sid):
+        self.store.delete(sid)
+        with self._lock:
+            self._stats["deletes"] += 1
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt, key_derivation="hmac")
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            # Flask then falls back to a NullSession that explains the missing SECRET_KEY
+            return None
+        self._ensure_sweeper()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode("ascii")
+            except BadSignature:
+                sid = None
+            record = self._load(sid) if sid else None
+            if record is not None:
+                return ServerSideSession(record[0], sid=sid, expires_at=record[1])
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+        replaced = session.replaced_sid is not None
+        if replaced:
+            self._delete(session.replaced_sid)
+            session.replaced_sid = None
+
+        if not session:
+            # Logout clears then regenerates, so the old sid is in replaced_sid and sid is None
+            if session.modified and (session.sid or replaced):
+                if session.sid:
+                    self._delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure, samesite=samesite,
+                                       httponly=httponly)
+            return
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        if not session.modified and session.sid and session.expires_at - now > lifetime / 2:
+            with self._lock:
+                self._stats["skipped_saves"] += 1
+            return
+
+        is_new = session.sid is None
+        if is_new:
+            session.sid = secrets.token_urlsafe(32)
+        session.expires_at = now + lifetime
+        data = self.serializer.dumps(dict(session))
+        self.store.save(session.sid, data, session.expires_at)
+        with self._lock:
+            self._stats["saves"] += 1
+
+        if is_new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode("ascii"),
+                expires=self.get_expiration_time(app, session),
+                httponly=httponly,
+                domain=domain,
+                path=path,
+                secure=secure,
+                samesite=samesite,
+            )
+
+    def stats(self):
+        """
+        Snapshot of the session counters for this worker.
+        Returns:
+            dict: store reads, saves (and saves skipped as unchanged), deletes and swept sessions.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = type(self.store).__name__
+        return stats
@@ -0,0 +1,85 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 5 * 60))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+
+
+class UserProfileCache:
+    """
+    Per-worker cache of users rows (id, full name, email) keyed by user id.
+
+    /chat reads the profile on every page load; within `ttl` seconds of the
+    last load it is served from memory. An unknown id is cached too, so a
+    stale tab with a deleted account does not reach Postgres either. Routes
+    that create or change a user call `invalidate` with its id; other
+    workers pick the change up within `ttl`.
+    """
+
+    def __init__(self, pool, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.pool = pool
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (profile or None, loaded at)
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _store(self, user_id, profile):
+        # Called with self._lock held
+        self._entries[user_id] = (profile, time.monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, user_id):
+        """
+        Look up a user's profile.
+        Args:
+            user_id: users.id
+        Returns:
+            dict or None: {"id", "full_name", "email"}, or None if there is no such user.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and time.monotonic() - entry[1] <= self.ttl:
+                self._entries.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute('SELECT id, full_name, email FROM users WHERE id = %s', (user_id,))
+            row = cur.fetchone()
+        profile = {"id": row[0], "full_name": row[1], "email": row[2]} if row else None
+        with self._lock:
+            self._store(user_id, profile)
+        return profile
+
+    def put(self, user_id, full_name, email):
+        """Cache a profile the caller has just read, e.g. at login."""
+        with self._lock:
+            self._store(user_id, {"id": user_id, "full_name": full_name, "email": email})
+
+    def invalidate(self, user_id):
+        """
+        Drop the cached entry for a user id, including a cached "no such user".
+        Args:
+            user_id: users.id
+        """
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        """
+        Snapshot of the cache counters for this worker.
+        Returns:
+            dict: hits, misses, hit rate, invalidations and cached entries.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+        return stats